@@ -0,0 +1,72 @@
+import hashlib
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from . import cache as cache_api
+
+
+def contar(queryset, **condiciones):
+    """
+    Cuenta varias condiciones sobre una misma tabla en una sola pasada.
+
+        contar(Producto.objects, total=None, activos=Q(activo=True))
+
+    Una condición None cuenta todas las filas.
+    """
+    return queryset.aggregate(**{
+        nombre: Count('pk', filter=condicion) if condicion is not None else Count('pk')
+        for nombre, condicion in condiciones.items()
+    })
+
+
+def _marca(modelo):
+    # Count y Max(pk) detectan altas y bajas; fecha_actualizacion, las modificaciones
+    agregados = {'total': Count('pk'), 'ultimo_id': Max('pk')}
+    if any(field.name == 'fecha_actualizacion' for field in modelo._meta.concrete_fields):
+        agregados['ultima'] = Max('fecha_actualizacion')
+    return modelo._default_manager.aggregate(**agregados)
+
+
+def con_validacion(*modelos, por_dia=False):
+    """
+    Agrega ETag y Last-Modified a una vista de la API a partir del estado de
+    las tablas indicadas, y responde 304 sin ejecutar la vista cuando el
+    cliente ya tiene la versión vigente.
+
+    Con por_dia=True la fecha actual entra en el ETag, para vistas cuyo
+    resultado depende de una ventana de tiempo (p. ej. "últimos 30 días").
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            partes = [vista.__name__, request.get_full_path()]
+            # Con la caché disponible se usan las generaciones (sin consultas);
+            # si no, el estado de las tablas
+            validacion = cache_api.validadores(modelos)
+            if validacion is not None:
+                generaciones, ultima = validacion
+                partes += generaciones
+            else:
+                marcas = [_marca(modelo) for modelo in modelos]
+                partes += [f"{m['total']}:{m['ultimo_id']}:{m.get('ultima')}" for m in marcas]
+                fechas = [m['ultima'] for m in marcas if m.get('ultima')]
+                ultima = int(max(fechas).timestamp()) if fechas else None
+            if por_dia:
+                partes.append(str(timezone.localdate()))
+            etag = '"%s"' % hashlib.md5('|'.join(partes).encode()).hexdigest()
+
+            respuesta = get_conditional_response(
+                request, etag=etag, last_modified=None if por_dia else ultima
+            )
+            if respuesta is None:
+                respuesta = vista(request, *args, **kwargs)
+            respuesta['ETag'] = etag
+            if ultima is not None and not por_dia:
+                respuesta['Last-Modified'] = http_date(ultima)
+            return respuesta
+        return envoltura
+    return decorador
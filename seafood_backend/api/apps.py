@@ -4,3 +4,23 @@ from django.apps import AppConfig
 class Config(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from finanzas.signals import facturas_actualizadas, saldos_actualizados
+        from informes.signals import predicciones_actualizadas
+        from inventario.signals import catalogo_importado, stock_modificado
+        from pedidos.signals import pedidos_asignados, temperaturas_registradas, totales_recalculados
+        from .cache import registrar_cambio
+
+        post_save.connect(registrar_cambio, dispatch_uid='api_cache_post_save')
+        post_delete.connect(registrar_cambio, dispatch_uid='api_cache_post_delete')
+        stock_modificado.connect(registrar_cambio, dispatch_uid='api_cache_stock')
+        catalogo_importado.connect(registrar_cambio, dispatch_uid='api_cache_catalogo')
+        totales_recalculados.connect(registrar_cambio, dispatch_uid='api_cache_totales')
+        pedidos_asignados.connect(registrar_cambio, dispatch_uid='api_cache_asignacion')
+        temperaturas_registradas.connect(registrar_cambio, dispatch_uid='api_cache_temperaturas')
+        predicciones_actualizadas.connect(registrar_cambio, dispatch_uid='api_cache_predicciones')
+        saldos_actualizados.connect(registrar_cambio, dispatch_uid='api_cache_saldos')
+        facturas_actualizadas.connect(registrar_cambio, dispatch_uid='api_cache_facturas')
@@ -0,0 +1,203 @@
+"""
+Caché versionada para las respuestas de solo lectura de la API.
+
+Cada modelo tiene un contador de generación en la caché que se incrementa con
+post_save/post_delete (y con las señales de escrituras masivas) al confirmar
+la transacción. Una entrada
+guarda las generaciones de los modelos de los que depende: si alguna cambió,
+la entrada está vencida, sin depender de un TTL.
+
+Al vencer una entrada, un solo proceso la recalcula (single-flight con
+cache.add como candado) y el resto sigue sirviendo la versión anterior
+(stale-while-revalidate). Si la caché no está disponible, se calcula directo.
+"""
+import hashlib
+import logging
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+APPS_VERSIONADAS = {
+    'dashboard', 'inventario', 'pedidos', 'clientes', 'proveedores', 'informes', 'finanzas',
+}
+DURACION_ENTRADA = 60 * 60 * 24
+DURACION_CANDADO = 30
+ESPERA_MAXIMA = 2.0
+INTERVALO_ESPERA = 0.05
+
+
+def _etiqueta(modelo):
+    return modelo._meta.label_lower
+
+
+def _clave_generacion(etiqueta):
+    return f'gen:{etiqueta}'
+
+
+def _clave_modificacion(etiqueta):
+    return f'mod:{etiqueta}'
+
+
+def _contar(evento):
+    try:
+        cache.incr(f'cache:stats:{evento}')
+    except ValueError:
+        cache.add(f'cache:stats:{evento}', 0, timeout=None)
+        cache.incr(f'cache:stats:{evento}')
+    except Exception:
+        pass
+
+
+def invalidar(*modelos):
+    """Incrementa la generación de los modelos indicados."""
+    ahora = time.time()
+    for modelo in modelos:
+        etiqueta = _etiqueta(modelo)
+        try:
+            try:
+                cache.incr(_clave_generacion(etiqueta))
+            except ValueError:
+                # Sin contador (nunca creado o desalojado): se parte de la hora
+                # actual para no repetir una generación ya usada
+                cache.set(_clave_generacion(etiqueta), int(ahora * 1000), timeout=None)
+            cache.set(_clave_modificacion(etiqueta), ahora, timeout=None)
+        except Exception:
+            logger.warning('No se pudo invalidar la caché de %s', etiqueta, exc_info=True)
+
+
+def generaciones(modelos):
+    """Devuelve {etiqueta: (generación, última modificación)} con una sola lectura."""
+    etiquetas = [_etiqueta(modelo) for modelo in modelos]
+    claves = [_clave_generacion(e) for e in etiquetas] + [_clave_modificacion(e) for e in etiquetas]
+    valores = cache.get_many(claves)
+
+    faltantes = [e for e in etiquetas if _clave_generacion(e) not in valores]
+    if faltantes:
+        ahora = time.time()
+        for etiqueta in faltantes:
+            cache.add(_clave_generacion(etiqueta), int(ahora * 1000), timeout=None)
+            cache.add(_clave_modificacion(etiqueta), ahora, timeout=None)
+        valores.update(cache.get_many(claves))
+
+    return {
+        e: (valores.get(_clave_generacion(e)), valores.get(_clave_modificacion(e)))
+        for e in etiquetas
+    }
+
+
+def obtener(clave, modelos, calcular, timeout=DURACION_ENTRADA):
+    """Devuelve el valor cacheado de `clave` o lo recalcula con `calcular()`."""
+    try:
+        version = tuple(gen for gen, _ in generaciones(modelos).values())
+        entrada = cache.get(clave)
+    except Exception:
+        logger.warning('Caché no disponible, se calcula sin caché', exc_info=True)
+        return calcular()
+
+    if entrada is not None and entrada['version'] == version:
+        _contar('hit')
+        return entrada['datos']
+
+    candado = f'{clave}:candado'
+    propio = cache.add(candado, 1, timeout=DURACION_CANDADO)
+    if not propio:
+        if entrada is not None:
+            # Otro proceso ya recalcula: se sirve la versión anterior
+            _contar('stale')
+            return entrada['datos']
+        limite = time.monotonic() + ESPERA_MAXIMA
+        while time.monotonic() < limite:
+            time.sleep(INTERVALO_ESPERA)
+            entrada = cache.get(clave)
+            if entrada is not None:
+                _contar('espera')
+                return entrada['datos']
+
+    _contar('miss')
+    try:
+        datos = calcular()
+        cache.set(clave, {'version': version, 'datos': datos}, timeout=timeout)
+    finally:
+        if propio:
+            cache.delete(candado)
+    return datos
+
+
+def estadisticas():
+    eventos = ['hit', 'miss', 'stale', 'espera']
+    try:
+        valores = cache.get_many([f'cache:stats:{evento}' for evento in eventos])
+    except Exception:
+        logger.warning('Caché no disponible', exc_info=True)
+        valores = {}
+    datos = {evento: valores.get(f'cache:stats:{evento}', 0) for evento in eventos}
+    consultas = datos['hit'] + datos['miss'] + datos['stale'] + datos['espera']
+    datos['tasa_aciertos'] = round((consultas - datos['miss']) / consultas, 4) if consultas else None
+    return datos
+
+
+def cacheado(*modelos, timeout=DURACION_ENTRADA, por_dia=False):
+    """
+    Cachea los datos de una vista de la API (Response.data) según la ruta
+    completa, y los invalida cuando cambia cualquiera de los modelos indicados.
+    Para métodos de un ViewSet se usa con method_decorator.
+
+    Con por_dia=True la fecha actual entra en la clave, para vistas cuyo
+    resultado depende de una ventana de tiempo.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            ruta = request.get_full_path()
+            if por_dia:
+                ruta += f'|{timezone.localdate()}'
+            ruta = hashlib.md5(ruta.encode()).hexdigest()
+            clave = f'vista:{vista.__module__}.{vista.__qualname__}:{ruta}'
+
+            def calcular():
+                respuesta = vista(request, *args, **kwargs)
+                if respuesta.status_code != 200:
+                    raise _RespuestaNoCacheable(respuesta)
+                return respuesta.data
+
+            try:
+                return Response(obtener(clave, modelos, calcular, timeout=timeout))
+            except _RespuestaNoCacheable as e:
+                return e.respuesta
+        return envoltura
+    return decorador
+
+
+class _RespuestaNoCacheable(Exception):
+    def __init__(self, respuesta):
+        self.respuesta = respuesta
+
+
+def validadores(modelos):
+    """
+    ETag y Last-Modified a partir de las generaciones, sin tocar la base de
+    datos. Devuelve None si la caché no está disponible.
+    """
+    try:
+        estado = generaciones(modelos)
+    except Exception:
+        return None
+    partes = [f'{etiqueta}:{gen}' for etiqueta, (gen, _) in sorted(estado.items())]
+    modificaciones = [mod for _, mod in estado.values() if mod]
+    ultima = int(max(modificaciones)) if modificaciones else None
+    return partes, ultima
+
+
+def registrar_cambio(sender, **kwargs):
+    """Receptor de post_save/post_delete y de las señales de escrituras masivas."""
+    if sender._meta.app_label in APPS_VERSIONADAS:
+        # Antes del commit otro proceso podría recalcular con los datos viejos
+        # y guardarlos con la generación nueva; sin transacción corre en el acto
+        transaction.on_commit(lambda: invalidar(sender))
+
@@ -0,0 +1,149 @@
+"""
+Exportaciones CSV en streaming.
+
+Cada exportación recorre la consulta con values_list().iterator(chunk_size=...)
+y escribe fila a fila en un StreamingHttpResponse, así que la memoria del
+proceso no crece con el tamaño del resultado (a diferencia de import-export,
+que arma el Dataset completo antes de escribirlo).
+"""
+import csv
+import json
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import OuterRef, Subquery
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer
+
+from finanzas.models import LineaAsiento
+from inventario.models import CambioHistorial, Producto
+from pedidos.models import Pedido
+
+FILAS_POR_LOTE = 2000
+
+
+class RenderizadorCSV(BaseRenderer):
+    """Permite negociar text/csv; el cuerpo lo escribe StreamingHttpResponse."""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Solo llega aquí un error de DRF (401, 403...)
+        return json.dumps(data, cls=DjangoJSONEncoder).encode() if data is not None else b''
+
+
+class _Eco:
+    """Pseudo-archivo: csv.writer devuelve la línea en vez de acumularla."""
+    def write(self, valor):
+        return valor
+
+
+def respuesta_csv(nombre, encabezados, filas):
+    escritor = csv.writer(_Eco())
+    lineas = (escritor.writerow(fila) for fila in _con_encabezados(encabezados, filas))
+    respuesta = StreamingHttpResponse(lineas, content_type='text/csv; charset=utf-8')
+    fecha = timezone.localdate().isoformat()
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}_{fecha}.csv"'
+    return respuesta
+
+
+def _con_encabezados(encabezados, filas):
+    yield encabezados
+    yield from filas
+
+
+def filtrar_fechas(queryset, campo, desde=None, hasta=None):
+    if desde:
+        queryset = queryset.filter(**{f'{campo}__gte': desde})
+    if hasta:
+        queryset = queryset.filter(**{f'{campo}__lte': hasta})
+    return queryset
+
+
+PEDIDOS = [
+    ('pedido', 'pk'),
+    ('fecha_pedido', 'fecha_pedido'),
+    ('cliente', 'cliente__nombre'),
+    ('estado', 'estado'),
+    ('total', 'total'),
+    ('producto_codigo', 'detalles__producto__codigo'),
+    ('producto', 'detalles__producto__nombre'),
+    ('cantidad', 'detalles__cantidad'),
+    ('precio_unitario', 'detalles__precio_unitario'),
+    ('lote', 'detalles__lote'),
+]
+
+
+def filas_pedidos(desde=None, hasta=None):
+    """Una fila por línea de pedido; los pedidos sin líneas salen con las columnas de detalle vacías."""
+    pedidos = filtrar_fechas(Pedido.objects.all(), 'fecha_pedido__date', desde, hasta)
+    return (
+        pedidos.order_by('pk', 'detalles__pk')
+        .values_list(*[campo for _, campo in PEDIDOS])
+        .iterator(chunk_size=FILAS_POR_LOTE)
+    )
+
+
+PRODUCTOS = [
+    ('codigo', 'codigo'),
+    ('nombre', 'nombre'),
+    ('categoria', 'categoria__nombre'),
+    ('precio', 'precio'),
+    ('costo', 'costo'),
+    ('cantidad_stock', 'cantidad_stock'),
+    ('unidad', 'unidad'),
+    ('activo', 'activo'),
+    ('fecha_actualizacion', 'fecha_actualizacion'),
+]
+
+HISTORIAL_PRODUCTOS = ['fecha', 'producto_id', 'codigo', 'tipo', 'usuario', 'cambios']
+
+
+def filas_productos():
+    return (
+        Producto.objects.order_by('pk')
+        .values_list(*[campo for _, campo in PRODUCTOS])
+        .iterator(chunk_size=FILAS_POR_LOTE)
+    )
+
+
+def filas_historial_productos(desde=None, hasta=None):
+    """Cambios registrados en CambioHistorial para los productos, del más antiguo al más reciente."""
+    cambios = filtrar_fechas(
+        CambioHistorial.objects.filter(content_type=ContentType.objects.get_for_model(Producto)),
+        'fecha__date', desde, hasta,
+    )
+    filas = (
+        cambios.annotate(codigo=Subquery(Producto.objects.filter(pk=OuterRef('object_id')).values('codigo')[:1]))
+        .order_by('fecha', 'pk')
+        .values_list('fecha', 'object_id', 'codigo', 'tipo', 'usuario__username', 'cambios')
+        .iterator(chunk_size=FILAS_POR_LOTE)
+    )
+    for *fila, detalle in filas:
+        yield *fila, json.dumps(detalle, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+LINEAS_ASIENTO = [
+    ('fecha', 'asiento__fecha'),
+    ('asiento', 'asiento_id'),
+    ('tipo', 'asiento__tipo'),
+    ('referencia', 'asiento__referencia'),
+    ('cuenta', 'cuenta__codigo'),
+    ('nombre_cuenta', 'cuenta__nombre'),
+    ('descripcion', 'descripcion'),
+    ('debe', 'debe'),
+    ('haber', 'haber'),
+]
+
+
+def filas_lineas_asiento(desde=None, hasta=None, cuenta=None):
+    lineas = filtrar_fechas(LineaAsiento.objects.all(), 'asiento__fecha', desde, hasta)
+    if cuenta:
+        lineas = lineas.filter(cuenta__codigo__startswith=cuenta)
+    return (
+        lineas.order_by('asiento__fecha', 'asiento_id', 'pk')
+        .values_list(*[campo for _, campo in LINEAS_ASIENTO])
+        .iterator(chunk_size=FILAS_POR_LOTE)
+    )
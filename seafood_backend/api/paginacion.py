@@ -0,0 +1,126 @@
+"""
+Paginación por clave (keyset) para los ViewSets de la API.
+
+En lugar de OFFSET, el cursor guarda los valores de la última fila de la
+página y la siguiente se pide con WHERE (campo, id) > (valor, id), que el
+índice compuesto resuelve sin recorrer las filas anteriores: cualquier página
+cuesta lo mismo que la primera.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+
+class PaginacionKeyset(BasePagination):
+    # Campos del orden; el último debe ser único (normalmente 'id').
+    # Un '-' delante indica orden descendente, igual que en order_by().
+    orden = ('id',)
+    page_size = api_settings.PAGE_SIZE or 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido'
+
+    def _campos(self):
+        return [(campo.lstrip('-'), campo.startswith('-')) for campo in self.orden]
+
+    def get_page_size(self, request):
+        try:
+            tamano = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(tamano, self.max_page_size))
+
+    def codificar_cursor(self, valores):
+        # isoformat() completo: DjangoJSONEncoder recorta los microsegundos y
+        # el cursor saltaría filas con la misma fecha al milisegundo
+        texto = json.dumps(
+            valores, separators=(',', ':'),
+            default=lambda valor: valor.isoformat() if hasattr(valor, 'isoformat') else str(valor),
+        )
+        return base64.urlsafe_b64encode(texto.encode()).decode()
+
+    def decodificar_cursor(self, cursor, modelo):
+        try:
+            valores = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            campos = self._campos()
+            if not isinstance(valores, list) or len(valores) != len(campos):
+                raise ValueError
+            return [
+                modelo._meta.get_field(nombre).to_python(valor)
+                for (nombre, _), valor in zip(campos, valores)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def filtro_posterior(self, valores):
+        """Q de las filas que van después de `valores` en el orden del paginador."""
+        condicion = Q()
+        iguales = {}
+        for (nombre, descendente), valor in zip(self._campos(), valores):
+            operador = 'lt' if descendente else 'gt'
+            condicion |= Q(**iguales, **{f'{nombre}__{operador}': valor})
+            iguales[nombre] = valor
+        return condicion
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size_actual = self.get_page_size(request)
+        queryset = queryset.order_by(*self.orden)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.filtro_posterior(self.decodificar_cursor(cursor, queryset.model)))
+
+        # Una fila extra indica si hay página siguiente, sin COUNT(*)
+        filas = list(queryset[:self.page_size_actual + 1])
+        self.hay_siguiente = len(filas) > self.page_size_actual
+        filas = filas[:self.page_size_actual]
+        self.ultimo = filas[-1] if filas else None
+        return filas
+
+    def get_next_link(self):
+        if not self.hay_siguiente:
+            return None
+        valores = [getattr(self.ultimo, nombre) for nombre, _ in self._campos()]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.codificar_cursor(valores))
+
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('first', self.get_first_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'first': {'type': 'string', 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class PaginacionProductos(PaginacionKeyset):
+    orden = ('nombre', 'id')
+
+
+class PaginacionPedidos(PaginacionKeyset):
+    orden = ('-fecha_pedido', '-id')
+
+
+class PaginacionRutas(PaginacionKeyset):
+    orden = ('-fecha_entrega', '-id')
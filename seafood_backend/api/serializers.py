@@ -0,0 +1,68 @@
+from rest_framework import serializers
+
+from inventario.models import Producto
+from pedidos.models import Pedido, DetallePedido, Vehiculo, RutaEntrega
+
+
+class ProductoSerializer(serializers.ModelSerializer):
+    categoria_nombre = serializers.CharField(source='categoria.nombre', read_only=True, default=None)
+    # El stock solo cambia por el ledger (acción ajustar_stock)
+    cantidad_stock = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = Producto
+        fields = [
+            'id', 'nombre', 'codigo', 'codigo_lote', 'categoria', 'categoria_nombre',
+            'descripcion', 'precio', 'costo', 'cantidad_stock', 'unidad', 'temperatura_maxima',
+            'imagen', 'activo', 'fecha_creacion', 'fecha_actualizacion',
+        ]
+        read_only_fields = ['codigo', 'fecha_creacion', 'fecha_actualizacion']
+
+
+class DetallePedidoSerializer(serializers.ModelSerializer):
+    producto_nombre = serializers.CharField(source='producto.nombre', read_only=True)
+    subtotal = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = DetallePedido
+        fields = [
+            'id', 'producto', 'producto_nombre', 'cantidad', 'precio_unitario',
+            'subtotal', 'temperatura_empaque', 'lote', 'notas',
+        ]
+
+
+class PedidoSerializer(serializers.ModelSerializer):
+    cliente_nombre = serializers.CharField(source='cliente.nombre', read_only=True)
+    detalles = DetallePedidoSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Pedido
+        fields = [
+            'id', 'cliente', 'cliente_nombre', 'fecha_pedido', 'fecha_actualizacion',
+            'estado', 'notas', 'total', 'ruta_entrega', 'orden_entrega', 'ventana_inicio',
+            'ventana_fin', 'hora_estimada', 'temperatura_entrega', 'hora_entrega', 'detalles',
+        ]
+        # El total lo mantienen los detalles (pedidos.totales); la hora estimada, la programación
+        read_only_fields = ['fecha_pedido', 'fecha_actualizacion', 'total', 'hora_estimada']
+
+
+class VehiculoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Vehiculo
+        fields = ['id', 'placa', 'tipo', 'capacidad', 'temperatura_min', 'temperatura_max', 'en_servicio']
+
+
+class RutaEntregaSerializer(serializers.ModelSerializer):
+    vehiculo_detalle = VehiculoSerializer(source='vehiculo', read_only=True)
+    conductor_nombre = serializers.CharField(source='conductor.get_username', read_only=True)
+    total_pedidos = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = RutaEntrega
+        fields = [
+            'id', 'fecha_entrega', 'vehiculo', 'vehiculo_detalle', 'conductor', 'conductor_nombre',
+            'estado', 'temperatura_promedio', 'hora_inicio', 'hora_fin',
+            'kilometraje_inicial', 'kilometraje_final', 'notas', 'total_pedidos',
+        ]
+        # La calcula la telemetría (pedidos.telemetria)
+        read_only_fields = ['temperatura_promedio']
@@ -1,3 +1,79 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from informes.models import PrediccionDemanda
+from pedidos.tests import CACHE_LOCAL, crear_datos, crear_productos
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class ConsultasApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user('operador', password='clave')
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+
+    def assertConsultasConstantes(self, url, consultas, crear):
+        # La misma cantidad de consultas con pocos y con muchos registros
+        for cantidad in (2, 10):
+            crear(cantidad)
+            cache.clear()
+            with self.assertNumQueries(consultas):
+                respuesta = self.api.get(url)
+            self.assertEqual(respuesta.status_code, 200)
+        return respuesta
+
+    def test_pedidos(self):
+        respuesta = self.assertConsultasConstantes(
+            '/api/recursos/pedidos/', 2, lambda n: crear_datos(num_pedidos=n, lineas_por_pedido=3)
+        )
+        self.assertEqual(len(respuesta.data['results'][0]['detalles']), 3)
+
+    def test_detalle_pedido(self):
+        pedido = crear_datos(num_pedidos=1, lineas_por_pedido=6)[0]
+        with self.assertNumQueries(2):
+            respuesta = self.api.get(f'/api/recursos/pedidos/{pedido.pk}/')
+        self.assertEqual(respuesta.data['cliente_nombre'], pedido.cliente.nombre)
+
+    def test_productos(self):
+        self.assertConsultasConstantes(
+            '/api/recursos/productos/', 1, crear_productos
+        )
+
+    def test_predicciones_demanda(self):
+        def crear(cantidad):
+            PrediccionDemanda.objects.bulk_create([
+                PrediccionDemanda(
+                    producto=producto, fecha_inicio=date(2025, 1, 1), fecha_fin=date(2025, 1, 31),
+                    demanda_predicha=Decimal('10'), intervalo_confianza_bajo=Decimal('8'),
+                    intervalo_confianza_alto=Decimal('12'), factores_estacionales={},
+                    precision_modelo=Decimal('90'),
+                )
+                for producto in crear_productos(cantidad)
+            ])
+        self.assertConsultasConstantes('/api/predicciones-demanda/', 1, crear)
+
+    def test_resumen_pedidos(self):
+        self.assertConsultasConstantes(
+            '/api/pedidos/', 1, lambda n: crear_datos(num_pedidos=n, lineas_por_pedido=1)
+        )
+
+    def test_respuesta_cacheada_sin_consultas(self):
+        crear_productos(3)
+        self.api.get('/api/recursos/productos/')
+        with self.assertNumQueries(0):
+            self.api.get('/api/recursos/productos/')
+
+    def test_dashboard_analitico(self):
+        self.assertConsultasConstantes(
+            '/api/dashboard-analitico/', 3, lambda n: crear_datos(num_pedidos=n, lineas_por_pedido=1)
+        )
+
+    def test_optimizar_rutas_vehiculo_invalido(self):
+        respuesta = self.api.post('/api/recursos/rutas/optimizar/', {'vehiculo_id': 'abc'}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
@@ -18,9 +18,15 @@ urlpatterns = [
 ]
 
 # api/urls.py
-from django.urls import path
+from django.urls import include, path
+from rest_framework.routers import SimpleRouter
 from . import views
 
+router = SimpleRouter()
+router.register('productos', views.ProductoViewSet, basename='api_productos')
+router.register('pedidos', views.PedidoViewSet, basename='api_pedidos')
+router.register('rutas', views.RutaEntregaViewSet, basename='api_rutas')
+
 urlpatterns = [
     path('', views.index, name='api_index'),
     path('inventario/', views.get_inventario, name='api_inventario'),
@@ -28,4 +34,15 @@ urlpatterns = [
     path('clientes/', views.get_clientes, name='api_clientes'),
     path('proveedores/', views.get_proveedores, name='api_proveedores'),
     path('informes/', views.get_informes, name='api_informes'),
+    path('dashboard-analitico/', views.dashboard_analitico, name='api_dashboard_analitico'),
+    path('predicciones-demanda/', views.predicciones_demanda, name='api_predicciones_demanda'),
+    path('telemetria/temperaturas/', views.ingerir_temperaturas, name='api_telemetria_temperaturas'),
+    path('exportar/pedidos/', views.exportar_pedidos, name='api_exportar_pedidos'),
+    path('exportar/productos/', views.exportar_productos, name='api_exportar_productos'),
+    path('exportar/lineas-asiento/', views.exportar_lineas_asiento, name='api_exportar_lineas_asiento'),
+    path('finanzas/balance-comprobacion/', views.balance_comprobacion, name='api_balance_comprobacion'),
+    path('finanzas/asientos/contabilizar/', views.contabilizar_asientos, name='api_contabilizar_asientos'),
+    path('finanzas/antiguedad-saldos/', views.antiguedad_saldos, name='api_antiguedad_saldos'),
+    path('cache/estadisticas/', views.estadisticas_cache, name='api_estadisticas_cache'),
+    path('recursos/', include(router.urls)),
 ]
@@ -1,17 +1,26 @@
 from django.shortcuts import render
 from django.http import JsonResponse
 from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.decorators import api_view, permission_classes, parser_classes, renderer_classes, action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from django.db.models import Sum, Avg, Count
+from django.db.models import Sum, Avg, Count, Q
+from django.utils.decorators import method_decorator
 from datetime import datetime, timedelta
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 
-from inventario.models import Producto, PuntoControlHACCP, RegistroCalidad, Incidencia
-from pedidos.models import Pedido, DetallePedido, Vehiculo, RutaEntrega
+from inventario.models import Categoria, Producto, PuntoControlHACCP, RegistroCalidad, Incidencia
+from inventario.importacion import importar_catalogo
+from inventario.stock import StockInsuficiente, registrar_movimiento
+from pedidos.models import Pedido, DetallePedido, Vehiculo, RutaEntrega, ResumenTemperatura
+from pedidos.programacion import insertar_pedido, programar_dia
+from pedidos.rutas import ESTADOS_PLANIFICABLES, optimizar_rutas
+from pedidos.telemetria import filas_csv, filas_ndjson, ingerir
 from clientes.models import Cliente
 from proveedores.models import Proveedor
 from informes.models import (
@@ -19,7 +28,18 @@ from informes.models import (
     RegistroKPI, RegistroSostenibilidad, CertificacionAmbiental
 )
 from dashboard.models import Empleado, Capacitacion, Turno
-from finanzas.models import CuentaContable, AsientoContable, Factura, Pago
+from finanzas.balances import balance_comprobacion as calcular_balance
+from finanzas.cobranza import antiguedad_saldos as calcular_antiguedad
+from finanzas.importacion import contabilizar_lote
+from finanzas.models import CuentaContable, AsientoContable, Factura, LineaAsiento, Pago, SaldoPeriodo
+from .agregados import con_validacion, contar
+from .cache import cacheado, estadisticas
+from .exportaciones import (
+    HISTORIAL_PRODUCTOS, LINEAS_ASIENTO, PEDIDOS, PRODUCTOS, RenderizadorCSV, filas_historial_productos,
+    filas_lineas_asiento, filas_pedidos, filas_productos, respuesta_csv,
+)
+from .paginacion import PaginacionPedidos, PaginacionProductos, PaginacionRutas
+from .serializers import PedidoSerializer, ProductoSerializer, RutaEntregaSerializer
 
 @api_view(['GET'])
 @swagger_auto_schema(
@@ -47,13 +67,15 @@ def index(request):
         401: 'Authentication credentials were not provided'
     }
 )
+@con_validacion(Producto)
+@cacheado(Producto)
 def get_inventario(request):
-    productos = Producto.objects.all()
-    data = {
-        'total_productos': productos.count(),
-        'productos_activos': productos.filter(activo=True).count(),
-        'productos_stock_bajo': productos.filter(cantidad_stock__lte=10).count(),
-    }
+    data = contar(
+        Producto.objects,
+        total_productos=None,
+        productos_activos=Q(activo=True),
+        productos_stock_bajo=Q(cantidad_stock__lte=10),
+    )
     return Response(data)
 
 @api_view(['GET'])
@@ -64,13 +86,15 @@ def get_inventario(request):
         401: 'Authentication credentials were not provided'
     }
 )
+@con_validacion(Pedido)
+@cacheado(Pedido)
 def get_pedidos(request):
-    pedidos = Pedido.objects.all()
-    data = {
-        'total_pedidos': pedidos.count(),
-        'pedidos_pendientes': pedidos.filter(estado='pendiente').count(),
-        'pedidos_completados': pedidos.filter(estado='completado').count(),
-    }
+    data = contar(
+        Pedido.objects,
+        total_pedidos=None,
+        pedidos_pendientes=Q(estado='pendiente'),
+        pedidos_completados=Q(estado='completado'),
+    )
     return Response(data)
 
 @api_view(['GET'])
@@ -81,12 +105,14 @@ def get_pedidos(request):
         401: 'Authentication credentials were not provided'
     }
 )
+@con_validacion(Cliente)
+@cacheado(Cliente)
 def get_clientes(request):
-    clientes = Cliente.objects.all()
-    data = {
-        'total_clientes': clientes.count(),
-        'clientes_activos': clientes.filter(activo=True).count(),
-    }
+    data = contar(
+        Cliente.objects,
+        total_clientes=None,
+        clientes_activos=Q(activo=True),
+    )
     return Response(data)
 
 @api_view(['GET'])
@@ -97,12 +123,14 @@ def get_clientes(request):
         401: 'Authentication credentials were not provided'
     }
 )
+@con_validacion(Proveedor)
+@cacheado(Proveedor)
 def get_proveedores(request):
-    proveedores = Proveedor.objects.all()
-    data = {
-        'total_proveedores': proveedores.count(),
-        'proveedores_activos': proveedores.filter(activo=True).count(),
-    }
+    data = contar(
+        Proveedor.objects,
+        total_proveedores=None,
+        proveedores_activos=Q(activo=True),
+    )
     return Response(data)
 
 @api_view(['GET'])
@@ -113,6 +141,7 @@ def get_proveedores(request):
         401: 'Authentication credentials were not provided'
     }
 )
+@cacheado(Informe)
 def get_informes(request):
     informes = Informe.objects.all()
     data = {
@@ -123,8 +152,19 @@ def get_informes(request):
 
 class ProductoViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
-    queryset = Producto.objects.all()
-    
+    queryset = Producto.objects.select_related('categoria')
+    serializer_class = ProductoSerializer
+    pagination_class = PaginacionProductos
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        activo = self.request.query_params.get('activo')
+        if activo is not None:
+            queryset = queryset.filter(activo=activo.lower() in ('true', '1'))
+        if self.request.query_params.get('stock_bajo') == 'true':
+            queryset = queryset.filter(cantidad_stock__lte=10)
+        return queryset
+
     @swagger_auto_schema(
         operation_description="Obtener lista de productos con filtros",
         manual_parameters=[
@@ -140,14 +180,9 @@ class ProductoViewSet(viewsets.ModelViewSet):
             )
         ]
     )
-    def list(self, request):
-        queryset = self.get_queryset()
-        if 'activo' in request.query_params:
-            queryset = queryset.filter(activo=request.query_params['activo'])
-        if request.query_params.get('stock_bajo') == 'true':
-            queryset = queryset.filter(cantidad_stock__lte=10)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+    @method_decorator(cacheado(Producto, Categoria))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
     @action(detail=True, methods=['post'])
     @swagger_auto_schema(
@@ -171,17 +206,47 @@ class ProductoViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
             
-        producto.cantidad_stock += int(cantidad)
-        producto.save()
+        try:
+            nuevo_stock = registrar_movimiento(
+                producto.pk, int(cantidad), 'ajuste',
+                motivo=motivo or '', usuario=request.user
+            )
+        except StockInsuficiente:
+            return Response(
+                {'error': 'Stock insuficiente'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         return Response({
             'mensaje': 'Stock actualizado correctamente',
-            'nuevo_stock': producto.cantidad_stock
+            'nuevo_stock': nuevo_stock
         })
 
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser], permission_classes=[IsAdminUser])
+    @swagger_auto_schema(
+        operation_description=(
+            "Importa o actualiza productos por código desde un CSV o Excel (campo archivo). "
+            "Columnas: codigo, nombre, categoria, precio, costo, unidad, temperatura_maxima, "
+            "codigo_lote, activo, descripcion; la columna codigo es obligatoria y "
+            "una celda vacía crea un producto con código nuevo"
+        ),
+        responses={200: openapi.Response('Resumen de la importación'), 400: 'Archivo inválido'}
+    )
+    def importar(self, request):
+        archivo = request.FILES.get('archivo')
+        if archivo is None:
+            return Response({'error': 'Se requiere el archivo'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            resultado = importar_catalogo(archivo, archivo.name, separador=request.data.get('separador') or ',')
+        except (ValueError, ImportError) as e:
+            return Response({'error': f'No se pudo leer el archivo: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(resultado)
+
 class PedidoViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
-    queryset = Pedido.objects.all()
+    queryset = Pedido.objects.completos()
+    serializer_class = PedidoSerializer
+    pagination_class = PaginacionPedidos
     
     @swagger_auto_schema(
         operation_description="Obtener estadísticas de pedidos",
@@ -192,24 +257,24 @@ class PedidoViewSet(viewsets.ModelViewSet):
         hoy = timezone.now()
         mes_pasado = hoy - timedelta(days=30)
         
-        stats = {
-            'total_pedidos': self.get_queryset().count(),
-            'pedidos_mes': self.get_queryset().filter(
-                fecha_pedido__gte=mes_pasado
-            ).count(),
-            'monto_total_mes': self.get_queryset().filter(
-                fecha_pedido__gte=mes_pasado
-            ).aggregate(total=Sum('total'))['total'],
-            'estado_pedidos': self.get_queryset().values('estado').annotate(
-                total=Count('id')
-            )
-        }
+        stats = Pedido.objects.aggregate(
+            total_pedidos=Count('id'),
+            pedidos_mes=Count('id', filter=Q(fecha_pedido__gte=mes_pasado)),
+            monto_total_mes=Sum('total', filter=Q(fecha_pedido__gte=mes_pasado)),
+        )
+        stats['estado_pedidos'] = Pedido.objects.order_by().values('estado').annotate(
+            total=Count('id')
+        )
         
         return Response(stats)
 
 class RutaEntregaViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
-    queryset = RutaEntrega.objects.all()
+    queryset = RutaEntrega.objects.select_related('vehiculo', 'conductor').annotate(
+        total_pedidos=Count('pedido')
+    )
+    serializer_class = RutaEntregaSerializer
+    pagination_class = PaginacionRutas
     
     @swagger_auto_schema(
         operation_description="Optimizar rutas de entrega",
@@ -223,23 +288,132 @@ class RutaEntregaViewSet(viewsets.ModelViewSet):
     )
     @action(detail=False, methods=['post'])
     def optimizar(self, request):
-        fecha = request.data.get('fecha')
+        fecha = _fecha_planificacion(request)
+        if fecha is None:
+            return _fecha_invalida()
+
         vehiculo_id = request.data.get('vehiculo_id')
-        
-        # Aquí iría la lógica de optimización de rutas
-        # Utilizando algoritmos como el del viajante (TSP)
+        if vehiculo_id in (None, ''):
+            vehiculo_id = None
+        else:
+            try:
+                vehiculo_id = int(str(vehiculo_id))
+            except (TypeError, ValueError):
+                return Response({'error': 'vehiculo_id debe ser un número entero'}, status=status.HTTP_400_BAD_REQUEST)
+
+        resultado = optimizar_rutas(fecha, vehiculo_id=vehiculo_id)
+        if not resultado['rutas']:
+            return Response(
+                {'error': 'No hay rutas planificadas para la fecha', **resultado},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         return Response({
             'mensaje': 'Ruta optimizada correctamente',
-            'rutas': []  # Aquí irían las rutas optimizadas
+            **resultado,
+        })
+
+    @swagger_auto_schema(
+        operation_description="Programar las rutas del día con ventanas horarias y cadena de frío",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={'fecha': openapi.Schema(type=openapi.TYPE_STRING, format='date')}
+        )
+    )
+    @action(detail=False, methods=['post'])
+    def programar(self, request):
+        fecha = _fecha_planificacion(request)
+        if fecha is None:
+            return _fecha_invalida()
+
+        resultado = programar_dia(fecha)
+        if not resultado['rutas']:
+            return Response(
+                {'error': 'No hay rutas planificadas para la fecha', **resultado},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'mensaje': 'Rutas programadas correctamente', **resultado})
+
+    @swagger_auto_schema(
+        operation_description="Insertar un pedido en la mejor ruta del día sin reprogramar las demás",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['pedido_id'],
+            properties={
+                'pedido_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'fecha': openapi.Schema(type=openapi.TYPE_STRING, format='date'),
+            }
+        )
+    )
+    @action(detail=False, methods=['post'])
+    def insertar(self, request):
+        fecha = _fecha_planificacion(request)
+        if fecha is None:
+            return _fecha_invalida()
+        try:
+            pedido = Pedido.objects.select_related('cliente').get(pk=request.data.get('pedido_id'))
+        except (Pedido.DoesNotExist, ValueError, TypeError):
+            return Response({'error': 'Pedido no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+        if pedido.estado not in ESTADOS_PLANIFICABLES or pedido.ruta_entrega_id:
+            error = 'El pedido no está pendiente de asignación'
+        elif pedido.cliente.latitud is None or pedido.cliente.longitud is None:
+            error = 'El cliente del pedido no tiene ubicación'
+        else:
+            error = None
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        ruta = insertar_pedido(pedido, fecha)
+        if ruta is None:
+            return Response(
+                {'error': 'El pedido no cabe en ninguna ruta respetando capacidad, ventanas y cadena de frío'},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response({'mensaje': 'Pedido insertado', 'ruta': ruta})
+
+    @swagger_auto_schema(operation_description="Resumen de las lecturas de temperatura de la ruta")
+    @action(detail=True, methods=['get'])
+    def temperaturas(self, request, pk=None):
+        ruta = self.get_object()
+        try:
+            resumen = ruta.resumen_temperatura
+        except ResumenTemperatura.DoesNotExist:
+            resumen = ResumenTemperatura(ruta=ruta)
+        promedio = resumen.promedio
+        return Response({
+            'ruta_id': ruta.pk,
+            'vehiculo': ruta.vehiculo.placa,
+            'rango': [ruta.vehiculo.temperatura_min, ruta.vehiculo.temperatura_max],
+            'lecturas': resumen.lecturas,
+            'promedio': round(float(promedio), 1) if promedio is not None else None,
+            'minima': resumen.minima,
+            'maxima': resumen.maxima,
+            'minutos_fuera_rango': resumen.minutos_fuera_rango,
+            'ultima_lectura': resumen.ultima_lectura,
+            'ultima_temperatura': resumen.ultima_temperatura,
         })
 
+
+def _fecha_planificacion(request):
+    fecha = request.data.get('fecha')
+    try:
+        return parse_date(str(fecha)) if fecha else timezone.localdate()
+    except ValueError:
+        return None
+
+
+def _fecha_invalida():
+    return Response({'error': 'Fecha inválida, use AAAA-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 @swagger_auto_schema(
     operation_description="Obtener dashboard analítico",
     responses={200: openapi.Response('Dashboard analítico')}
 )
+@con_validacion(Pedido, Producto, RegistroKPI, IndicadorDesempeno, por_dia=True)
+@cacheado(Pedido, Producto, RegistroKPI, IndicadorDesempeno, por_dia=True)
 def dashboard_analitico(request):
     hoy = timezone.now()
     mes_pasado = hoy - timedelta(days=30)
@@ -254,11 +428,12 @@ def dashboard_analitico(request):
     )
     
     # Productos
-    productos_stats = {
-        'total_productos': Producto.objects.count(),
-        'productos_activos': Producto.objects.filter(activo=True).count(),
-        'productos_stock_bajo': Producto.objects.filter(cantidad_stock__lte=10).count()
-    }
+    productos_stats = contar(
+        Producto.objects,
+        total_productos=None,
+        productos_activos=Q(activo=True),
+        productos_stock_bajo=Q(cantidad_stock__lte=10),
+    )
     
     # KPIs
     kpis = RegistroKPI.objects.filter(
@@ -291,20 +466,214 @@ def dashboard_analitico(request):
         )
     ]
 )
+@cacheado(PrediccionDemanda, Producto, por_dia=True)
 def predicciones_demanda(request):
     producto_id = request.query_params.get('producto_id')
-    predicciones = PrediccionDemanda.objects.all()
+    predicciones = PrediccionDemanda.objects.con_producto()
     
     if producto_id:
         predicciones = predicciones.filter(producto_id=producto_id)
     
+    hoy = timezone.localdate()
     return Response([
         {
             'producto': p.producto.nombre,
             'demanda_predicha': float(p.demanda_predicha),
+            'intervalo_confianza': [float(p.intervalo_confianza_bajo), float(p.intervalo_confianza_alto)],
             'precision': float(p.precision_modelo),
             'fecha_inicio': p.fecha_inicio,
-            'fecha_fin': p.fecha_fin
+            'fecha_fin': p.fecha_fin,
+            **_frescura(p, hoy),
         }
         for p in predicciones
-    ])
\ No newline at end of file
+    ])
+
+
+def _frescura(prediccion, hoy):
+    """Hasta qué día de ventas llega el pronóstico y cuántos días nuevos no incorpora."""
+    # Cada pronóstico usa las ventas hasta el día anterior a fecha_inicio
+    dias_sin_datos = max((hoy - prediccion.fecha_inicio).days, 0)
+    return {
+        'calculada': prediccion.ultima_actualizacion,
+        'datos_hasta': prediccion.fecha_inicio - timedelta(days=1),
+        'dias_sin_datos': dias_sin_datos,
+        'desactualizada': dias_sin_datos > 0,
+    }
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@swagger_auto_schema(
+    operation_description="Estadísticas de aciertos de la caché de la API",
+    responses={200: openapi.Response('Contadores de la caché')}
+)
+def estadisticas_cache(request):
+    return Response(estadisticas())
+
+FORMATOS_TELEMETRIA = {
+    'application/x-ndjson': filas_ndjson,
+    'application/jsonl': filas_ndjson,
+    'text/csv': filas_csv,
+}
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+# Sin parsers: el cuerpo se lee línea a línea, nunca completo en memoria
+@parser_classes([])
+@swagger_auto_schema(
+    operation_description=(
+        "Carga masiva de lecturas de temperatura en NDJSON (application/x-ndjson) "
+        "o CSV (text/csv), con los campos placa, fecha_hora y temperatura"
+    ),
+    responses={200: openapi.Response('Resumen de la carga'), 415: 'Formato no soportado'}
+)
+def ingerir_temperaturas(request):
+    formato = FORMATOS_TELEMETRIA.get(request.content_type.split(';')[0].strip().lower())
+    if formato is None:
+        return Response(
+            {'error': f"Formato no soportado, use {', '.join(FORMATOS_TELEMETRIA)}"},
+            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+        )
+    lineas = (linea.decode('utf-8', errors='replace') for linea in request.stream or ())
+    return Response(ingerir(formato(lineas)))
+
+
+PARAMETROS_RANGO = [
+    openapi.Parameter('desde', openapi.IN_QUERY, description="Fecha inicial (AAAA-MM-DD)", type=openapi.TYPE_STRING),
+    openapi.Parameter('hasta', openapi.IN_QUERY, description="Fecha final (AAAA-MM-DD)", type=openapi.TYPE_STRING),
+]
+
+
+def _rango_fechas(request):
+    """(desde, hasta) de la query string; ValueError si alguna no es una fecha."""
+    rango = []
+    for parametro in ('desde', 'hasta'):
+        valor = request.query_params.get(parametro)
+        fecha = parse_date(valor) if valor else None
+        if valor and fecha is None:
+            raise ValueError(parametro)
+        rango.append(fecha)
+    return rango
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([JSONRenderer, RenderizadorCSV])
+@swagger_auto_schema(
+    operation_description="Exporta en CSV los pedidos con sus líneas, una fila por línea de pedido",
+    manual_parameters=PARAMETROS_RANGO,
+    responses={200: 'CSV de pedidos', 400: 'Fecha inválida'}
+)
+def exportar_pedidos(request):
+    try:
+        desde, hasta = _rango_fechas(request)
+    except ValueError:
+        return _fecha_invalida()
+    return respuesta_csv('pedidos', [columna for columna, _ in PEDIDOS], filas_pedidos(desde, hasta))
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([JSONRenderer, RenderizadorCSV])
+@swagger_auto_schema(
+    operation_description=(
+        "Exporta en CSV el catálogo de productos; con historial=1 exporta sus cambios "
+        "registrados (desde/hasta filtran por fecha del cambio)"
+    ),
+    manual_parameters=PARAMETROS_RANGO + [
+        openapi.Parameter('historial', openapi.IN_QUERY, description="1 para exportar el historial", type=openapi.TYPE_BOOLEAN),
+    ],
+    responses={200: 'CSV de productos', 400: 'Fecha inválida'}
+)
+def exportar_productos(request):
+    if request.query_params.get('historial') not in ('1', 'true'):
+        return respuesta_csv('productos', [columna for columna, _ in PRODUCTOS], filas_productos())
+    try:
+        desde, hasta = _rango_fechas(request)
+    except ValueError:
+        return _fecha_invalida()
+    return respuesta_csv('historial_productos', HISTORIAL_PRODUCTOS, filas_historial_productos(desde, hasta))
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([JSONRenderer, RenderizadorCSV])
+@swagger_auto_schema(
+    operation_description="Exporta en CSV las líneas de asiento contable ordenadas por fecha",
+    manual_parameters=PARAMETROS_RANGO + [
+        openapi.Parameter('cuenta', openapi.IN_QUERY, description="Prefijo del código de cuenta", type=openapi.TYPE_STRING),
+    ],
+    responses={200: 'CSV de líneas de asiento', 400: 'Fecha inválida'}
+)
+def exportar_lineas_asiento(request):
+    try:
+        desde, hasta = _rango_fechas(request)
+    except ValueError:
+        return _fecha_invalida()
+    filas = filas_lineas_asiento(desde, hasta, request.query_params.get('cuenta'))
+    return respuesta_csv('lineas_asiento', [columna for columna, _ in LINEAS_ASIENTO], filas)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@swagger_auto_schema(
+    operation_description=(
+        "Balance de comprobación como árbol de cuentas: saldo inicial, debe, haber y saldo final "
+        "de cada cuenta con sus subcuentas. Por defecto desde el 1 de enero hasta hoy"
+    ),
+    manual_parameters=PARAMETROS_RANGO,
+    responses={200: 'Balance de comprobación', 400: 'Fecha inválida'}
+)
+@cacheado(CuentaContable, LineaAsiento, SaldoPeriodo, por_dia=True)
+def balance_comprobacion(request):
+    try:
+        desde, hasta = _rango_fechas(request)
+    except ValueError:
+        return _fecha_invalida()
+    hasta = hasta or timezone.localdate()
+    desde = desde or hasta.replace(month=1, day=1)
+    if desde > hasta:
+        return Response({'error': 'desde no puede ser posterior a hasta'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(calcular_balance(desde, hasta))
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+@swagger_auto_schema(
+    operation_description=(
+        "Crea y contabiliza asientos en bloque. Cuerpo: lista de asientos (o {\"asientos\": [...]}) con "
+        "fecha, tipo, descripcion, referencia y lineas; cada línea con cuenta (código) o cuenta_id (id), "
+        "descripcion, debe y haber. Los asientos que no cuadran o tienen datos inválidos se "
+        "devuelven en errores y el resto se contabiliza"
+    ),
+    responses={200: openapi.Response('Resumen de la contabilización'), 400: 'Cuerpo inválido'}
+)
+def contabilizar_asientos(request):
+    asientos = request.data.get('asientos') if isinstance(request.data, dict) else request.data
+    if not isinstance(asientos, list) or not all(isinstance(asiento, dict) for asiento in asientos):
+        return Response({'error': 'Se espera una lista de asientos'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(contabilizar_lote(asientos, request.user))
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@swagger_auto_schema(
+    operation_description=(
+        "Antigüedad de saldos de las facturas emitidas por cobrar: saldo pendiente por vencer "
+        "y con 0-30, 31-60, 61-90 y más de 90 días de atraso, de toda la cartera o por cliente"
+    ),
+    manual_parameters=[
+        openapi.Parameter('fecha', openapi.IN_QUERY, description="Fecha de corte (AAAA-MM-DD), hoy por defecto", type=openapi.TYPE_STRING),
+        openapi.Parameter('cliente', openapi.IN_QUERY, description="ID del cliente", type=openapi.TYPE_INTEGER),
+        openapi.Parameter('por_cliente', openapi.IN_QUERY, description="1 para desglosar por cliente", type=openapi.TYPE_BOOLEAN),
+    ],
+    responses={200: 'Saldos por tramo de atraso', 400: 'Parámetro inválido'}
+)
+@cacheado(Factura, Pago, por_dia=True)
+def antiguedad_saldos(request):
+    fecha = request.query_params.get('fecha')
+    corte = parse_date(fecha) if fecha else timezone.localdate()
+    if corte is None:
+        return _fecha_invalida()
+    cliente = request.query_params.get('cliente')
+    if cliente is not None and not cliente.isdigit():
+        return Response({'error': 'cliente debe ser un ID numérico'}, status=status.HTTP_400_BAD_REQUEST)
+    por_cliente = request.query_params.get('por_cliente') in ('1', 'true')
+    return Response({
+        'fecha': corte,
+        'tramos': calcular_antiguedad(corte, cliente and int(cliente)),
+        'clientes': calcular_antiguedad(corte, cliente and int(cliente), por_cliente=True) if por_cliente else None,
+    })
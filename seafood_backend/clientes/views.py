@@ -1,7 +1,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
+from dashboard import busqueda
 from .models import Cliente
 
 @login_required
@@ -9,20 +9,16 @@ def index(request):
     search_query = request.GET.get('search', '')
     estado_filter = request.GET.get('estado')
     
-    clientes = Cliente.objects.all()
-    
-    if search_query:
-        clientes = clientes.filter(
-            Q(nombre__icontains=search_query) |
-            Q(rut__icontains=search_query) |
-            Q(email__icontains=search_query)
-        )
+    clientes = busqueda.buscar(Cliente.objects.all(), search_query)
         
     if estado_filter:
         clientes = clientes.filter(activo=(estado_filter == 'activo'))
+    page_obj, parametros = busqueda.paginar(request, clientes)
     
     context = {
-        'clientes': clientes,
+        'clientes': page_obj,
+        'page_obj': page_obj,
+        'parametros': parametros,
         'search_query': search_query,
         'estado_filter': estado_filter
     }
@@ -38,6 +34,8 @@ def cliente_crear(request):
                 email=request.POST.get('email'),
                 telefono=request.POST.get('telefono'),
                 direccion=request.POST.get('direccion'),
+                latitud=request.POST.get('latitud') or None,
+                longitud=request.POST.get('longitud') or None,
                 activo=True
             )
             messages.success(request, 'Cliente creado exitosamente.')
@@ -62,6 +60,8 @@ def cliente_editar(request, pk):
             cliente.email = request.POST.get('email')
             cliente.telefono = request.POST.get('telefono')
             cliente.direccion = request.POST.get('direccion')
+            cliente.latitud = request.POST.get('latitud') or None
+            cliente.longitud = request.POST.get('longitud') or None
             cliente.save()
             
             messages.success(request, 'Cliente actualizado exitosamente.')
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class Config(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dashboard'
+
+    def ready(self):
+        from . import busqueda, signals  # noqa: F401
+
+        busqueda.conectar()
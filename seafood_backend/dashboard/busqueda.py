@@ -0,0 +1,223 @@
+"""
+Búsqueda por términos para los listados de productos, clientes, proveedores
+y pedidos.
+
+Cada registro indexado se descompone en términos normalizados (minúsculas,
+sin tildes, solo [0-9a-z]) que se guardan en TerminoBusqueda con un peso por
+campo. Una búsqueda normaliza el texto igual y busca cada término como
+prefijo en el índice (content_type, termino): "camarón" encuentra "Camarones
+ecuatorianos" sin recorrer la tabla. Solo se devuelven los registros que
+contienen todos los términos, ordenados por la suma de los pesos.
+
+El índice se mantiene con post_save/post_delete y, para las importaciones del
+catálogo, con catalogo_importado (indexar_ids, en bloque); las demás escrituras
+masivas que no disparan señales se corrigen con el comando reindexar_busqueda.
+"""
+import re
+import unicodedata
+from functools import reduce
+from operator import or_
+
+from django.apps import apps as global_apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.db.models import Case, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+
+LONGITUD_TERMINO = 64
+MAX_TERMINOS = 8
+POR_PAGINA = 25
+_SEPARADOR = re.compile(r'[^0-9a-z]+')
+
+# Campos indexados por modelo: (campo, peso, compacto). Con compacto=True se
+# indexa además el valor sin separadores, para encontrar "12345678-9" tanto
+# por "12.345.678" como por "123456789".
+CAMPOS = {
+    'inventario.producto': [('nombre', 3, False), ('codigo', 3, True), ('descripcion', 1, False)],
+    'clientes.cliente': [('nombre', 3, False), ('rut', 3, True), ('email', 2, False)],
+    'proveedores.proveedor': [
+        ('nombre', 3, False), ('rut', 3, True), ('email', 2, False), ('contacto', 2, False),
+    ],
+}
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', str(texto))
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def terminos(texto):
+    return [termino[:LONGITUD_TERMINO] for termino in _SEPARADOR.split(normalizar(texto)) if termino]
+
+
+def _pesos(instancia, campos):
+    pesos = {}
+    for campo, peso, compacto in campos:
+        valor = getattr(instancia, campo)
+        if not valor:
+            continue
+        partes = terminos(valor)
+        if compacto and len(partes) > 1:
+            partes.append(''.join(partes)[:LONGITUD_TERMINO])
+        for termino in partes:
+            pesos[termino] = max(pesos.get(termino, 0), peso)
+    return pesos
+
+
+def _filas(modelo_termino, content_type_id, instancia, campos):
+    return [
+        modelo_termino(content_type_id=content_type_id, object_id=instancia.pk, termino=termino, peso=peso)
+        for termino, peso in _pesos(instancia, campos).items()
+    ]
+
+
+def _reemplazar(modelo, ids, instancias):
+    from .models import TerminoBusqueda
+
+    campos = CAMPOS[modelo._meta.label_lower]
+    content_type = ContentType.objects.get_for_model(modelo)
+    filas = [fila for instancia in instancias for fila in _filas(TerminoBusqueda, content_type.pk, instancia, campos)]
+    with transaction.atomic():
+        TerminoBusqueda.objects.filter(content_type=content_type, object_id__in=ids).delete()
+        TerminoBusqueda.objects.bulk_create(filas, batch_size=1000)
+
+
+def indexar(instancia):
+    _reemplazar(instancia._meta.model, [instancia.pk], [instancia])
+
+
+def indexar_ids(modelo, ids, lote=2000):
+    """Reindexa los registros `ids` de `modelo` con una consulta y un bulk_create por cada `lote`."""
+    campos = [campo for campo, _, _ in CAMPOS[modelo._meta.label_lower]]
+    ids = list(ids)
+    for inicio in range(0, len(ids), lote):
+        bloque = ids[inicio:inicio + lote]
+        # Los que ya no existen solo se quitan del índice
+        _reemplazar(modelo, bloque, modelo._default_manager.filter(pk__in=bloque).only('pk', *campos))
+
+
+def desindexar(instancia):
+    from .models import TerminoBusqueda
+
+    content_type = ContentType.objects.get_for_model(instancia)
+    TerminoBusqueda.objects.filter(content_type=content_type, object_id=instancia.pk).delete()
+
+
+def reindexar(etiquetas=None, lote=2000):
+    """Reconstruye el índice de los modelos indicados (todos por defecto). Devuelve los términos creados."""
+    from .models import TerminoBusqueda
+
+    total = 0
+    for etiqueta in etiquetas or CAMPOS:
+        modelo = global_apps.get_model(etiqueta)
+        campos = CAMPOS[etiqueta]
+        content_type = ContentType.objects.get_for_model(modelo)
+        registros = modelo._default_manager.order_by('pk').only('pk', *[campo for campo, _, _ in campos])
+        with transaction.atomic():
+            TerminoBusqueda.objects.filter(content_type=content_type).delete()
+            filas = []
+            for instancia in registros.iterator(chunk_size=lote):
+                filas += _filas(TerminoBusqueda, content_type.pk, instancia, campos)
+                if len(filas) >= lote:
+                    TerminoBusqueda.objects.bulk_create(filas)
+                    total += len(filas)
+                    filas = []
+            TerminoBusqueda.objects.bulk_create(filas)
+            total += len(filas)
+    _analizar(TerminoBusqueda)
+    return total
+
+
+def _analizar(modelo_termino):
+    # Sin estadísticas, SQLite agrupa recorriendo el índice (content_type,
+    # object_id) en vez de usar los rangos por término
+    if connection.vendor in ('sqlite', 'postgresql'):
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(modelo_termino._meta.db_table)}')
+
+
+def _prefijo(termino):
+    if connection.vendor == 'postgresql':
+        # LIKE 'prefijo%' usa el índice varchar_pattern_ops
+        return Q(termino__startswith=termino)
+    # En SQLite LIKE no usa índices (no distingue mayúsculas); un rango con la
+    # collation binaria sí. Los términos solo tienen [0-9a-z].
+    return Q(termino__gte=termino, termino__lt=termino[:-1] + chr(ord(termino[-1]) + 1))
+
+
+def coincidencias(modelo, texto):
+    """
+    Devuelve un queryset de TerminoBusqueda agrupado por object_id con los
+    registros que contienen todos los términos de `texto`, anotado con
+    `relevancia`, o None si el texto no tiene términos.
+    """
+    from .models import TerminoBusqueda
+
+    buscados = list(dict.fromkeys(terminos(texto)))[:MAX_TERMINOS]
+    if not buscados:
+        return None
+    condiciones = [_prefijo(termino) for termino in buscados]
+    cubiertos = reduce(lambda a, b: a + b, [
+        Max(Case(When(condicion, then=Value(1)), default=Value(0), output_field=IntegerField()))
+        for condicion in condiciones
+    ])
+    return (
+        TerminoBusqueda.objects
+        .filter(content_type=ContentType.objects.get_for_model(modelo))
+        .filter(reduce(or_, condiciones))
+        .values('object_id')
+        .annotate(
+            cubiertos=cubiertos,
+            # Las coincidencias exactas cuentan el doble que las de prefijo
+            relevancia=Sum('peso') + Coalesce(Sum('peso', filter=Q(termino__in=buscados)), 0),
+        )
+        .filter(cubiertos=len(buscados))
+    )
+
+
+def buscar(queryset, texto):
+    """Filtra `queryset` por `texto` y lo ordena por relevancia."""
+    encontrados = coincidencias(queryset.model, texto)
+    if encontrados is None:
+        return queryset
+    relevancia = encontrados.filter(object_id=OuterRef('pk')).values('relevancia')
+    return (
+        queryset
+        .filter(pk__in=encontrados.values('object_id'))
+        .annotate(relevancia=Coalesce(Subquery(relevancia), 0))
+        .order_by('-relevancia', *queryset.query.order_by or queryset.model._meta.ordering, 'pk')
+    )
+
+
+def paginar(request, queryset, por_pagina=POR_PAGINA):
+    """Devuelve la página pedida y los parámetros GET para los enlaces de la paginación."""
+    pagina = Paginator(queryset, por_pagina).get_page(request.GET.get('page'))
+    parametros = request.GET.copy()
+    parametros.pop('page', None)
+    return pagina, parametros.urlencode()
+
+
+def _actualizar_indice(sender, instance, raw=False, **kwargs):
+    if not raw:
+        indexar(instance)
+
+
+def _quitar_del_indice(sender, instance, **kwargs):
+    desindexar(instance)
+
+
+def _indexar_importados(sender, producto_ids=(), **kwargs):
+    if sender._meta.label_lower in CAMPOS:
+        indexar_ids(sender, producto_ids)
+
+
+def conectar():
+    from inventario.signals import catalogo_importado
+
+    catalogo_importado.connect(_indexar_importados, dispatch_uid='busqueda_catalogo')
+    for etiqueta in CAMPOS:
+        modelo = global_apps.get_model(etiqueta)
+        post_save.connect(_actualizar_indice, sender=modelo, dispatch_uid=f'busqueda_save_{etiqueta}')
+        post_delete.connect(_quitar_del_indice, sender=modelo, dispatch_uid=f'busqueda_delete_{etiqueta}')
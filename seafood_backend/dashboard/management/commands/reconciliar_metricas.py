@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.metricas import reconstruir_metricas
+
+
+class Command(BaseCommand):
+    help = 'Recalcula desde cero las métricas precalculadas del dashboard'
+
+    def handle(self, *args, **options):
+        total = reconstruir_metricas()
+        self.stdout.write(self.style.SUCCESS(f'{total} métricas reconstruidas'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.busqueda import CAMPOS, reindexar
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda de productos, clientes y proveedores'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modelo', action='append', dest='modelos',
+            help=f'Modelo a reindexar ({", ".join(CAMPOS)}); se puede repetir',
+        )
+        parser.add_argument('--lote', type=int, default=2000, help='Términos por INSERT')
+
+    def handle(self, *args, **options):
+        modelos = options['modelos']
+        desconocidos = set(modelos or []) - set(CAMPOS)
+        if desconocidos:
+            raise CommandError(f'Modelos sin índice de búsqueda: {", ".join(sorted(desconocidos))}')
+        total = reindexar(modelos, lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{total} términos indexados'))
@@ -0,0 +1,324 @@
+"""
+Métricas precalculadas del dashboard.
+
+Los hechos diarios, mensuales, por producto y los contadores se guardan en
+MetricaDashboard. Las señales de dashboard.signals los mantienen al día de forma
+incremental y reconstruir_metricas() los recalcula desde cero; se ejecuta
+periódicamente para corregir cualquier desvío (p. ej. escrituras con update()).
+
+Dentro de una transacción los deltas de sumar() se acumulan por clave y se
+aplican al hacer commit, con un UPDATE por clave: las filas de contadores, que
+comparten todas las escrituras, quedan bloqueadas solo durante ese UPDATE y no
+durante toda la transacción del llamador. Si la transacción (o el savepoint en
+que se sumaron) se revierte, sus deltas se descartan con ella.
+"""
+import threading
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Subquery, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from clientes.models import Cliente
+from inventario.models import Producto
+from pedidos.models import Pedido, DetallePedido
+from .models import MetricaDashboard
+
+ESTADOS_VENTA = ('completado', 'entregado')
+ESTADOS_SEGUIDOS = ('pendiente', 'en_proceso')
+UMBRAL_STOCK_BAJO = 10
+TOP_PRODUCTOS = 5
+
+_estado = threading.local()
+
+
+def clave_dia(fecha):
+    return f'ventas:dia:{fecha:%Y-%m-%d}'
+
+
+def clave_mes(fecha):
+    return f'ventas:mes:{fecha:%Y-%m}'
+
+
+def clave_producto(producto_id):
+    return f'ventas:producto:{producto_id}'
+
+
+def clave_pedidos(estado):
+    return f'pedidos:{estado}'
+
+
+def fecha_local(momento):
+    return timezone.localtime(momento).date() if timezone.is_aware(momento) else momento.date()
+
+
+def _aplicar(clave, grupo, delta, etiqueta):
+    """Suma `delta` a una métrica con un UPDATE basado en F(), creándola si no existe."""
+    if not delta:
+        return
+    actualizados = MetricaDashboard.objects.filter(clave=clave).update(
+        valor=F('valor') + delta, fecha_actualizacion=timezone.now()
+    )
+    if actualizados:
+        return
+    try:
+        with transaction.atomic():
+            MetricaDashboard.objects.create(clave=clave, grupo=grupo, valor=delta, etiqueta=etiqueta)
+    except IntegrityError:
+        # Otro proceso la creó entre medio
+        MetricaDashboard.objects.filter(clave=clave).update(
+            valor=F('valor') + delta, fecha_actualizacion=timezone.now()
+        )
+
+
+class _Lote:
+    """Deltas pendientes de una transacción, o de un savepoint dentro de ella."""
+
+    def __init__(self, contexto):
+        self.contexto = contexto
+        self.deltas = {}  # clave: [grupo, etiqueta, delta]
+        self.registro = None
+        self.aplicado = False
+
+    def vigente(self, conexion):
+        # Si su callback ya no está registrado, se revirtió con su transacción o savepoint
+        return not self.aplicado and self.registro in conexion.run_on_commit
+
+    def aplicar(self):
+        self.aplicado = True
+        for clave, (grupo, etiqueta, delta) in self.deltas.items():
+            _aplicar(clave, grupo, delta, etiqueta)
+
+
+def _lote_actual(conexion):
+    contexto = tuple(conexion.savepoint_ids)
+    lote = getattr(_estado, 'lote', None)
+    if lote is None or lote.contexto != contexto or not lote.vigente(conexion):
+        lote = _estado.lote = _Lote(contexto)
+        transaction.on_commit(lote.aplicar)
+        lote.registro = conexion.run_on_commit[-1]
+    return lote
+
+
+def sumar(clave, grupo, delta, etiqueta=''):
+    """
+    Suma `delta` a una métrica. Dentro de una transacción se acumula y se
+    aplica al commit; fuera de una, de inmediato.
+    """
+    if not delta:
+        return
+    conexion = transaction.get_connection()
+    if not conexion.in_atomic_block:
+        _aplicar(clave, grupo, delta, etiqueta)
+        return
+    pendiente = _lote_actual(conexion).deltas.setdefault(clave, [grupo, etiqueta, 0])
+    pendiente[1] = pendiente[1] or etiqueta
+    pendiente[2] += delta
+
+
+def sumar_venta(fecha_pedido, delta):
+    fecha = fecha_local(fecha_pedido)
+    sumar(clave_dia(fecha), 'dia', delta)
+    sumar(clave_mes(fecha), 'mes', delta)
+
+
+def fijar(metricas):
+    """Guarda una lista de MetricaDashboard (sin pk) con un único upsert."""
+    ahora = timezone.now()
+    for metrica in metricas:
+        metrica.fecha_actualizacion = ahora
+    MetricaDashboard.objects.bulk_create(
+        metricas,
+        update_conflicts=True,
+        unique_fields=['clave'],
+        update_fields=['grupo', 'etiqueta', 'valor', 'fecha_actualizacion'],
+    )
+
+
+def _contadores_productos():
+    conteo = Producto.objects.aggregate(
+        total=Count('pk'),
+        activos=Count('pk', filter=Q(activo=True)),
+        stock_bajo=Count('pk', filter=Q(activo=True, cantidad_stock__lte=UMBRAL_STOCK_BAJO)),
+    )
+    return [
+        MetricaDashboard(clave=f'productos:{nombre}', grupo='contador', valor=valor)
+        for nombre, valor in conteo.items()
+    ]
+
+
+def _contadores_clientes():
+    conteo = Cliente.objects.aggregate(
+        total=Count('pk'),
+        activos=Count('pk', filter=Q(activo=True)),
+    )
+    return [
+        MetricaDashboard(clave=f'clientes:{nombre}', grupo='contador', valor=valor)
+        for nombre, valor in conteo.items()
+    ]
+
+
+def contadores_producto(activo, cantidad_stock):
+    """Contadores de productos en que cuenta un producto con ese estado."""
+    contadores = ['productos:total']
+    if activo:
+        contadores.append('productos:activos')
+        if cantidad_stock <= UMBRAL_STOCK_BAJO:
+            contadores.append('productos:stock_bajo')
+    return contadores
+
+
+def contadores_cliente(activo):
+    """Contadores de clientes en que cuenta un cliente con ese estado."""
+    return ['clientes:total', 'clientes:activos'] if activo else ['clientes:total']
+
+
+def _sumar_cambios(cambios, contadores):
+    deltas = Counter()
+    for anterior, actual in cambios:
+        deltas.update(contadores(*actual) if actual else [])
+        deltas.subtract(contadores(*anterior) if anterior else [])
+    for clave, delta in deltas.items():
+        sumar(clave, 'contador', delta)
+
+
+def sumar_productos(cambios):
+    """
+    Mueve los contadores de productos según `cambios`: pares (anterior, actual)
+    con el estado (activo, cantidad_stock) de cada producto, o None si no existía.
+    """
+    _sumar_cambios(cambios, contadores_producto)
+
+
+def sumar_clientes(cambios):
+    """Como sumar_productos, con el estado (activo,) de cada cliente."""
+    _sumar_cambios(cambios, contadores_cliente)
+
+
+def etiquetar_productos(producto_ids):
+    """Copia el nombre actual de los productos a la etiqueta de sus métricas de ventas."""
+    claves = {clave_producto(producto_id): producto_id for producto_id in producto_ids}
+    filas = list(MetricaDashboard.objects.filter(clave__in=claves).only('clave', 'etiqueta'))
+    if not filas:
+        return
+    nombres = dict(
+        Producto.objects.filter(pk__in=[claves[fila.clave] for fila in filas]).values_list('pk', 'nombre')
+    )
+    cambiadas = []
+    for fila in filas:
+        nombre = nombres.get(claves[fila.clave])
+        if nombre is not None and nombre != fila.etiqueta:
+            fila.etiqueta = nombre
+            cambiadas.append(fila)
+    MetricaDashboard.objects.bulk_update(cambiadas, ['etiqueta'])
+
+
+def recontar_productos():
+    fijar(_contadores_productos())
+
+
+def recontar_clientes():
+    fijar(_contadores_clientes())
+
+
+def reconstruir_metricas():
+    """Recalcula todas las métricas con consultas agrupadas y reemplaza la tabla."""
+    vendidos = Pedido.objects.filter(estado__in=ESTADOS_VENTA)
+    metricas = _contadores_productos() + _contadores_clientes()
+
+    conteo_pedidos = Pedido.objects.aggregate(**{
+        estado: Count('pk', filter=Q(estado=estado)) for estado in ESTADOS_SEGUIDOS
+    })
+    metricas += [
+        MetricaDashboard(clave=clave_pedidos(estado), grupo='contador', valor=valor)
+        for estado, valor in conteo_pedidos.items()
+    ]
+
+    por_dia = vendidos.annotate(dia=TruncDate('fecha_pedido')).values('dia').annotate(total=Sum('total'))
+    metricas += [
+        MetricaDashboard(clave=clave_dia(fila['dia']), grupo='dia', valor=fila['total'] or 0)
+        for fila in por_dia
+    ]
+
+    por_mes = vendidos.annotate(mes=TruncMonth('fecha_pedido')).values('mes').annotate(total=Sum('total'))
+    metricas += [
+        MetricaDashboard(clave=clave_mes(fila['mes']), grupo='mes', valor=fila['total'] or 0)
+        for fila in por_mes
+    ]
+
+    por_producto = (
+        DetallePedido.objects.filter(pedido__estado__in=ESTADOS_VENTA)
+        .values('producto', 'producto__nombre')
+        .annotate(total=Sum(F('cantidad') * F('precio_unitario')))
+    )
+    metricas += [
+        MetricaDashboard(
+            clave=clave_producto(fila['producto']),
+            grupo='producto',
+            etiqueta=fila['producto__nombre'],
+            valor=fila['total'] or 0,
+        )
+        for fila in por_producto
+    ]
+
+    with transaction.atomic():
+        MetricaDashboard.objects.all().delete()
+        fijar(metricas)
+        # Lo sumado antes en esta misma transacción ya está en los totales recalculados
+        lote = getattr(_estado, 'lote', None)
+        if lote is not None and lote.vigente(transaction.get_connection()):
+            lote.deltas.clear()
+    return len(metricas)
+
+
+def leer_metricas(hoy=None):
+    """
+    Devuelve las métricas que usa el dashboard con una sola consulta: los
+    contadores, los días y meses necesarios y los productos más vendidos.
+    """
+    hoy = hoy or timezone.localdate()
+    ayer = hoy - timedelta(days=1)
+    meses = []
+    mes = (hoy - timedelta(days=90)).replace(day=1)
+    while mes <= hoy:
+        meses.append(mes)
+        mes = (mes + timedelta(days=32)).replace(day=1)
+
+    claves = [
+        clave_dia(hoy), clave_dia(ayer),
+        clave_pedidos('pendiente'), clave_pedidos('en_proceso'),
+        'productos:total', 'productos:activos', 'productos:stock_bajo',
+        'clientes:total', 'clientes:activos',
+    ] + [clave_mes(mes) for mes in meses]
+    top = MetricaDashboard.objects.filter(grupo='producto').order_by('-valor').values('pk')[:TOP_PRODUCTOS]
+
+    filas = list(MetricaDashboard.objects.filter(Q(clave__in=claves) | Q(pk__in=Subquery(top))))
+    if not filas:
+        # Tabla vacía (p. ej. recién migrada): se construye una vez
+        reconstruir_metricas()
+        filas = list(MetricaDashboard.objects.filter(Q(clave__in=claves) | Q(pk__in=Subquery(top))))
+
+    valores = {fila.clave: fila.valor for fila in filas}
+    return {
+        'ventas_hoy': valores.get(clave_dia(hoy), Decimal('0.00')),
+        'ventas_ayer': valores.get(clave_dia(ayer), Decimal('0.00')),
+        'pedidos_pendientes': int(valores.get(clave_pedidos('pendiente'), 0)),
+        'pedidos_en_proceso': int(valores.get(clave_pedidos('en_proceso'), 0)),
+        'productos_total': int(valores.get('productos:total', 0)),
+        'productos_activos': int(valores.get('productos:activos', 0)),
+        'productos_stock_bajo': int(valores.get('productos:stock_bajo', 0)),
+        'clientes_total': int(valores.get('clientes:total', 0)),
+        'clientes_activos': int(valores.get('clientes:activos', 0)),
+        'ventas_mensuales': [
+            {'month': mes, 'total': valores[clave_mes(mes)]}
+            for mes in meses if clave_mes(mes) in valores
+        ],
+        'productos_top': sorted(
+            ({'nombre': fila.etiqueta, 'ventas': fila.valor} for fila in filas if fila.grupo == 'producto'),
+            key=lambda fila: fila['ventas'],
+            reverse=True,
+        ),
+    }
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricaDashboard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grupo', models.CharField(choices=[('contador', 'Contador'), ('dia', 'Ventas Diarias'), ('mes', 'Ventas Mensuales'), ('producto', 'Ventas por Producto')], max_length=20)),
+                ('clave', models.CharField(max_length=100, unique=True)),
+                ('etiqueta', models.CharField(blank=True, max_length=200)),
+                ('valor', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Métrica del Dashboard',
+                'verbose_name_plural': 'Métricas del Dashboard',
+                'indexes': [models.Index(fields=['grupo', '-valor'], name='dashboard_m_grupo_6b88ad_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:04
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Copia de dashboard.busqueda al momento de esta migración: la migración no
+# debe cambiar si el módulo cambia después
+LONGITUD_TERMINO = 64
+LOTE = 2000
+_SEPARADOR = re.compile(r'[^0-9a-z]+')
+CAMPOS = {
+    'inventario.producto': [('nombre', 3, False), ('codigo', 3, True), ('descripcion', 1, False)],
+    'clientes.cliente': [('nombre', 3, False), ('rut', 3, True), ('email', 2, False)],
+    'proveedores.proveedor': [
+        ('nombre', 3, False), ('rut', 3, True), ('email', 2, False), ('contacto', 2, False),
+    ],
+}
+
+
+def _terminos(texto):
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return [termino[:LONGITUD_TERMINO] for termino in _SEPARADOR.split(texto) if termino]
+
+
+def _pesos(instancia, campos):
+    pesos = {}
+    for campo, peso, compacto in campos:
+        valor = getattr(instancia, campo)
+        if not valor:
+            continue
+        partes = _terminos(valor)
+        if compacto and len(partes) > 1:
+            partes.append(''.join(partes)[:LONGITUD_TERMINO])
+        for termino in partes:
+            pesos[termino] = max(pesos.get(termino, 0), peso)
+    return pesos
+
+
+def poblar_indice(apps, schema_editor):
+    TerminoBusqueda = apps.get_model('dashboard', 'TerminoBusqueda')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    for etiqueta, campos in CAMPOS.items():
+        modelo = apps.get_model(etiqueta)
+        content_type, _ = ContentType.objects.get_or_create(
+            app_label=modelo._meta.app_label, model=modelo._meta.model_name
+        )
+        registros = modelo._default_manager.order_by('pk').only('pk', *[campo for campo, _, _ in campos])
+        filas = []
+        for instancia in registros.iterator(chunk_size=LOTE):
+            filas += [
+                TerminoBusqueda(content_type_id=content_type.pk, object_id=instancia.pk, termino=termino, peso=peso)
+                for termino, peso in _pesos(instancia, campos).items()
+            ]
+            if len(filas) >= LOTE:
+                TerminoBusqueda.objects.bulk_create(filas)
+                filas = []
+        TerminoBusqueda.objects.bulk_create(filas)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0001_initial'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('dashboard', '0002_metricadashboard'),
+        ('inventario', '0005_indices_paginacion'),
+        ('proveedores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminoBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('termino', models.CharField(max_length=64)),
+                ('peso', models.PositiveSmallIntegerField(default=1)),
+                ('content_type', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Término de Búsqueda',
+                'verbose_name_plural': 'Términos de Búsqueda',
+                'indexes': [models.Index(fields=['content_type', 'termino'], name='dashboard_termino_prefijo', opclasses=['int4_ops', 'varchar_pattern_ops']), models.Index(fields=['content_type', 'object_id'], name='dashboard_t_content_9e200a_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_indice, migrations.RunPython.noop),
+    ]
@@ -206,3 +206,52 @@ class ParticipacionCapacitacion(models.Model):
 
     def __str__(self):
         return f"{self.empleado} - {self.capacitacion}"
+
+class MetricaDashboard(models.Model):
+    GRUPO_CHOICES = [
+        ('contador', 'Contador'),
+        ('dia', 'Ventas Diarias'),
+        ('mes', 'Ventas Mensuales'),
+        ('producto', 'Ventas por Producto'),
+    ]
+
+    grupo = models.CharField(max_length=20, choices=GRUPO_CHOICES)
+    clave = models.CharField(max_length=100, unique=True)
+    etiqueta = models.CharField(max_length=200, blank=True)
+    valor = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Métrica del Dashboard'
+        verbose_name_plural = 'Métricas del Dashboard'
+        indexes = [
+            models.Index(fields=['grupo', '-valor']),
+        ]
+
+    def __str__(self):
+        return f'{self.clave} = {self.valor}'
+
+class TerminoBusqueda(models.Model):
+    """Índice invertido de búsqueda: un término normalizado por fila (ver dashboard.busqueda)."""
+    # Sin índice propio: los dos índices compuestos empiezan por content_type
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, db_index=False)
+    object_id = models.PositiveBigIntegerField()
+    termino = models.CharField(max_length=64)
+    peso = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        verbose_name = 'Término de Búsqueda'
+        verbose_name_plural = 'Términos de Búsqueda'
+        indexes = [
+            # Búsqueda por prefijo. En PostgreSQL, varchar_pattern_ops permite
+            # usar el índice con LIKE 'prefijo%' sea cual sea la collation.
+            models.Index(
+                fields=['content_type', 'termino'],
+                name='dashboard_termino_prefijo',
+                opclasses=['int4_ops', 'varchar_pattern_ops'],
+            ),
+            models.Index(fields=['content_type', 'object_id']),
+        ]
+
+    def __str__(self):
+        return self.termino
@@ -0,0 +1,199 @@
+from django.db.models import F, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from clientes.models import Cliente
+from inventario.models import Producto
+from inventario.signals import catalogo_importado, stock_modificado
+from pedidos.models import Pedido, DetallePedido
+from . import metricas
+from .models import MetricaDashboard
+
+
+def _valores_cargados(instance, *campos):
+    # Se lee __dict__ para no disparar una consulta por cada campo diferido
+    valores = tuple(instance.__dict__.get(campo) for campo in campos)
+    if instance.pk is None or any(valor is None for valor in valores):
+        return None
+    return valores
+
+
+def _recordar_al_cargar(modelo, recordar):
+    """
+    Guarda recordar(instance) en _metricas_original cuando la fila se lee de la
+    base (from_db, o refresh_from_db de todos los campos), igual que
+    inventario.historial: las instancias creadas en memoria no pagan nada y,
+    sin esa foto, se tratan como cargadas con campos diferidos.
+    """
+    cargar = modelo.from_db.__func__
+    refrescar = modelo.refresh_from_db
+
+    def from_db(cls, db, field_names, values):
+        instance = cargar(cls, db, field_names, values)
+        instance._metricas_original = recordar(instance)
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        refrescar(self, using, fields, **kwargs)
+        # Con `fields` (p. ej. al leer un campo diferido) el resto puede traer cambios sin guardar
+        if fields is None:
+            self._metricas_original = recordar(self)
+
+    modelo.from_db = classmethod(from_db)
+    modelo.refresh_from_db = refresh_from_db
+
+
+def _original(instance):
+    return getattr(instance, '_metricas_original', None)
+
+
+_recordar_al_cargar(Pedido, lambda instance: _valores_cargados(instance, 'estado', 'total', 'fecha_pedido'))
+
+
+def _ventas_por_producto(pedido_id):
+    return (
+        DetallePedido.objects.filter(pedido_id=pedido_id)
+        .values('producto', 'producto__nombre')
+        .annotate(total=Sum(F('cantidad') * F('precio_unitario')))
+    )
+
+
+def _aplicar_pedido(estado, total, fecha_pedido, signo, pedido_id=None):
+    if estado in metricas.ESTADOS_SEGUIDOS:
+        metricas.sumar(metricas.clave_pedidos(estado), 'contador', signo)
+    if estado in metricas.ESTADOS_VENTA:
+        metricas.sumar_venta(fecha_pedido, signo * total)
+        if pedido_id is not None:
+            for fila in _ventas_por_producto(pedido_id):
+                metricas.sumar(
+                    metricas.clave_producto(fila['producto']), 'producto',
+                    signo * fila['total'], etiqueta=fila['producto__nombre'],
+                )
+
+
+@receiver(post_save, sender=Pedido)
+def actualizar_metricas_pedido(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    original = None if created else _original(instance)
+    actual = (instance.estado, instance.total, instance.fecha_pedido)
+    # Si se cargó con campos diferidos no hay base para el delta; lo corrige la reconciliación
+    if (created or original is not None) and original != actual:
+        # Las ventas por producto solo se mueven cuando el pedido entra o sale de
+        # un estado de venta; los cambios de líneas los registra DetallePedido.
+        cambia_venta = (
+            original is None
+            or (original[0] in metricas.ESTADOS_VENTA) != (instance.estado in metricas.ESTADOS_VENTA)
+        )
+        if original is not None:
+            _aplicar_pedido(*original, -1, instance.pk if cambia_venta else None)
+        _aplicar_pedido(*actual, 1, instance.pk if cambia_venta else None)
+    instance._metricas_original = actual
+
+
+@receiver(post_delete, sender=Pedido)
+def descontar_metricas_pedido(sender, instance, **kwargs):
+    # Los detalles se eliminan antes en cascada y ya descontaron sus ventas
+    if _original(instance) is not None:
+        estado = _original(instance)[0]
+        if estado in metricas.ESTADOS_SEGUIDOS:
+            metricas.sumar(metricas.clave_pedidos(estado), 'contador', -1)
+
+
+def _recordar_detalle(instance):
+    valores = _valores_cargados(instance, 'producto_id', 'cantidad', 'precio_unitario')
+    return valores and (valores[0], valores[1] * valores[2])
+
+
+_recordar_al_cargar(DetallePedido, _recordar_detalle)
+
+
+def _aplicar_detalle(detalle, producto_id, subtotal, signo):
+    pedido = Pedido.objects.filter(pk=detalle.pedido_id).values('estado', 'fecha_pedido').first()
+    if pedido is None or pedido['estado'] not in metricas.ESTADOS_VENTA:
+        return
+    metricas.sumar(metricas.clave_producto(producto_id), 'producto', signo * subtotal)
+    # El total del pedido se recalcula con un UPDATE que no dispara señales
+    metricas.sumar_venta(pedido['fecha_pedido'], signo * subtotal)
+
+
+@receiver(post_save, sender=DetallePedido)
+def actualizar_metricas_detalle(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    original = None if created else _original(instance)
+    actual = (instance.producto_id, instance.subtotal())
+    if (created or original is not None) and original != actual:
+        if original is not None:
+            _aplicar_detalle(instance, *original, -1)
+        _aplicar_detalle(instance, *actual, 1)
+    instance._metricas_original = actual
+
+
+@receiver(post_delete, sender=DetallePedido)
+def descontar_metricas_detalle(sender, instance, **kwargs):
+    if _original(instance) is not None:
+        _aplicar_detalle(instance, *_original(instance), -1)
+
+
+_recordar_al_cargar(Producto, lambda instance: _valores_cargados(instance, 'activo', 'cantidad_stock'))
+
+
+@receiver(post_save, sender=Producto)
+def actualizar_metricas_producto(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    original = None if created else _original(instance)
+    actual = (instance.activo, instance.cantidad_stock)
+    if (created or original is not None) and original != actual:
+        metricas.sumar_productos([(original, actual)])
+    instance._metricas_original = actual
+    if not created:
+        MetricaDashboard.objects.filter(clave=metricas.clave_producto(instance.pk)).update(etiqueta=instance.nombre)
+
+
+@receiver(post_delete, sender=Producto)
+def descontar_metricas_producto(sender, instance, **kwargs):
+    if _original(instance) is not None:
+        metricas.sumar_productos([(_original(instance), None)])
+
+
+@receiver(stock_modificado)
+def actualizar_stock_bajo(sender, existencias=None, **kwargs):
+    # existencias: {producto_id: (stock anterior, stock actual)} leído dentro
+    # de la transacción del movimiento. Solo importan los que cruzan el umbral.
+    cruces = {
+        producto_id: 1 if actual <= metricas.UMBRAL_STOCK_BAJO else -1
+        for producto_id, (anterior, actual) in (existencias or {}).items()
+        if (anterior <= metricas.UMBRAL_STOCK_BAJO) != (actual <= metricas.UMBRAL_STOCK_BAJO)
+    }
+    if cruces:
+        activos = Producto.objects.filter(pk__in=cruces, activo=True).values_list('pk', flat=True)
+        metricas.sumar('productos:stock_bajo', 'contador', sum(cruces[pk] for pk in activos))
+
+
+@receiver(catalogo_importado, sender=Producto)
+def actualizar_metricas_catalogo(sender, producto_ids, estados=None, **kwargs):
+    # La importación escribe con un upsert masivo, sin post_save
+    metricas.sumar_productos((estados or {}).values())
+    metricas.etiquetar_productos(producto_ids)
+
+
+_recordar_al_cargar(Cliente, lambda instance: _valores_cargados(instance, 'activo'))
+
+
+@receiver(post_save, sender=Cliente)
+def actualizar_metricas_cliente(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    original = None if created else _original(instance)
+    actual = (instance.activo,)
+    if (created or original is not None) and original != actual:
+        metricas.sumar_clientes([(original, actual)])
+    instance._metricas_original = actual
+
+
+@receiver(post_delete, sender=Cliente)
+def descontar_metricas_cliente(sender, instance, **kwargs):
+    if _original(instance) is not None:
+        metricas.sumar_clientes([(_original(instance), None)])
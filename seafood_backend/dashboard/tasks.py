@@ -0,0 +1,8 @@
+from celery import shared_task
+
+from .metricas import reconstruir_metricas
+
+
+@shared_task
+def reconciliar_metricas():
+    return reconstruir_metricas()
@@ -1,3 +1,101 @@
+from decimal import Decimal
+
+from django.db import connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from clientes.models import Cliente
+from inventario.models import Producto
+from .metricas import reconstruir_metricas, sumar
+from .models import MetricaDashboard
+
+
+def valor(clave):
+    return MetricaDashboard.objects.filter(clave=clave).values_list('valor', flat=True).first() or 0
+
+
+class MetricasProductoTests(TestCase):
+    def crear_producto(self, **campos):
+        return Producto.objects.create(nombre='Salmón', precio=Decimal('10.00'), cantidad_stock=100, **campos)
+
+    def test_cambios_de_una_instancia_cargada(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            producto = Producto.objects.get(pk=self.crear_producto().pk)
+        self.assertEqual((valor('productos:total'), valor('productos:activos')), (1, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            producto.activo = False
+            producto.save()
+        self.assertEqual((valor('productos:total'), valor('productos:activos')), (1, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Producto.objects.get(pk=producto.pk).delete()
+        self.assertEqual((valor('productos:total'), valor('productos:activos')), (0, 0))
+
+    def test_refresh_from_db_toma_una_foto_nueva(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            producto = self.crear_producto()
+        Producto.objects.filter(pk=producto.pk).update(activo=False)
+        reconstruir_metricas()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            producto.refresh_from_db()
+            producto.activo = True
+            producto.save()
+
+        self.assertEqual(valor('productos:activos'), 1)
+
+
+class MetricasClienteTests(TestCase):
+    def test_altas_bajas_y_cambios_de_activo_sin_recontar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            clientes = [
+                Cliente.objects.create(
+                    nombre=f'Cliente {i}', rut=str(i), email=f'cliente{i}@ejemplo.cl',
+                    telefono='123', direccion='Dirección',
+                )
+                for i in range(3)
+            ]
+        self.assertEqual((valor('clientes:total'), valor('clientes:activos')), (3, 3))
+
+        cliente = Cliente.objects.get(pk=clientes[0].pk)
+        cliente.activo = False
+        with CaptureQueriesContext(connection) as consultas, self.captureOnCommitCallbacks(execute=True):
+            cliente.save()
+        self.assertFalse([consulta for consulta in consultas if 'COUNT(' in consulta['sql']])
+        self.assertEqual((valor('clientes:total'), valor('clientes:activos')), (3, 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cliente.nombre = 'Otro nombre'
+            cliente.save()
+            cliente.delete()
+            Cliente.objects.get(pk=clientes[1].pk).delete()
+        self.assertEqual((valor('clientes:total'), valor('clientes:activos')), (1, 1))
+
+
+class SumarTests(TestCase):
+    def test_acumula_hasta_el_commit_con_un_update_por_clave(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            for _ in range(3):
+                Producto.objects.create(nombre='Salmón', precio=Decimal('10.00'), cantidad_stock=100)
+            self.assertFalse(MetricaDashboard.objects.exists())
+
+        with CaptureQueriesContext(connection) as consultas:
+            for callback in callbacks:
+                callback()
+        escrituras = [consulta for consulta in consultas if 'dashboard_metricadashboard' in consulta['sql']]
+        self.assertEqual(len([consulta for consulta in escrituras if consulta['sql'].startswith('INSERT')]), 2)
+        self.assertEqual((valor('productos:total'), valor('productos:activos')), (3, 3))
+
+    def test_descarta_lo_sumado_en_un_savepoint_revertido(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            sumar('prueba', 'contador', 1)
+            try:
+                with transaction.atomic():
+                    sumar('prueba', 'contador', 10)
+                    raise ValueError
+            except ValueError:
+                pass
+            sumar('prueba', 'contador', 100)
+        self.assertEqual(valor('prueba'), 101)
 
-# Create your tests here.
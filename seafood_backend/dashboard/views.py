@@ -1,104 +1,42 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Count, F, ExpressionWrapper, DecimalField
-from django.db.models.functions import TruncMonth, TruncDay
-from django.utils import timezone
-from datetime import datetime, timedelta
 from decimal import Decimal
-from django.db import transaction
-from django.core.exceptions import ObjectDoesNotExist
-from inventario.models import Producto
-from pedidos.models import Pedido, DetallePedido
-from clientes.models import Cliente
+from .metricas import leer_metricas
 
 @login_required
 def index(request):
     try:
-        # Obtener fecha actual y de ayer
-        hoy = timezone.now().date()
-        ayer = hoy - timedelta(days=1)
-        
-        # Ventas del día y cambio porcentual
-        ventas_hoy = Pedido.objects.filter(
-            fecha_pedido__date=hoy,
-            estado__in=['completado', 'entregado']  # Solo pedidos completados
-        ).aggregate(
-            total=Sum('total', default=Decimal('0.00'))
-        )['total'] or Decimal('0.00')
-        
-        ventas_ayer = Pedido.objects.filter(
-            fecha_pedido__date=ayer,
-            estado__in=['completado', 'entregado']
-        ).aggregate(
-            total=Sum('total', default=Decimal('0.00'))
-        )['total'] or Decimal('0.00')
+        # Todas las métricas salen de la tabla precalculada en una sola consulta
+        metricas = leer_metricas()
+        ventas_hoy = metricas['ventas_hoy']
+        ventas_ayer = metricas['ventas_ayer']
         
         # Cálculo seguro del cambio porcentual
         sales_change = Decimal('0.00')
         if ventas_ayer and ventas_ayer != 0:
             sales_change = ((ventas_hoy - ventas_ayer) / ventas_ayer) * 100
-        
-        # Estadísticas de pedidos con validación de estados
-        estados_validos = ['pendiente', 'en_proceso', 'completado', 'cancelado']
-        pending_orders = Pedido.objects.filter(estado='pendiente').count()
-        processing_orders = Pedido.objects.filter(estado='en_proceso').count()
-        
-        # Productos con stock bajo y totales con cacheo
-        low_stock_threshold = 10
-        productos_query = Producto.objects.all()
-        low_stock_products = productos_query.filter(
-            cantidad_stock__lte=low_stock_threshold,
-            activo=True
-        ).count()
-        total_products = productos_query.count()
-        active_products = productos_query.filter(activo=True).count()
-        
-        # Estadísticas de clientes optimizadas
-        clientes_query = Cliente.objects.all()
-        total_customers = clientes_query.count()
-        active_customers = clientes_query.filter(activo=True).count()
-        
-        # Ventas mensuales con mejor manejo de datos
-        tres_meses_atras = hoy - timedelta(days=90)
-        monthly_sales = list(Pedido.objects.filter(
-            fecha_pedido__gte=tres_meses_atras,
-            estado__in=['completado', 'entregado']
-        ).annotate(
-            month=TruncMonth('fecha_pedido')
-        ).values('month').annotate(
-            total=Sum('total', default=Decimal('0.00'))
-        ).order_by('month'))
-        
-        # Productos más vendidos con optimización
-        top_products = list(DetallePedido.objects.filter(
-            pedido__estado__in=['completado', 'entregado']
-        ).values(
-            'producto__nombre'
-        ).annotate(
-            ventas_totales=Sum(F('cantidad') * F('precio_unitario'))
-        ).order_by('-ventas_totales')[:5])
 
         context = {
             'daily_sales': float(ventas_hoy),
             'sales_change': float(sales_change),
-            'pending_orders': pending_orders,
-            'processing_orders': processing_orders,
-            'low_stock_products': low_stock_products,
-            'total_products': total_products,
-            'active_products': active_products,
-            'total_customers': total_customers,
-            'active_customers': active_customers,
+            'pending_orders': metricas['pedidos_pendientes'],
+            'processing_orders': metricas['pedidos_en_proceso'],
+            'low_stock_products': metricas['productos_stock_bajo'],
+            'total_products': metricas['productos_total'],
+            'active_products': metricas['productos_activos'],
+            'total_customers': metricas['clientes_total'],
+            'active_customers': metricas['clientes_activos'],
             'monthly_sales': [
                 {
                     'month': item['month'].strftime('%B %Y'),
                     'total': float(item['total'])
-                } for item in monthly_sales
+                } for item in metricas['ventas_mensuales']
             ],
             'top_products': [
                 {
-                    'name': item['producto__nombre'],
-                    'sales': float(item['ventas_totales'])
-                } for item in top_products
+                    'name': item['nombre'],
+                    'sales': float(item['ventas'])
+                } for item in metricas['productos_top']
             ],
         }
         
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class Config(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'finanzas'
+
+    def ready(self):
+        from . import cobranza  # noqa: F401
@@ -0,0 +1,242 @@
+"""
+Cierres mensuales y balance de comprobación.
+
+Cada cierre guarda en SaldoPeriodo, por cuenta, el saldo inicial, el debe, el
+haber y el saldo final del mes (solo sus propias líneas; el árbol se suma al
+consultar). Los meses se cierran en orden y cada cierre parte del anterior,
+así que cerrar un mes lee solo las líneas de ese mes. Una cuenta que tuvo
+movimientos sigue apareciendo en los cierres siguientes aunque su saldo sea
+cero: el último cierre contiene todas las cuentas con historia.
+
+El balance de un rango lee el cierre más cercano anterior al rango más las
+líneas posteriores a él, y para los meses cerrados completos dentro del rango
+suma los movimientos de los cierres en vez de las líneas.
+
+Los asientos fechados en un mes cerrado no se pueden contabilizar
+(finanzas.contabilidad); para corregirlos hay que reabrir el periodo. Por eso
+un mes con asientos sin contabilizar no se cierra: quedarían sin contabilizar
+para siempre.
+"""
+import calendar
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max, Min, Q, Subquery, Sum
+
+from .contabilidad import NATURALEZA, ancestros, bloquear_cierres, reconstruir_rutas
+from .models import AsientoContable, CuentaContable, LineaAsiento, SaldoPeriodo
+from .signals import saldos_actualizados
+
+CERO = Decimal('0.00')
+
+
+class AsientosSinContabilizar(Exception):
+    """Hay asientos sin contabilizar en los meses que se quieren cerrar."""
+
+
+def inicio_mes(fecha):
+    return fecha.replace(day=1)
+
+
+def fin_mes(fecha):
+    return fecha.replace(day=calendar.monthrange(fecha.year, fecha.month)[1])
+
+
+def mes_siguiente(fecha):
+    return fin_mes(fecha) + timedelta(days=1)
+
+
+def ultimo_cierre():
+    """Primer día del último mes cerrado, o None."""
+    return SaldoPeriodo.objects.aggregate(ultimo=Max('periodo'))['ultimo']
+
+
+def _lineas(filtro):
+    """{cuenta_id: (debe, haber)} de las líneas contabilizadas que cumplen `filtro`."""
+    return {
+        cuenta_id: (debe, haber)
+        for cuenta_id, debe, haber in LineaAsiento.objects.filter(filtro, asiento__contabilizado=True)
+        .values('cuenta_id').annotate(total_debe=Sum('debe'), total_haber=Sum('haber'))
+        .values_list('cuenta_id', 'total_debe', 'total_haber')
+    }
+
+
+def cerrar_periodos(hasta):
+    """
+    Cierra en orden todos los meses pendientes hasta el mes de `hasta`
+    inclusive. Devuelve los meses cerrados. Si alguno tiene asientos sin
+    contabilizar no cierra ninguno y lanza AsientosSinContabilizar.
+    """
+    tipos = dict(CuentaContable.objects.values_list('pk', 'tipo'))
+    with transaction.atomic():
+        # Espera a las contabilizaciones en curso; las siguientes esperan al cierre
+        bloquear_cierres()
+        ultimo = ultimo_cierre()
+        sin_contabilizar = AsientoContable.objects.filter(contabilizado=False, fecha__lt=mes_siguiente(hasta))
+        if ultimo:
+            sin_contabilizar = sin_contabilizar.filter(fecha__gte=mes_siguiente(ultimo))
+        sin_contabilizar = list(sin_contabilizar.order_by('pk').values_list('pk', flat=True))
+        if sin_contabilizar:
+            raise AsientosSinContabilizar(f'Asientos sin contabilizar en los meses a cerrar: {sin_contabilizar}')
+        if ultimo:
+            mes = mes_siguiente(ultimo)
+            saldos = {
+                cuenta_id: saldo * NATURALEZA[tipos[cuenta_id]]
+                for cuenta_id, saldo in SaldoPeriodo.objects.filter(periodo=ultimo).values_list('cuenta_id', 'saldo_final')
+            }
+        else:
+            primera = LineaAsiento.objects.filter(asiento__contabilizado=True).aggregate(
+                primera=Min('asiento__fecha')
+            )['primera']
+            if primera is None:
+                return []
+            mes, saldos = inicio_mes(primera), {}
+
+        cerrados = []
+        while mes <= inicio_mes(hasta):
+            movimientos = _lineas(Q(asiento__fecha__gte=mes, asiento__fecha__lte=fin_mes(mes)))
+            filas = []
+            for cuenta_id in saldos.keys() | movimientos.keys():
+                inicial = saldos.get(cuenta_id, CERO)
+                debe, haber = movimientos.get(cuenta_id, (CERO, CERO))
+                saldos[cuenta_id] = inicial + debe - haber
+                signo = NATURALEZA[tipos[cuenta_id]]
+                filas.append(SaldoPeriodo(
+                    cuenta_id=cuenta_id, periodo=mes, debe=debe, haber=haber,
+                    saldo_inicial=inicial * signo, saldo_final=saldos[cuenta_id] * signo,
+                ))
+            SaldoPeriodo.objects.bulk_create(filas, batch_size=500)
+            cerrados.append(mes)
+            mes = mes_siguiente(mes)
+        if cerrados:
+            transaction.on_commit(lambda: saldos_actualizados.send(sender=SaldoPeriodo, cuenta_ids=list(saldos)))
+    return cerrados
+
+
+def reabrir_periodos(desde):
+    """Borra los cierres del mes de `desde` en adelante. Devuelve cuántos meses reabrió."""
+    cierres = SaldoPeriodo.objects.filter(periodo__gte=inicio_mes(desde))
+    with transaction.atomic():
+        bloquear_cierres()
+        meses = cierres.values('periodo').distinct().count()
+        if meses:
+            cierres.delete()
+            transaction.on_commit(lambda: saldos_actualizados.send(sender=SaldoPeriodo, cuenta_ids=[]))
+    return meses
+
+
+def _saldos_al(fecha, tipos):
+    """{cuenta_id: debe - haber} acumulado al final de `fecha`: último cierre anterior más las líneas siguientes."""
+    limite = inicio_mes(fecha) if fecha == fin_mes(fecha) else inicio_mes(inicio_mes(fecha) - timedelta(days=1))
+    cierre = SaldoPeriodo.objects.filter(
+        periodo=Subquery(SaldoPeriodo.objects.filter(periodo__lte=limite).order_by('-periodo').values('periodo')[:1])
+    ).values_list('cuenta_id', 'periodo', 'saldo_final')
+
+    saldos, desde = defaultdict(Decimal), None
+    for cuenta_id, periodo, saldo in cierre:
+        saldos[cuenta_id] = saldo * NATURALEZA[tipos[cuenta_id]]
+        desde = mes_siguiente(periodo)
+    filtro = Q(asiento__fecha__lte=fecha)
+    if desde:
+        filtro &= Q(asiento__fecha__gte=desde)
+    if desde is None or desde <= fecha:
+        for cuenta_id, (debe, haber) in _lineas(filtro).items():
+            saldos[cuenta_id] += debe - haber
+    return saldos
+
+
+def _movimientos(desde, hasta, cerrado_hasta):
+    """{cuenta_id: (debe, haber)} del rango: los meses cerrados completos salen de los cierres."""
+    primero = desde if desde.day == 1 else mes_siguiente(desde)
+    ultimo = hasta if hasta == fin_mes(hasta) else inicio_mes(hasta) - timedelta(days=1)
+    if cerrado_hasta:
+        ultimo = min(ultimo, cerrado_hasta)
+    if not cerrado_hasta or primero > ultimo:
+        return _lineas(Q(asiento__fecha__gte=desde, asiento__fecha__lte=hasta))
+
+    movimientos = defaultdict(lambda: (CERO, CERO))
+    for cuenta_id, debe, haber in (
+        SaldoPeriodo.objects.filter(periodo__gte=primero, periodo__lte=inicio_mes(ultimo))
+        .values('cuenta_id').annotate(total_debe=Sum('debe'), total_haber=Sum('haber'))
+        .values_list('cuenta_id', 'total_debe', 'total_haber')
+    ):
+        movimientos[cuenta_id] = (debe, haber)
+    restantes = (
+        Q(asiento__fecha__gte=desde, asiento__fecha__lt=primero)
+        | Q(asiento__fecha__gt=ultimo, asiento__fecha__lte=hasta)
+    )
+    for cuenta_id, (debe, haber) in _lineas(restantes).items():
+        movimientos[cuenta_id] = (movimientos[cuenta_id][0] + debe, movimientos[cuenta_id][1] + haber)
+    return movimientos
+
+
+def balance_comprobacion(desde, hasta):
+    """
+    Balance de comprobación entre `desde` y `hasta` (inclusive) como árbol de
+    cuentas. Cada nodo suma su subárbol; las cuentas sin saldo ni movimientos
+    se omiten.
+    """
+    cuentas = list(CuentaContable.objects.order_by('codigo').values('pk', 'codigo', 'nombre', 'tipo', 'ruta'))
+    tipos = {cuenta['pk']: cuenta['tipo'] for cuenta in cuentas}
+    if not all(cuenta['ruta'] for cuenta in cuentas):
+        rutas = reconstruir_rutas()
+        for cuenta in cuentas:
+            cuenta['ruta'] = rutas[cuenta['pk']]
+
+    cierre = ultimo_cierre()
+    iniciales = _saldos_al(desde - timedelta(days=1), tipos)
+    movimientos = _movimientos(desde, hasta, fin_mes(cierre) if cierre else None)
+
+    # Valores propios en neto deudor, sumados a la cuenta y a cada ancestro
+    rutas = {cuenta['pk']: cuenta['ruta'] for cuenta in cuentas}
+    arbol = defaultdict(lambda: [CERO, CERO, CERO])
+    for cuenta_id in iniciales.keys() | movimientos.keys():
+        debe, haber = movimientos.get(cuenta_id, (CERO, CERO))
+        for pk in ancestros(rutas[cuenta_id]):
+            valores = arbol[pk]
+            valores[0] += iniciales.get(cuenta_id, CERO)
+            valores[1] += debe
+            valores[2] += haber
+
+    nodos, raices = {}, []
+    for cuenta in cuentas:
+        inicial, debe, haber = arbol.get(cuenta['pk'], (CERO, CERO, CERO))
+        if not (inicial or debe or haber):
+            continue
+        signo = NATURALEZA[cuenta['tipo']]
+        nodos[cuenta['pk']] = {
+            'id': cuenta['pk'],
+            'codigo': cuenta['codigo'],
+            'nombre': cuenta['nombre'],
+            'tipo': cuenta['tipo'],
+            'saldo_inicial': inicial * signo,
+            'debe': debe,
+            'haber': haber,
+            'saldo_final': (inicial + debe - haber) * signo,
+            'subcuentas': [],
+        }
+
+    # Se enlaza después de crear todos los nodos: el orden por código no
+    # garantiza que el padre vaya antes que sus subcuentas
+    for cuenta in cuentas:
+        if cuenta['pk'] not in nodos:
+            continue
+        camino = ancestros(cuenta['ruta'])
+        padre = nodos.get(camino[-2]) if len(camino) > 1 else None
+        (padre['subcuentas'] if padre else raices).append(nodos[cuenta['pk']])
+
+    total_debe = sum((debe for debe, _ in movimientos.values()), CERO)
+    total_haber = sum((haber for _, haber in movimientos.values()), CERO)
+    por_tipo = defaultdict(lambda: CERO)
+    for nodo in raices:
+        por_tipo[nodo['tipo']] += nodo['saldo_final']
+    return {
+        'desde': desde,
+        'hasta': hasta,
+        'cerrado_hasta': fin_mes(cierre) if cierre else None,
+        'cuentas': raices,
+        'totales': {'debe': total_debe, 'haber': total_haber, 'cuadra': total_debe == total_haber},
+        'saldos_por_tipo': dict(por_tipo),
+    }
@@ -0,0 +1,126 @@
+"""
+Cuentas por cobrar: saldo pendiente de las facturas y antigüedad de saldos.
+
+Factura.saldo_pendiente (total menos pagos) se guarda en la factura para no
+sumar los pagos de cada factura en cada consulta. Lo recalcula
+actualizar_saldos() con un UPDATE agregado, que además pasa la factura de
+emitida a pagada (o de vuelta) según su saldo; la llaman Factura.save() y los
+receptores de Pago de este módulo. Las borradores y
+anuladas no cambian de estado. Las cargas masivas de pagos (bulk_create) no
+disparan los receptores: deben llamar a actualizar_saldos().
+
+La antigüedad de saldos agrupa el saldo pendiente de las facturas emitidas por
+días de atraso respecto de fecha_vencimiento en una sola consulta con sumas
+condicionales, apoyada en el índice (estado, fecha_vencimiento).
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Factura, Pago
+from .signals import facturas_actualizadas
+
+CERO = Decimal('0.00')
+# (clave, días de atraso mínimos, máximos); None = sin límite
+TRAMOS = [
+    ('por_vencer', None, -1),
+    ('dias_0_30', 0, 30),
+    ('dias_31_60', 31, 60),
+    ('dias_61_90', 61, 90),
+    ('dias_90_mas', 91, None),
+]
+ESTADOS_AUTOMATICOS = ('emitida', 'pagada')
+
+
+def actualizar_saldos(factura_ids=None):
+    """
+    Recalcula saldo_pendiente (y emitida/pagada) de las facturas indicadas, o
+    de todas con None. Devuelve la cantidad de facturas actualizadas.
+    """
+    facturas = Factura.objects.all()
+    if factura_ids is not None:
+        factura_ids = list(factura_ids)
+        if not factura_ids:
+            return 0
+        facturas = facturas.filter(pk__in=factura_ids)
+    pagado = (
+        Pago.objects.filter(factura=OuterRef('pk')).order_by()
+        .values('factura').annotate(total=Sum('monto')).values('total')
+    )
+    with transaction.atomic():
+        actualizadas = facturas.update(saldo_pendiente=F('total') - Coalesce(
+            Subquery(pagado), Value(CERO), output_field=DecimalField(max_digits=12, decimal_places=2),
+        ))
+        automaticas = facturas.filter(estado__in=ESTADOS_AUTOMATICOS)
+        automaticas.filter(saldo_pendiente__lte=0).exclude(estado='pagada').update(estado='pagada')
+        automaticas.filter(saldo_pendiente__gt=0).exclude(estado='emitida').update(estado='emitida')
+        transaction.on_commit(lambda: facturas_actualizadas.send(sender=Factura, factura_ids=factura_ids))
+    return actualizadas
+
+
+@receiver(post_init, sender=Pago)
+def recordar_factura(sender, instance, **kwargs):
+    # Se lee __dict__ para no disparar una consulta si el campo está diferido
+    instance._factura_original = instance.__dict__.get('factura_id')
+
+
+@receiver(post_save, sender=Pago)
+def actualizar_saldo_pago(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Si el pago cambió de factura, la anterior también recupera su saldo
+    actualizar_saldos({instance.factura_id, instance._factura_original} - {None})
+    instance._factura_original = instance.factura_id
+
+
+@receiver(post_delete, sender=Pago)
+def devolver_saldo_pago(sender, instance, **kwargs):
+    actualizar_saldos([instance.factura_id])
+
+
+def _tramo(hoy, minimo, maximo):
+    """Filtro de fecha_vencimiento para un atraso entre `minimo` y `maximo` días."""
+    filtro = Q()
+    if minimo is not None:
+        filtro &= Q(fecha_vencimiento__lte=hoy - timedelta(days=minimo))
+    if maximo is not None:
+        filtro &= Q(fecha_vencimiento__gte=hoy - timedelta(days=maximo))
+    return filtro
+
+
+def antiguedad_saldos(fecha=None, cliente_id=None, por_cliente=False):
+    """
+    Saldo pendiente de las facturas emitidas a clientes por tramo de atraso a
+    `fecha` (hoy por defecto). Con `por_cliente` devuelve una fila por cliente
+    (una consulta agrupada); si no, el total de la cartera o del cliente.
+    """
+    hoy = fecha or timezone.localdate()
+    facturas = Factura.objects.filter(
+        tipo='emitida', estado='emitida', saldo_pendiente__gt=0, cliente__isnull=False,
+    )
+    if cliente_id is not None:
+        facturas = facturas.filter(cliente_id=cliente_id)
+    sumas = {
+        clave: Coalesce(
+            Sum('saldo_pendiente', filter=_tramo(hoy, minimo, maximo)), Value(CERO),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        )
+        for clave, minimo, maximo in TRAMOS
+    }
+    sumas['total'] = Coalesce(
+        Sum('saldo_pendiente'), Value(CERO), output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+    if not por_cliente:
+        return facturas.aggregate(**sumas)
+    return list(
+        facturas.order_by('cliente__nombre', 'cliente_id')
+        .values('cliente_id', nombre_cliente=F('cliente__nombre'))
+        .annotate(**sumas)
+    )
@@ -0,0 +1,248 @@
+"""
+Contabilización de asientos y saldos de cuentas.
+
+CuentaContable.saldo es el saldo de la cuenta más el de todas sus subcuentas,
+con el signo de su naturaleza: deudora (activo, gasto) = debe - haber,
+acreedora (pasivo, capital, ingreso) = haber - debe.
+
+Al contabilizar asientos se agrupan sus líneas por cuenta, se suman a cada
+cuenta y a todos sus ancestros (sacados de la ruta materializada) y se aplican
+con UPDATE ... SET saldo = saldo + CASE ... en la misma transacción que marca
+los asientos. Las cuentas se bloquean en orden de pk para que dos
+contabilizaciones que comparten ancestros no se bloqueen en cruz.
+
+Los asientos fechados en un mes ya cerrado (SaldoPeriodo) se rechazan. La
+comprobación y el cierre (finanzas.balances) toman el mismo candado
+(bloquear_cierres): sin él, un cierre podía leer las líneas de un mes mientras
+se contabilizaba un asiento de ese mes, que quedaba fuera del cierre.
+
+El comando conciliar_saldos reconstruye rutas y saldos desde las líneas si
+algo los desincroniza.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Max, Sum, Value, When
+from django.db.models.functions import Concat, Substr
+
+from .models import AsientoContable, CandadoCierre, CuentaContable, LineaAsiento, SaldoPeriodo
+from .signals import saldos_actualizados
+
+NATURALEZA = {'activo': 1, 'gasto': 1, 'pasivo': -1, 'capital': -1, 'ingreso': -1}
+LOTE = 500
+CERO = Decimal('0.00')
+
+
+class AsientoDescuadrado(Exception):
+    """El debe y el haber de un asiento no coinciden (o no tiene líneas)."""
+
+
+class PeriodoCerrado(Exception):
+    """El asiento cae en un mes ya cerrado (finanzas.balances)."""
+
+
+def bloquear_cierres():
+    """Bloquea hasta el commit el candado que comparten cierres y contabilizaciones."""
+    CandadoCierre.objects.select_for_update().get_or_create(pk=1)
+
+
+def ancestros(ruta):
+    """Ids de la ruta '/1/5/12/', de la raíz a la propia cuenta."""
+    return [int(pk) for pk in ruta.strip('/').split('/') if pk]
+
+
+def reconstruir_rutas():
+    """
+    Recalcula la ruta de todas las cuentas desde cuenta_padre y guarda las
+    que cambiaron. Devuelve {cuenta_id: ruta}.
+    """
+    padres = dict(CuentaContable.objects.values_list('pk', 'cuenta_padre_id'))
+    actuales = dict(CuentaContable.objects.values_list('pk', 'ruta'))
+    rutas = {}
+    for pk in padres:
+        camino = []
+        while pk is not None and pk not in rutas:
+            if pk in camino:
+                raise ValueError(f'cuenta_padre forma un ciclo en la cuenta {pk}')
+            camino.append(pk)
+            pk = padres[pk]
+        ruta = rutas[pk] if pk is not None else '/'
+        for cuenta_id in reversed(camino):
+            ruta = rutas[cuenta_id] = f'{ruta}{cuenta_id}/'
+
+    corregidas = [CuentaContable(pk=pk, ruta=ruta) for pk, ruta in rutas.items() if actuales[pk] != ruta]
+    CuentaContable.objects.bulk_update(corregidas, ['ruta'], batch_size=LOTE)
+    return rutas
+
+
+def mover_cuenta(cuenta, ruta_anterior):
+    """
+    Fija la ruta de `cuenta` (recién creada o con otro padre) y la de su
+    subárbol, y traslada su saldo de los ancestros anteriores a los nuevos.
+    """
+    ruta_padre = '/'
+    if cuenta.cuenta_padre_id:
+        ruta_padre = CuentaContable.objects.values_list('ruta', flat=True).get(pk=cuenta.cuenta_padre_id)
+        if not ruta_padre:
+            ruta_padre = reconstruir_rutas()[cuenta.cuenta_padre_id]
+    if ruta_anterior and ruta_padre.startswith(ruta_anterior):
+        raise ValueError('Una cuenta no puede colgar de sí misma ni de una subcuenta suya')
+    cuenta.ruta = f'{ruta_padre}{cuenta.pk}/'
+
+    if not ruta_anterior:
+        CuentaContable.objects.filter(pk=cuenta.pk).update(ruta=cuenta.ruta)
+        return
+    CuentaContable.objects.filter(ruta__startswith=ruta_anterior).update(
+        ruta=Concat(Value(cuenta.ruta), Substr('ruta', len(ruta_anterior) + 1))
+    )
+    saldo, tipo = CuentaContable.objects.values_list('saldo', 'tipo').get(pk=cuenta.pk)
+    neto = saldo * NATURALEZA[tipo]
+    movimientos = defaultdict(Decimal)
+    for pk in ancestros(ruta_anterior)[:-1]:
+        movimientos[pk] -= neto
+    for pk in ancestros(cuenta.ruta)[:-1]:
+        movimientos[pk] += neto
+    _aplicar(movimientos)
+
+
+def _aplicar(netos):
+    """Suma a cada cuenta su neto (debe - haber) con el signo de su naturaleza."""
+    netos = {pk: neto for pk, neto in netos.items() if neto}
+    if not netos:
+        return
+    ids = sorted(netos)
+    tipos = dict(
+        CuentaContable.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk', 'tipo')
+    )
+    for inicio in range(0, len(ids), LOTE):
+        bloque = ids[inicio:inicio + LOTE]
+        CuentaContable.objects.filter(pk__in=bloque).update(saldo=F('saldo') + Case(
+            *[When(pk=pk, then=Value(netos[pk] * NATURALEZA[tipos[pk]])) for pk in bloque],
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ))
+    transaction.on_commit(lambda: saldos_actualizados.send(sender=CuentaContable, cuenta_ids=ids))
+
+
+def aplicar_netos(netos):
+    """Aplica {cuenta_id: debe - haber} a esas cuentas y a todos sus ancestros."""
+    rutas = dict(CuentaContable.objects.filter(pk__in=list(netos)).values_list('pk', 'ruta'))
+    if not all(rutas.values()):
+        rutas = reconstruir_rutas()
+    acumulado = defaultdict(Decimal)
+    for cuenta_id, neto in netos.items():
+        for pk in ancestros(rutas[cuenta_id]):
+            acumulado[pk] += neto
+    _aplicar(acumulado)
+
+
+def contabilizar(asiento_ids):
+    """
+    Contabiliza los asientos pendientes de `asiento_ids`: comprueba que cada uno
+    cuadre y suma sus líneas a los saldos. Los ya contabilizados se ignoran.
+    Devuelve los ids contabilizados.
+    """
+    with transaction.atomic():
+        pendientes = dict(
+            AsientoContable.objects.select_for_update()
+            .filter(pk__in=list(asiento_ids), contabilizado=False)
+            .values_list('pk', 'fecha')
+        )
+        if not pendientes:
+            return []
+        bloquear_cierres()
+        cerrado = SaldoPeriodo.objects.aggregate(ultimo=Max('periodo'))['ultimo']
+        if cerrado:
+            # Cualquier fecha anterior al mes siguiente al último cierre
+            limite = (cerrado + timedelta(days=32)).replace(day=1)
+            en_cierre = sorted(pk for pk, fecha in pendientes.items() if fecha < limite)
+            if en_cierre:
+                raise PeriodoCerrado(f'Asientos en periodos cerrados: {en_cierre}')
+        pendientes = list(pendientes)
+        lineas = LineaAsiento.objects.filter(asiento_id__in=pendientes)
+        totales = {
+            asiento_id: (debe, haber)
+            for asiento_id, debe, haber in lineas.values('asiento_id')
+            .annotate(total_debe=Sum('debe'), total_haber=Sum('haber'))
+            .values_list('asiento_id', 'total_debe', 'total_haber')
+        }
+        descuadrados = [pk for pk in pendientes if pk not in totales or totales[pk][0] != totales[pk][1]]
+        if descuadrados:
+            raise AsientoDescuadrado(f'Asientos sin cuadrar o sin líneas: {descuadrados}')
+
+        netos = dict(
+            lineas.values('cuenta_id').annotate(neto=Sum('debe') - Sum('haber')).values_list('cuenta_id', 'neto')
+        )
+        AsientoContable.objects.filter(pk__in=pendientes).update(contabilizado=True)
+        aplicar_netos(netos)
+    return pendientes
+
+
+def crear_asiento(creado_por, fecha, tipo, descripcion, lineas, referencia=''):
+    """
+    Crea un asiento con sus `lineas` (dicts con cuenta o cuenta_id, descripcion,
+    debe y haber) y lo contabiliza en la misma transacción.
+    """
+    objetos = []
+    for linea in lineas:
+        debe, haber = Decimal(linea.get('debe') or 0), Decimal(linea.get('haber') or 0)
+        if debe < 0 or haber < 0 or (debe > 0) == (haber > 0):
+            raise AsientoDescuadrado('Cada línea debe tener un importe positivo en el debe o en el haber')
+        cuenta_id = linea['cuenta'].pk if 'cuenta' in linea else linea['cuenta_id']
+        objetos.append(LineaAsiento(
+            cuenta_id=cuenta_id, descripcion=linea.get('descripcion', ''), debe=debe, haber=haber
+        ))
+    with transaction.atomic():
+        asiento = AsientoContable.objects.create(
+            fecha=fecha, tipo=tipo, descripcion=descripcion, referencia=referencia, creado_por=creado_por
+        )
+        for objeto in objetos:
+            objeto.asiento = asiento
+        LineaAsiento.objects.bulk_create(objetos)
+        contabilizar([asiento.pk])
+    asiento.contabilizado = True
+    return asiento
+
+
+def saldo_subarbol(cuenta, hasta=None):
+    """Saldo de `cuenta` y sus subcuentas calculado desde las líneas, opcionalmente a una fecha."""
+    lineas = LineaAsiento.objects.filter(cuenta__ruta__startswith=cuenta.ruta, asiento__contabilizado=True)
+    if hasta:
+        lineas = lineas.filter(asiento__fecha__lte=hasta)
+    totales = lineas.aggregate(debe=Sum('debe'), haber=Sum('haber'))
+    return ((totales['debe'] or CERO) - (totales['haber'] or CERO)) * NATURALEZA[cuenta.tipo]
+
+
+def conciliar_saldos(corregir=True):
+    """
+    Recalcula todas las rutas y saldos desde las líneas contabilizadas con una
+    sola consulta agrupada. Devuelve [(cuenta, saldo guardado, saldo calculado)]
+    de las cuentas que no coincidían; con `corregir` las actualiza.
+    """
+    with transaction.atomic():
+        rutas = reconstruir_rutas()
+        cuentas = list(CuentaContable.objects.select_for_update().order_by('pk').only('codigo', 'tipo', 'saldo'))
+        netos = (
+            LineaAsiento.objects.filter(asiento__contabilizado=True)
+            .values('cuenta_id').annotate(neto=Sum('debe') - Sum('haber'))
+            .values_list('cuenta_id', 'neto')
+        )
+        acumulado = defaultdict(Decimal)
+        for cuenta_id, neto in netos:
+            for pk in ancestros(rutas[cuenta_id]):
+                acumulado[pk] += neto
+
+        diferencias = []
+        for cuenta in cuentas:
+            calculado = (acumulado[cuenta.pk] * NATURALEZA[cuenta.tipo]).quantize(CERO)
+            if cuenta.saldo != calculado:
+                diferencias.append((cuenta, cuenta.saldo, calculado))
+                cuenta.saldo = calculado
+        if corregir and diferencias:
+            CuentaContable.objects.bulk_update([cuenta for cuenta, _, _ in diferencias], ['saldo'], batch_size=LOTE)
+            ids = [cuenta.pk for cuenta, _, _ in diferencias]
+            transaction.on_commit(lambda: saldos_actualizados.send(sender=CuentaContable, cuenta_ids=ids))
+        if not corregir:
+            transaction.set_rollback(True)
+    return diferencias
@@ -0,0 +1,201 @@
+"""
+Facturación automática de los pedidos entregados.
+
+Cada pasada toma lotes de LOTE pedidos entregados sin factura y, por lote, en
+una sola transacción:
+
+- calcula el IVA de todo el lote con NumPy sobre céntimos enteros (redondeo
+  half-up exacto, sin floats);
+- reserva los números de factura 'FAC-yymmdd-NNNNNNN' con un solo UPDATE
+  (inventario.secuencias);
+- crea asientos, líneas y facturas con tres bulk_create.
+
+Los asientos del lote se contabilizan después, en una transacción corta aparte
+(finanzas.contabilidad.contabilizar). Todas las facturas mueven las mismas
+cuentas (FACTURACION_CUENTAS) y sus ancestros, y contabilizar las bloquea
+hasta el commit: dentro de la transacción del lote, cada fragmento esperaba a
+que los demás terminaran sus inserciones. Si el proceso muere entre las dos
+transacciones, la pasada siguiente contabiliza los asientos pendientes; los
+que entretanto quedaron en un mes cerrado se informan en el log y se omiten
+(hay que reabrir el periodo para contabilizarlos). Los pedidos en cero se
+facturan ya pagados y sin asiento.
+
+Es idempotente: Factura.pedido es único y los pedidos se toman con
+SELECT ... FOR UPDATE SKIP LOCKED, así que una segunda pasada (o dos workers
+sobre los mismos pedidos) no factura dos veces. Para repartir el trabajo, cada
+worker procesa un fragmento de los pedidos (pedido_id % fragmentos).
+
+La reserva de números va dentro de la transacción del lote (si se revierte, los
+números vuelven a la secuencia y no quedan huecos), y por eso la fila de la
+secuencia queda bloqueada hasta el commit. Para que los fragmentos no se
+esperen entre sí, cada uno numera con su propia serie: 'FAC<fragmento>-...'
+cuando hay más de un fragmento.
+"""
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from inventario.secuencias import codigos_diarios
+from pedidos.models import Pedido
+
+from .balances import mes_siguiente, ultimo_cierre
+from .contabilidad import PeriodoCerrado, contabilizar
+from .models import AsientoContable, CuentaContable, Factura, LineaAsiento
+from .signals import facturas_actualizadas
+
+logger = logging.getLogger(__name__)
+
+LOTE = 1000
+SERIE = 'FAC'
+
+
+def _fragmento(queryset, fragmento, fragmentos):
+    if fragmentos <= 1:
+        return queryset
+    return queryset.annotate(_resto=Mod(F('pk'), fragmentos)).filter(_resto=fragmento)
+
+
+def serie(fragmento=0, fragmentos=1):
+    """Serie de numeración del fragmento; con un solo fragmento, la serie común."""
+    return SERIE if fragmentos <= 1 else f'{SERIE}{fragmento}'
+
+
+def pendientes(fragmento=0, fragmentos=1):
+    """Pedidos entregados que todavía no tienen factura."""
+    return _fragmento(
+        Pedido.objects.filter(estado='entregado', factura__isnull=True), fragmento, fragmentos
+    ).order_by('pk')
+
+
+def calcular_iva(subtotales, tasa):
+    """IVA de cada subtotal (Decimal) con la `tasa` dada, redondeado al céntimo (half-up)."""
+    # Céntimos y tasa en diezmilésimas como enteros: (c * t + 5000) // 10000 redondea sin error
+    centimos = np.array([int(subtotal.scaleb(2)) for subtotal in subtotales], dtype=np.int64)
+    diezmilesimas = int(Decimal(tasa).scaleb(4))
+    iva = (centimos * diezmilesimas + 5000) // 10000
+    return [Decimal(int(valor)).scaleb(-2) for valor in iva]
+
+
+def _cuentas():
+    codigos = settings.FACTURACION_CUENTAS
+    ids = dict(CuentaContable.objects.filter(codigo__in=codigos.values()).values_list('codigo', 'pk'))
+    faltantes = [codigo for codigo in codigos.values() if codigo not in ids]
+    if faltantes:
+        raise ImproperlyConfigured(f'FACTURACION_CUENTAS: no existen las cuentas {faltantes}')
+    return {clave: ids[codigo] for clave, codigo in codigos.items()}
+
+
+def _usuario():
+    usuario, creado = get_user_model().objects.get_or_create(
+        username=settings.FACTURACION_USUARIO, defaults={'is_active': False}
+    )
+    if creado:
+        usuario.set_unusable_password()
+        usuario.save(update_fields=['password'])
+    return usuario
+
+
+def facturar_entregados(fragmento=0, fragmentos=1, lote=LOTE, fecha=None):
+    """
+    Factura los pedidos entregados sin factura del fragmento. Devuelve la
+    cantidad de facturas creadas. Con `fecha` en un mes cerrado lanza
+    PeriodoCerrado sin facturar nada.
+    """
+    fecha = fecha or timezone.localdate()
+    cierre = ultimo_cierre()
+    if cierre and fecha < mes_siguiente(cierre):
+        raise PeriodoCerrado(f'No se puede facturar con fecha {fecha}: el mes está cerrado')
+    cuentas, usuario = _cuentas(), _usuario()
+    contabilizar_pendientes(lote)
+    creadas = 0
+    while True:
+        facturas, asiento_ids = _facturar_lote(fragmento, fragmentos, lote, fecha, cuentas, usuario)
+        contabilizar(asiento_ids)
+        creadas += facturas
+        if facturas < lote:
+            return creadas
+
+
+def contabilizar_pendientes(lote=LOTE):
+    """
+    Contabiliza los asientos de facturas de pedidos que quedaron sin
+    contabilizar. Los fechados en un mes cerrado se omiten y se informan en el
+    log. Devuelve la cantidad contabilizada.
+    """
+    asientos = AsientoContable.objects.filter(contabilizado=False, factura__pedido__isnull=False)
+    cierre = ultimo_cierre()
+    if cierre:
+        bloqueados = list(
+            asientos.filter(fecha__lt=mes_siguiente(cierre)).order_by('pk').values_list('pk', flat=True)
+        )
+        if bloqueados:
+            logger.warning(
+                'Asientos de facturas sin contabilizar en periodos cerrados (hay que reabrirlos): %s', bloqueados
+            )
+        asientos = asientos.filter(fecha__gte=mes_siguiente(cierre))
+    asiento_ids = list(asientos.order_by('pk').values_list('pk', flat=True))
+    for inicio in range(0, len(asiento_ids), lote):
+        contabilizar(asiento_ids[inicio:inicio + lote])
+    return len(asiento_ids)
+
+
+def _facturar_lote(fragmento, fragmentos, lote, fecha, cuentas, usuario):
+    with transaction.atomic():
+        pedidos = list(
+            pendientes(fragmento, fragmentos)
+            .select_for_update(skip_locked=True, of=('self',))
+            .values_list('pk', 'cliente_id', 'total')[:lote]
+        )
+        if not pedidos:
+            return 0, []
+        subtotales = [total for _, _, total in pedidos]
+        ivas = calcular_iva(subtotales, settings.FACTURACION_IVA)
+        numeros = codigos_diarios(serie(fragmento, fragmentos), len(pedidos), fecha)
+
+        # Un pedido en cero no genera movimientos: su factura queda sin asiento
+        con_importe = [indice for indice, subtotal in enumerate(subtotales) if subtotal]
+        asientos = dict(zip(con_importe, AsientoContable.objects.bulk_create([
+            AsientoContable(
+                fecha=fecha, tipo='venta', descripcion=f'Factura {numeros[indice]} - pedido #{pedidos[indice][0]}',
+                referencia=numeros[indice], creado_por=usuario,
+            )
+            for indice in con_importe
+        ])))
+        lineas = []
+        for indice, asiento in asientos.items():
+            subtotal, iva = subtotales[indice], ivas[indice]
+            movimientos = [
+                (cuentas['clientes'], subtotal + iva, 0),
+                (cuentas['ventas'], 0, subtotal),
+                (cuentas['iva'], 0, iva),
+            ]
+            lineas += [
+                LineaAsiento(asiento=asiento, cuenta_id=cuenta_id, descripcion=asiento.referencia, debe=debe, haber=haber)
+                for cuenta_id, debe, haber in movimientos
+                if debe or haber
+            ]
+        LineaAsiento.objects.bulk_create(lineas, batch_size=LOTE)
+
+        vencimiento = fecha + timedelta(days=settings.FACTURACION_DIAS_VENCIMIENTO)
+        # Mismo estado que daría cobranza.actualizar_saldos: sin saldo, pagada
+        facturas = Factura.objects.bulk_create([
+            Factura(
+                numero=numero, tipo='emitida', estado='emitida' if subtotal + iva > 0 else 'pagada',
+                fecha_emision=fecha, fecha_vencimiento=vencimiento, cliente_id=cliente_id, pedido_id=pedido_id,
+                subtotal=subtotal, iva=iva, total=subtotal + iva, saldo_pendiente=subtotal + iva,
+                asiento_contable=asientos.get(indice),
+            )
+            for indice, (numero, (pedido_id, cliente_id, subtotal), iva) in enumerate(zip(numeros, pedidos, ivas))
+        ], batch_size=LOTE)
+        factura_ids = [factura.pk for factura in facturas]
+        transaction.on_commit(lambda: facturas_actualizadas.send(sender=Factura, factura_ids=factura_ids))
+    return len(pedidos), [asiento.pk for asiento in asientos.values()]
@@ -0,0 +1,164 @@
+"""
+Contabilización masiva de asientos (p. ej. la sincronización nocturna de
+ventas).
+
+Las líneas de todos los asientos se aplanan en un DataFrame y se validan con
+operaciones sobre columnas completas: importes, cuentas y el cuadre de cada
+asiento (suma por asiento en céntimos enteros, sin errores de redondeo). Los
+asientos válidos se insertan por lotes de LOTE con dos bulk_create (asientos y
+líneas) y se contabilizan con finanzas.contabilidad.contabilizar, que aplica
+los saldos con consultas agrupadas. Los inválidos se devuelven con su índice y
+sus errores y no detienen la carga.
+"""
+from decimal import Decimal
+
+import pandas as pd
+from django.db import transaction
+
+from .balances import mes_siguiente, ultimo_cierre
+from .contabilidad import contabilizar
+from .models import AsientoContable, CuentaContable, LineaAsiento
+
+LOTE = 1000
+MAX_ERRORES = 500
+# max_digits=12, decimal_places=2
+LIMITE_IMPORTE = 10 ** 10
+TIPOS = {tipo for tipo, _ in AsientoContable.TIPO_CHOICES}
+
+
+def _texto(valor):
+    return '' if valor is None else str(valor).strip()
+
+
+def _aplanar(asientos):
+    """(cabeceras, lineas): un DataFrame por asiento y otro por línea, con la posición del asiento."""
+    cabeceras = pd.DataFrame({
+        'fecha': [_texto(asiento.get('fecha')) for asiento in asientos],
+        'tipo': [_texto(asiento.get('tipo')) for asiento in asientos],
+        'descripcion': [_texto(asiento.get('descripcion')) for asiento in asientos],
+        'referencia': [_texto(asiento.get('referencia')) for asiento in asientos],
+    })
+    filas = []
+    for indice, asiento in enumerate(asientos):
+        lineas = asiento.get('lineas')
+        for linea in lineas if isinstance(lineas, list) else []:
+            # Una línea que no es un objeto queda sin cuenta y se rechaza
+            linea = linea if isinstance(linea, dict) else {}
+            filas.append((
+                indice, _texto(linea.get('cuenta')), linea.get('cuenta_id'), _texto(linea.get('descripcion')),
+                linea.get('debe') or 0, linea.get('haber') or 0,
+            ))
+    lineas = pd.DataFrame(filas, columns=['asiento', 'cuenta', 'cuenta_id', 'descripcion', 'debe', 'haber'])
+    return cabeceras, lineas
+
+
+def _centimos(columna):
+    """Importes en céntimos enteros; NaN si no es un número con a lo sumo dos decimales."""
+    valores = pd.to_numeric(columna.astype(str).str.replace(',', '.', regex=False), errors='coerce') * 100
+    redondeados = valores.round()
+    return redondeados.where((valores - redondeados).abs() < 1e-6)
+
+
+def _validar(cabeceras, lineas):
+    """Devuelve un DataFrame booleano por asiento con una columna por tipo de error."""
+    fechas = pd.to_datetime(cabeceras['fecha'], format='%Y-%m-%d', errors='coerce')
+    problemas = {
+        'fecha inválida (AAAA-MM-DD)': fechas.isna(),
+        'tipo inválido': ~cabeceras['tipo'].isin(TIPOS),
+        'falta descripcion': cabeceras['descripcion'] == '',
+        'referencia supera 50 caracteres': cabeceras['referencia'].str.len() > 50,
+    }
+    cierre = ultimo_cierre()
+    if cierre:
+        problemas['fecha en un periodo cerrado'] = fechas < pd.Timestamp(mes_siguiente(cierre))
+
+    debe, haber = lineas['debe'], lineas['haber']
+    sin_importe = debe.isna() | haber.isna()
+    por_linea = {
+        'importe no numérico o con más de dos decimales': sin_importe,
+        'importe negativo o fuera de rango': (
+            (debe < 0) | (haber < 0) | (debe >= LIMITE_IMPORTE * 100) | (haber >= LIMITE_IMPORTE * 100)
+        ),
+        'cada línea lleva importe en el debe o en el haber': ~sin_importe & ((debe > 0) == (haber > 0)),
+        'cuenta inexistente': lineas['cuenta_id'].isna(),
+        'descripcion de línea supera 200 caracteres': lineas['descripcion'].str.len() > 200,
+    }
+    agrupado = pd.DataFrame(por_linea).groupby(lineas['asiento']).any()
+    for error, marcas in agrupado.items():
+        problemas[error] = marcas.reindex(cabeceras.index, fill_value=False)
+
+    totales = lineas.groupby('asiento')[['debe', 'haber']].sum().reindex(cabeceras.index)
+    problemas['el asiento no tiene líneas'] = totales['debe'].isna()
+    # Si algún importe no es válido el cuadre no dice nada
+    cuadre = totales['debe'].notna() & ~problemas['importe no numérico o con más de dos decimales']
+    problemas['el debe y el haber no cuadran'] = cuadre & (totales['debe'] != totales['haber'])
+    return pd.DataFrame(problemas, index=cabeceras.index)
+
+
+def _cuentas(lineas):
+    """
+    Id de cuenta de cada línea; NaN si no existe. `cuenta` es siempre un código
+    (1101 y '1101' son el mismo) y tiene prioridad; `cuenta_id` es siempre un id.
+    """
+    codigos = dict(CuentaContable.objects.values_list('codigo', 'pk'))
+    por_codigo = lineas['cuenta'].map(codigos)
+    ids = pd.to_numeric(lineas['cuenta_id'], errors='coerce')
+    por_id = ids.where(ids.isin(list(codigos.values())))
+    return por_codigo.where(lineas['cuenta'] != '', por_id)
+
+
+def contabilizar_lote(asientos, creado_por, lote=LOTE):
+    """
+    Crea y contabiliza los asientos válidos de `asientos` (dicts con fecha,
+    tipo, descripcion, referencia y lineas; cada línea con cuenta (código) o
+    cuenta_id (id), descripcion, debe y haber). Devuelve el resumen de la carga.
+    """
+    resultado = {'asientos': len(asientos), 'contabilizados': 0, 'rechazados': 0, 'ids': [], 'errores': []}
+    if not asientos:
+        return resultado
+    cabeceras, lineas = _aplanar(asientos)
+    lineas['cuenta_id'] = _cuentas(lineas)
+    lineas['debe'] = _centimos(lineas['debe'])
+    lineas['haber'] = _centimos(lineas['haber'])
+
+    problemas = _validar(cabeceras, lineas)
+    invalidos = problemas.any(axis=1)
+    resultado['rechazados'] = int(invalidos.sum())
+    for indice in invalidos[invalidos].index[:MAX_ERRORES]:
+        resultado['errores'].append({
+            'indice': int(indice),
+            'referencia': cabeceras.at[indice, 'referencia'],
+            'errores': list(problemas.columns[problemas.loc[indice]]),
+        })
+
+    validos = cabeceras.index[~invalidos]
+    for inicio in range(0, len(validos), lote):
+        bloque = validos[inicio:inicio + lote]
+        resultado['ids'] += _crear_bloque(
+            cabeceras.loc[bloque], lineas[lineas['asiento'].isin(bloque)], creado_por
+        )
+    resultado['contabilizados'] = len(resultado['ids'])
+    return resultado
+
+
+def _crear_bloque(cabeceras, lineas, creado_por):
+    with transaction.atomic():
+        asientos = AsientoContable.objects.bulk_create([
+            AsientoContable(
+                fecha=fila['fecha'], tipo=fila['tipo'], descripcion=fila['descripcion'],
+                referencia=fila['referencia'], creado_por=creado_por,
+            )
+            for fila in cabeceras.to_dict('records')
+        ])
+        por_indice = dict(zip(cabeceras.index, asientos))
+        objetos = [
+            LineaAsiento(
+                asiento=por_indice[indice], cuenta_id=int(cuenta_id), descripcion=descripcion,
+                debe=Decimal(int(debe)).scaleb(-2), haber=Decimal(int(haber)).scaleb(-2),
+            )
+            for indice, cuenta_id, descripcion, debe, haber in zip(
+                lineas['asiento'], lineas['cuenta_id'], lineas['descripcion'], lineas['debe'], lineas['haber']
+            )
+        ]
+        LineaAsiento.objects.bulk_create(objetos, batch_size=1000)
+        return contabilizar([asiento.pk for asiento in asientos])
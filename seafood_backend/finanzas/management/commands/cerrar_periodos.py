@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from finanzas.balances import AsientosSinContabilizar, cerrar_periodos, inicio_mes, reabrir_periodos
+
+
+def _mes(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f'Mes inválido: {valor} (use AAAA-MM)')
+
+
+class Command(BaseCommand):
+    help = 'Guarda los saldos mensuales de las cuentas de todos los meses pendientes de cierre'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hasta', help='Último mes a cerrar (AAAA-MM); por defecto el mes anterior',
+        )
+        parser.add_argument(
+            '--reabrir', help='Borra los cierres desde este mes (AAAA-MM) antes de cerrar',
+        )
+
+    def handle(self, *args, **options):
+        if options['reabrir']:
+            meses = reabrir_periodos(_mes(options['reabrir']))
+            self.stdout.write(f'{meses} meses reabiertos')
+            if not options['hasta']:
+                return
+
+        hasta = _mes(options['hasta']) if options['hasta'] else inicio_mes(timezone.localdate()) - timedelta(days=1)
+        try:
+            cerrados = cerrar_periodos(hasta)
+        except AsientosSinContabilizar as e:
+            raise CommandError(str(e))
+        if cerrados:
+            self.stdout.write(self.style.SUCCESS(
+                f"{len(cerrados)} meses cerrados: {cerrados[0]:%Y-%m} a {cerrados[-1]:%Y-%m}"
+            ))
+        else:
+            self.stdout.write('No hay meses pendientes de cierre')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from finanzas.contabilidad import conciliar_saldos
+
+
+class Command(BaseCommand):
+    help = 'Recalcula las rutas y los saldos de las cuentas desde las líneas de asiento contabilizadas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar', action='store_true',
+            help='Solo informa las diferencias, sin corregirlas',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            diferencias = conciliar_saldos(corregir=not options['verificar'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for cuenta, guardado, calculado in diferencias:
+            self.stdout.write(f'{cuenta.codigo}: {guardado} -> {calculado}')
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS('Los saldos coinciden con las líneas'))
+        elif options['verificar']:
+            self.stdout.write(self.style.WARNING(f'{len(diferencias)} cuentas con saldo distinto (sin corregir)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{len(diferencias)} cuentas corregidas'))
@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from finanzas.contabilidad import PeriodoCerrado
+from finanzas.facturacion import LOTE, facturar_entregados
+
+
+class Command(BaseCommand):
+    help = 'Crea las facturas y los asientos de venta de los pedidos entregados sin factura'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=LOTE, help='Pedidos facturados por transacción')
+        parser.add_argument('--fragmentos', type=int, default=1, help='Partes en que se reparten los pedidos')
+        parser.add_argument('--fragmento', type=int, help='Procesar solo esta parte (0 .. fragmentos - 1)')
+        parser.add_argument(
+            '--celery', action='store_true', help='Encolar un fragmento por tarea en vez de procesar aquí'
+        )
+
+    def handle(self, *args, **options):
+        lote, fragmentos = options['lote'], options['fragmentos']
+        if lote < 1 or fragmentos < 1:
+            raise CommandError('El lote y los fragmentos deben ser positivos')
+
+        if options['celery']:
+            from finanzas.tasks import facturar_pedidos
+            fragmentos = fragmentos if fragmentos > 1 else settings.FACTURACION_FRAGMENTOS
+            facturar_pedidos.delay(fragmentos)
+            self.stdout.write(self.style.SUCCESS(f'{fragmentos} fragmentos encolados'))
+            return
+
+        if options['fragmento'] is not None:
+            if not 0 <= options['fragmento'] < fragmentos:
+                raise CommandError('--fragmento debe estar entre 0 y fragmentos - 1')
+            seleccion = [options['fragmento']]
+        else:
+            seleccion = range(fragmentos)
+        inicio = time.perf_counter()
+        try:
+            total = sum(facturar_entregados(fragmento, fragmentos, lote=lote) for fragmento in seleccion)
+        except (ImproperlyConfigured, PeriodoCerrado) as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} pedidos facturados en {time.perf_counter() - inicio:.1f} s'
+        ))
@@ -0,0 +1,111 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:13
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('clientes', '0002_cliente_ubicacion'),
+        ('proveedores', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AsientoContable',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('tipo', models.CharField(choices=[('venta', 'Venta'), ('compra', 'Compra'), ('gasto', 'Gasto'), ('ajuste', 'Ajuste'), ('otro', 'Otro')], max_length=20)),
+                ('descripcion', models.TextField()),
+                ('referencia', models.CharField(max_length=50)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('creado_por', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Asiento Contable',
+                'verbose_name_plural': 'Asientos Contables',
+                'ordering': ['-fecha', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CuentaContable',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.CharField(max_length=20, unique=True)),
+                ('nombre', models.CharField(max_length=100)),
+                ('tipo', models.CharField(choices=[('activo', 'Activo'), ('pasivo', 'Pasivo'), ('capital', 'Capital'), ('ingreso', 'Ingreso'), ('gasto', 'Gasto')], max_length=20)),
+                ('descripcion', models.TextField(blank=True, null=True)),
+                ('saldo', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('cuenta_padre', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='finanzas.cuentacontable')),
+            ],
+            options={
+                'verbose_name': 'Cuenta Contable',
+                'verbose_name_plural': 'Cuentas Contables',
+                'ordering': ['codigo'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Factura',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.CharField(max_length=20, unique=True)),
+                ('tipo', models.CharField(choices=[('emitida', 'Emitida'), ('recibida', 'Recibida')], max_length=10)),
+                ('fecha_emision', models.DateField()),
+                ('fecha_vencimiento', models.DateField()),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=12, validators=[django.core.validators.MinValueValidator(Decimal('0.00'))])),
+                ('iva', models.DecimalField(decimal_places=2, max_digits=12, validators=[django.core.validators.MinValueValidator(Decimal('0.00'))])),
+                ('total', models.DecimalField(decimal_places=2, max_digits=12, validators=[django.core.validators.MinValueValidator(Decimal('0.00'))])),
+                ('estado', models.CharField(choices=[('borrador', 'Borrador'), ('emitida', 'Emitida'), ('pagada', 'Pagada'), ('anulada', 'Anulada')], default='borrador', max_length=10)),
+                ('notas', models.TextField(blank=True, null=True)),
+                ('asiento_contable', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='finanzas.asientocontable')),
+                ('cliente', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='clientes.cliente')),
+                ('proveedor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='proveedores.proveedor')),
+            ],
+            options={
+                'verbose_name': 'Factura',
+                'verbose_name_plural': 'Facturas',
+                'ordering': ['-fecha_emision', '-numero'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LineaAsiento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('descripcion', models.CharField(max_length=200)),
+                ('debe', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('haber', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('asiento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas', to='finanzas.asientocontable')),
+                ('cuenta', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='finanzas.cuentacontable')),
+            ],
+            options={
+                'verbose_name': 'Línea de Asiento',
+                'verbose_name_plural': 'Líneas de Asiento',
+            },
+        ),
+        migrations.CreateModel(
+            name='Pago',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=12, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))])),
+                ('metodo', models.CharField(choices=[('efectivo', 'Efectivo'), ('transferencia', 'Transferencia Bancaria'), ('tarjeta', 'Tarjeta de Crédito/Débito'), ('cheque', 'Cheque')], max_length=20)),
+                ('referencia', models.CharField(blank=True, max_length=100, null=True)),
+                ('notas', models.TextField(blank=True, null=True)),
+                ('asiento_contable', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='finanzas.asientocontable')),
+                ('factura', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='pagos', to='finanzas.factura')),
+            ],
+            options={
+                'verbose_name': 'Pago',
+                'verbose_name_plural': 'Pagos',
+                'ordering': ['-fecha'],
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:13
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+# Copia congelada de finanzas.contabilidad.NATURALEZA
+NATURALEZA = {'activo': 1, 'gasto': 1, 'pasivo': -1, 'capital': -1, 'ingreso': -1}
+
+
+def contabilizar_existentes(apps, schema_editor):
+    # Los asientos anteriores ya cuentan como registrados: se marcan
+    # contabilizados y los saldos se rehacen desde sus líneas, como
+    # conciliar_saldos
+    CuentaContable = apps.get_model('finanzas', 'CuentaContable')
+    AsientoContable = apps.get_model('finanzas', 'AsientoContable')
+    LineaAsiento = apps.get_model('finanzas', 'LineaAsiento')
+
+    padres = dict(CuentaContable.objects.values_list('pk', 'cuenta_padre_id'))
+    rutas = {}
+    for pk in padres:
+        camino = []
+        while pk is not None and pk not in rutas and pk not in camino:
+            camino.append(pk)
+            pk = padres[pk]
+        ruta = rutas.get(pk, '/')
+        for cuenta_id in reversed(camino):
+            ruta = rutas[cuenta_id] = f'{ruta}{cuenta_id}/'
+
+    AsientoContable.objects.update(contabilizado=True)
+    acumulado = defaultdict(Decimal)
+    netos = LineaAsiento.objects.values('cuenta_id').annotate(neto=Sum('debe') - Sum('haber'))
+    for cuenta_id, neto in netos.values_list('cuenta_id', 'neto'):
+        for pk in rutas[cuenta_id].strip('/').split('/'):
+            acumulado[int(pk)] += neto
+
+    cuentas = list(CuentaContable.objects.only('tipo'))
+    for cuenta in cuentas:
+        cuenta.ruta = rutas[cuenta.pk]
+        cuenta.saldo = acumulado[cuenta.pk] * NATURALEZA.get(cuenta.tipo, 1)
+    CuentaContable.objects.bulk_update(cuentas, ['ruta', 'saldo'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asientocontable',
+            name='contabilizado',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='cuentacontable',
+            name='ruta',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(contabilizar_existentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0002_cuenta_ruta_asiento_contabilizado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoPeriodo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.DateField(help_text='Primer día del mes')),
+                ('saldo_inicial', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('debe', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('haber', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('saldo_final', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('fecha_cierre', models.DateTimeField(auto_now=True)),
+                ('cuenta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos_periodo', to='finanzas.cuentacontable')),
+            ],
+            options={
+                'verbose_name': 'Saldo de Periodo',
+                'verbose_name_plural': 'Saldos de Periodo',
+                'ordering': ['-periodo', 'cuenta'],
+                'constraints': [models.UniqueConstraint(fields=('periodo', 'cuenta'), name='saldo_periodo_cuenta_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0003_saldo_periodo'),
+        ('pedidos', '0006_telemetria_temperatura'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='factura',
+            name='pedido',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='factura', to='pedidos.pedido'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:13
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def calcular_saldos(apps, schema_editor):
+    # Copia congelada de finanzas.cobranza.actualizar_saldos para toda la cartera
+    Factura = apps.get_model('finanzas', 'Factura')
+    Pago = apps.get_model('finanzas', 'Pago')
+    pagado = (
+        Pago.objects.filter(factura=OuterRef('pk')).order_by()
+        .values('factura').annotate(total=Sum('monto')).values('total')
+    )
+    Factura.objects.update(saldo_pendiente=F('total') - Coalesce(
+        Subquery(pagado), Value(Decimal('0.00')), output_field=DecimalField(max_digits=12, decimal_places=2),
+    ))
+    automaticas = Factura.objects.filter(estado__in=('emitida', 'pagada'))
+    automaticas.filter(saldo_pendiente__lte=0).exclude(estado='pagada').update(estado='pagada')
+    automaticas.filter(saldo_pendiente__gt=0).exclude(estado='emitida').update(estado='emitida')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0002_cliente_ubicacion'),
+        ('finanzas', '0004_factura_pedido'),
+        ('pedidos', '0006_telemetria_temperatura'),
+        ('proveedores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='factura',
+            name='saldo_pendiente',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['estado', 'fecha_vencimiento'], name='finanzas_fa_estado_ee9560_idx'),
+        ),
+        migrations.RunPython(calcular_saldos, migrations.RunPython.noop),
+    ]
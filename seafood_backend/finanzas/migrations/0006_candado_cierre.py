@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:45
+
+from django.db import migrations, models
+
+
+def crear_candado(apps, schema_editor):
+    apps.get_model('finanzas', 'CandadoCierre').objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0005_factura_saldo_pendiente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandadoCierre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'verbose_name': 'Candado de Cierre',
+                'verbose_name_plural': 'Candados de Cierre',
+            },
+        ),
+        migrations.RunPython(crear_candado, migrations.RunPython.noop),
+    ]
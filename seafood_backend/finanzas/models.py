@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from django.conf import settings
@@ -16,8 +17,12 @@ class CuentaContable(models.Model):
     nombre = models.CharField(max_length=100)
     tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
     descripcion = models.TextField(blank=True, null=True)
+    # Saldo de la cuenta y sus subcuentas, según su naturaleza (ver finanzas.contabilidad)
     saldo = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     cuenta_padre = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE)
+    # Ruta materializada de ids desde la raíz, p. ej. '/1/5/12/': el subárbol
+    # de una cuenta son las cuentas cuya ruta empieza por la suya
+    ruta = models.CharField(max_length=255, db_index=True, editable=False, default='')
     
     class Meta:
         verbose_name = 'Cuenta Contable'
@@ -27,6 +32,31 @@ class CuentaContable(models.Model):
     def __str__(self):
         return f'{self.codigo} - {self.nombre}'
 
+    def clean(self):
+        if self.pk and self.cuenta_padre_id and self.ruta and self.cuenta_padre.ruta.startswith(self.ruta):
+            raise ValidationError({'cuenta_padre': 'Una cuenta no puede colgar de sí misma ni de una subcuenta suya'})
+
+    def save(self, *args, **kwargs):
+        from .contabilidad import mover_cuenta
+        with transaction.atomic():
+            anterior = None
+            if self.pk:
+                anterior = (
+                    CuentaContable.objects.select_for_update().filter(pk=self.pk)
+                    .values('ruta', 'cuenta_padre_id').first()
+                )
+            if anterior is not None:
+                # saldo y ruta solo cambian con UPDATE basados en F() (finanzas.contabilidad):
+                # los de la instancia pueden estar viejos y borrarían lo contabilizado
+                campos = kwargs.get('update_fields')
+                if campos is None:
+                    campos = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+                kwargs['update_fields'] = [campo for campo in campos if campo not in ('saldo', 'ruta')]
+            super().save(*args, **kwargs)
+            if anterior is None or anterior['cuenta_padre_id'] != self.cuenta_padre_id or not anterior['ruta']:
+                mover_cuenta(self, anterior['ruta'] if anterior else '')
+            self.saldo, self.ruta = CuentaContable.objects.values_list('saldo', 'ruta').get(pk=self.pk)
+
 class AsientoContable(models.Model):
     TIPO_CHOICES = [
         ('venta', 'Venta'),
@@ -42,6 +72,8 @@ class AsientoContable(models.Model):
     referencia = models.CharField(max_length=50)
     creado_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # Sus líneas ya están sumadas en CuentaContable.saldo
+    contabilizado = models.BooleanField(default=False)
     
     class Meta:
         verbose_name = 'Asiento Contable'
@@ -65,6 +97,41 @@ class LineaAsiento(models.Model):
     def __str__(self):
         return f'{self.cuenta.nombre} - {self.debe if self.debe > 0 else self.haber}'
 
+class SaldoPeriodo(models.Model):
+    """
+    Cierre mensual de una cuenta (sin sus subcuentas): saldos con el signo de
+    su naturaleza y movimientos del mes. Ver finanzas.balances.
+    """
+    cuenta = models.ForeignKey(CuentaContable, on_delete=models.CASCADE, related_name='saldos_periodo')
+    periodo = models.DateField(help_text='Primer día del mes')
+    saldo_inicial = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    debe = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    haber = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    saldo_final = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    fecha_cierre = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Saldo de Periodo'
+        verbose_name_plural = 'Saldos de Periodo'
+        ordering = ['-periodo', 'cuenta']
+        constraints = [
+            models.UniqueConstraint(fields=['periodo', 'cuenta'], name='saldo_periodo_cuenta_unico'),
+        ]
+
+    def __str__(self):
+        return f'{self.cuenta.codigo} {self.periodo:%Y-%m}: {self.saldo_final}'
+
+class CandadoCierre(models.Model):
+    """
+    Fila única que se bloquea con SELECT ... FOR UPDATE para que los cierres
+    de periodo y la contabilización de asientos no se crucen (ver
+    finanzas.contabilidad.bloquear_cierres).
+    """
+
+    class Meta:
+        verbose_name = 'Candado de Cierre'
+        verbose_name_plural = 'Candados de Cierre'
+
 class Factura(models.Model):
     TIPO_CHOICES = [
         ('emitida', 'Emitida'),
@@ -84,10 +151,16 @@ class Factura(models.Model):
     fecha_vencimiento = models.DateField()
     cliente = models.ForeignKey('clientes.Cliente', null=True, blank=True, on_delete=models.PROTECT)
     proveedor = models.ForeignKey('proveedores.Proveedor', null=True, blank=True, on_delete=models.PROTECT)
+    # Pedido facturado (finanzas.facturacion); único, así que un pedido no se factura dos veces
+    pedido = models.OneToOneField(
+        'pedidos.Pedido', null=True, blank=True, on_delete=models.PROTECT, related_name='factura'
+    )
     subtotal = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(Decimal('0.00'))])
     iva = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(Decimal('0.00'))])
     total = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(Decimal('0.00'))])
     estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='borrador')
+    # total menos los pagos; lo mantienen los receptores de Pago (finanzas.cobranza)
+    saldo_pendiente = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
     notas = models.TextField(blank=True, null=True)
     asiento_contable = models.OneToOneField(AsientoContable, null=True, blank=True, on_delete=models.SET_NULL)
     
@@ -95,10 +168,24 @@ class Factura(models.Model):
         verbose_name = 'Factura'
         verbose_name_plural = 'Facturas'
         ordering = ['-fecha_emision', '-numero']
+        indexes = [
+            # Facturas por cobrar por vencimiento (antigüedad de saldos)
+            models.Index(fields=['estado', 'fecha_vencimiento']),
+        ]
 
     def __str__(self):
         return f'Factura {self.numero}'
 
+    def save(self, *args, **kwargs):
+        # Mismo cálculo que los receptores de Pago: saldo y emitida/pagada
+        from .cobranza import actualizar_saldos
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            actualizar_saldos([self.pk])
+        self.saldo_pendiente, self.estado = (
+            Factura.objects.values_list('saldo_pendiente', 'estado').get(pk=self.pk)
+        )
+
 class Pago(models.Model):
     METODO_CHOICES = [
         ('efectivo', 'Efectivo'),
@@ -0,0 +1,11 @@
+from django.dispatch import Signal
+
+# Se envía al confirmar la transacción que modifica saldos con UPDATE basados
+# en F() (finanzas.contabilidad), con `cuenta_ids`. Esos UPDATE no disparan
+# post_save.
+saldos_actualizados = Signal()
+
+# Se envía al confirmar escrituras masivas de facturas (bulk_create de
+# finanzas.facturacion y UPDATE de saldos de finanzas.cobranza), con
+# `factura_ids`.
+facturas_actualizadas = Signal()
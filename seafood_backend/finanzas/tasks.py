@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from celery import group, shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from .balances import cerrar_periodos, inicio_mes
+from .facturacion import facturar_entregados
+
+
+@shared_task
+def cerrar_mes_anterior():
+    """Cierra los meses pendientes hasta el mes anterior al actual."""
+    hasta = inicio_mes(timezone.localdate()) - timedelta(days=1)
+    return [mes.isoformat() for mes in cerrar_periodos(hasta)]
+
+
+@shared_task
+def facturar_fragmento(fragmento, fragmentos):
+    return facturar_entregados(fragmento, fragmentos)
+
+
+@shared_task
+def facturar_pedidos(fragmentos=None):
+    """Reparte los pedidos entregados sin factura en fragmentos que los workers facturan en paralelo."""
+    fragmentos = fragmentos or settings.FACTURACION_FRAGMENTOS
+    group(facturar_fragmento.s(fragmento, fragmentos) for fragmento in range(fragmentos)).apply_async()
+    return fragmentos
@@ -0,0 +1,391 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from clientes.models import Cliente
+from pedidos.models import Pedido
+from .balances import AsientosSinContabilizar, balance_comprobacion, cerrar_periodos
+from .cobranza import antiguedad_saldos
+from .contabilidad import AsientoDescuadrado, PeriodoCerrado, conciliar_saldos, crear_asiento
+from .facturacion import _cuentas, _facturar_lote, _usuario, facturar_entregados
+from .importacion import contabilizar_lote
+from .models import AsientoContable, CuentaContable, Factura, Pago, SaldoPeriodo
+
+
+def crear_cuentas():
+    activo = CuentaContable.objects.create(codigo='1', nombre='Activo', tipo='activo')
+    caja = CuentaContable.objects.create(codigo='1.1', nombre='Caja', tipo='activo', cuenta_padre=activo)
+    ingresos = CuentaContable.objects.create(codigo='4', nombre='Ingresos', tipo='ingreso')
+    ventas = CuentaContable.objects.create(codigo='4.1', nombre='Ventas', tipo='ingreso', cuenta_padre=ingresos)
+    return activo, caja, ingresos, ventas
+
+
+def crear_cliente(nombre='Cliente'):
+    return Cliente.objects.create(
+        nombre=nombre, rut=nombre, email=f'{nombre.lower()}@ejemplo.cl', telefono='123', direccion='Dirección',
+    )
+
+
+def saldos():
+    return dict(CuentaContable.objects.values_list('codigo', 'saldo'))
+
+
+def aplanar(nodos):
+    """{codigo: (saldo_inicial, debe, haber, saldo_final)} del árbol del balance."""
+    filas = {}
+    for nodo in nodos:
+        filas[nodo['codigo']] = (nodo['saldo_inicial'], nodo['debe'], nodo['haber'], nodo['saldo_final'])
+        filas.update(aplanar(nodo['subcuentas']))
+    return filas
+
+
+class CuentaContableTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('contador')
+        self.activo, self.caja, self.ingresos, self.ventas = crear_cuentas()
+
+    def vender(self, monto, fecha=date(2025, 3, 10)):
+        return crear_asiento(self.usuario, fecha, 'venta', 'Venta', [
+            {'cuenta': self.caja, 'debe': monto},
+            {'cuenta': self.ventas, 'haber': monto},
+        ])
+
+    def test_contabilizar_suma_a_los_ancestros(self):
+        self.vender(Decimal('150'))
+        self.vender(Decimal('50.25'))
+
+        self.assertEqual(saldos(), {
+            '1': Decimal('200.25'), '1.1': Decimal('200.25'), '4': Decimal('200.25'), '4.1': Decimal('200.25'),
+        })
+        self.assertEqual(conciliar_saldos(corregir=False), [])
+
+    def test_conciliar_corrige_saldos_desincronizados(self):
+        self.vender(Decimal('150'))
+        CuentaContable.objects.filter(codigo='1').update(saldo=Decimal('1'))
+
+        diferencias = conciliar_saldos()
+
+        self.assertEqual([(cuenta.codigo, guardado, calculado) for cuenta, guardado, calculado in diferencias], [
+            ('1', Decimal('1'), Decimal('150')),
+        ])
+        self.assertEqual(saldos()['1'], Decimal('150'))
+        self.assertEqual(conciliar_saldos(corregir=False), [])
+
+    def test_mover_cuenta_traslada_el_saldo(self):
+        corriente = CuentaContable.objects.create(
+            codigo='1.2', nombre='Activo corriente', tipo='activo', cuenta_padre=self.activo,
+        )
+        self.vender(Decimal('150'))
+
+        self.caja.cuenta_padre = corriente
+        self.caja.save()
+        self.assertEqual(self.caja.ruta, f'/{self.activo.pk}/{corriente.pk}/{self.caja.pk}/')
+        self.assertEqual(saldos(), {
+            '1': Decimal('150'), '1.1': Decimal('150'), '1.2': Decimal('150'),
+            '4': Decimal('150'), '4.1': Decimal('150'),
+        })
+
+        self.caja.cuenta_padre = None
+        self.caja.save()
+        self.assertEqual(saldos(), {
+            '1': Decimal('0'), '1.1': Decimal('150'), '1.2': Decimal('0'),
+            '4': Decimal('150'), '4.1': Decimal('150'),
+        })
+        self.assertEqual(conciliar_saldos(corregir=False), [])
+
+    def test_no_cuelga_una_cuenta_de_su_subcuenta(self):
+        self.activo.cuenta_padre = self.caja
+        with self.assertRaises(ValueError):
+            self.activo.save()
+
+    def test_guardar_instancia_vieja_no_pisa_el_saldo(self):
+        self.vender(Decimal('150'))
+        # `ventas` conserva el saldo 0 con que se creó
+        self.ventas.nombre = 'Ventas nacionales'
+        self.ventas.cuenta_padre = self.activo
+        self.ventas.save()
+
+        self.assertEqual(self.ventas.saldo, Decimal('150'))
+        self.assertEqual(saldos(), {
+            '1': Decimal('0'), '1.1': Decimal('150'), '4': Decimal('0'), '4.1': Decimal('150'),
+        })
+        self.assertEqual(conciliar_saldos(corregir=False), [])
+
+    def test_rechaza_asiento_descuadrado(self):
+        with self.assertRaises(AsientoDescuadrado):
+            crear_asiento(self.usuario, date(2025, 3, 10), 'venta', 'Venta', [
+                {'cuenta': self.caja, 'debe': Decimal('100')},
+                {'cuenta': self.ventas, 'haber': Decimal('90')},
+            ])
+
+        self.assertFalse(AsientoContable.objects.exists())
+        self.assertEqual(set(saldos().values()), {Decimal('0')})
+
+    def test_rechaza_asiento_en_periodo_cerrado(self):
+        self.vender(Decimal('100'), date(2025, 2, 10))
+        self.assertEqual(cerrar_periodos(date(2025, 3, 15)), [date(2025, 2, 1), date(2025, 3, 1)])
+
+        with self.assertRaises(PeriodoCerrado):
+            self.vender(Decimal('50'), date(2025, 3, 31))
+        self.vender(Decimal('50'), date(2025, 4, 1))
+
+        self.assertEqual(AsientoContable.objects.count(), 2)
+        self.assertEqual(saldos()['1.1'], Decimal('150'))
+
+    def test_no_cierra_meses_con_asientos_sin_contabilizar(self):
+        self.vender(Decimal('100'), date(2025, 2, 10))
+        pendiente = AsientoContable.objects.create(
+            fecha=date(2025, 3, 5), tipo='venta', descripcion='Venta', referencia='P-1', creado_por=self.usuario,
+        )
+
+        self.assertEqual(cerrar_periodos(date(2025, 2, 28)), [date(2025, 2, 1)])
+        with self.assertRaises(AsientosSinContabilizar):
+            cerrar_periodos(date(2025, 3, 31))
+        self.assertFalse(SaldoPeriodo.objects.filter(periodo=date(2025, 3, 1)).exists())
+
+        pendiente.delete()
+        self.assertEqual(cerrar_periodos(date(2025, 3, 31)), [date(2025, 3, 1)])
+
+    def test_contabilizar_y_cerrar_leen_el_cierre_con_el_candado_tomado(self):
+        for operacion in (lambda: self.vender(Decimal('10')), lambda: cerrar_periodos(date(2025, 3, 31))):
+            with CaptureQueriesContext(connection) as capturadas:
+                operacion()
+            consultas = [consulta['sql'] for consulta in capturadas]
+            candado = next(i for i, sql in enumerate(consultas) if 'finanzas_candadocierre' in sql)
+            cierre = next(i for i, sql in enumerate(consultas) if 'finanzas_saldoperiodo' in sql)
+            self.assertLess(candado, cierre)
+
+
+class BalanceComprobacionTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('contador')
+        self.activo, self.caja, self.ingresos, self.ventas = crear_cuentas()
+        for fecha, monto in [
+            (date(2025, 1, 20), Decimal('100')),
+            (date(2025, 2, 10), Decimal('40')),
+            (date(2025, 3, 5), Decimal('20')),
+            (date(2025, 3, 25), Decimal('7')),
+        ]:
+            crear_asiento(self.usuario, fecha, 'venta', 'Venta', [
+                {'cuenta': self.caja, 'debe': monto},
+                {'cuenta': self.ventas, 'haber': monto},
+            ])
+        # Enero y febrero cerrados, marzo abierto
+        cerrar_periodos(date(2025, 2, 28))
+
+    def test_cierre_guarda_saldos_por_cuenta_y_mes(self):
+        self.assertEqual(
+            list(SaldoPeriodo.objects.filter(cuenta=self.caja).order_by('periodo')
+                 .values_list('periodo', 'saldo_inicial', 'debe', 'haber', 'saldo_final')),
+            [
+                (date(2025, 1, 1), Decimal('0'), Decimal('100'), Decimal('0'), Decimal('100')),
+                (date(2025, 2, 1), Decimal('100'), Decimal('40'), Decimal('0'), Decimal('140')),
+            ],
+        )
+
+    def test_rango_entre_meses_cerrados_y_abiertos(self):
+        balance = balance_comprobacion(date(2025, 1, 25), date(2025, 3, 10))
+
+        self.assertEqual(balance['cerrado_hasta'], date(2025, 2, 28))
+        self.assertEqual(balance['totales'], {'debe': Decimal('60'), 'haber': Decimal('60'), 'cuadra': True})
+        self.assertEqual(aplanar(balance['cuentas']), {
+            '1': (Decimal('100'), Decimal('60'), Decimal('0'), Decimal('160')),
+            '1.1': (Decimal('100'), Decimal('60'), Decimal('0'), Decimal('160')),
+            '4': (Decimal('100'), Decimal('0'), Decimal('60'), Decimal('160')),
+            '4.1': (Decimal('100'), Decimal('0'), Decimal('60'), Decimal('160')),
+        })
+        self.assertEqual(balance['saldos_por_tipo'], {'activo': Decimal('160'), 'ingreso': Decimal('160')})
+
+    def test_coincide_con_las_lineas_en_cualquier_rango(self):
+        rangos = [
+            (date(2025, 1, 1), date(2025, 3, 31)),
+            (date(2025, 2, 1), date(2025, 2, 28)),
+            (date(2025, 2, 11), date(2025, 3, 24)),
+            (date(2025, 3, 1), date(2025, 3, 31)),
+        ]
+        for desde, hasta in rangos:
+            with self.subTest(desde=desde, hasta=hasta):
+                caja = aplanar(balance_comprobacion(desde, hasta)['cuentas'])['1.1']
+                lineas = self.caja.lineaasiento_set.filter(asiento__contabilizado=True)
+                inicial = sum(linea.debe for linea in lineas.filter(asiento__fecha__lt=desde))
+                debe = sum(linea.debe for linea in lineas.filter(asiento__fecha__range=(desde, hasta)))
+                self.assertEqual(caja, (inicial, debe, Decimal('0'), inicial + debe))
+
+
+class ContabilizarLoteTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('contador')
+        crear_cuentas()
+
+    def asiento(self, referencia, lineas, fecha='2025-03-10'):
+        return {'fecha': fecha, 'tipo': 'venta', 'descripcion': 'Venta', 'referencia': referencia, 'lineas': lineas}
+
+    def test_contabiliza_los_validos_e_informa_los_rechazados(self):
+        asientos = [
+            self.asiento('A-1', [{'cuenta': '1.1', 'debe': '10.50'}, {'cuenta': '4.1', 'haber': '10.50'}]),
+            self.asiento('A-2', [{'cuenta': '1.1', 'debe': 10}, {'cuenta': '4.1', 'haber': 9}]),
+            self.asiento('A-3', [{'cuenta': '9.9', 'debe': 5}, {'cuenta': '4.1', 'haber': 5}]),
+            self.asiento('A-4', [{'cuenta': '1.1', 'debe': 5}, {'cuenta': '4.1', 'haber': 5}], fecha='10/03/2025'),
+            self.asiento('A-5', []),
+            self.asiento('A-6', [{'cuenta': '1.1', 'debe': '1.005'}, {'cuenta': '4.1', 'haber': '1.005'}]),
+        ]
+
+        resultado = contabilizar_lote(asientos, self.usuario)
+
+        self.assertEqual(
+            (resultado['asientos'], resultado['contabilizados'], resultado['rechazados']), (6, 1, 5)
+        )
+        self.assertEqual(
+            [(error['indice'], error['referencia'], error['errores']) for error in resultado['errores']],
+            [
+                (1, 'A-2', ['el debe y el haber no cuadran']),
+                (2, 'A-3', ['cuenta inexistente']),
+                (3, 'A-4', ['fecha inválida (AAAA-MM-DD)']),
+                (4, 'A-5', ['el asiento no tiene líneas']),
+                (5, 'A-6', ['importe no numérico o con más de dos decimales']),
+            ],
+        )
+        self.assertEqual(list(AsientoContable.objects.values_list('referencia', 'contabilizado')), [('A-1', True)])
+        self.assertEqual(saldos(), {
+            '1': Decimal('10.50'), '1.1': Decimal('10.50'), '4': Decimal('10.50'), '4.1': Decimal('10.50'),
+        })
+
+    def test_rechaza_fechas_en_periodo_cerrado(self):
+        contabilizar_lote([
+            self.asiento('A-1', [{'cuenta': '1.1', 'debe': 10}, {'cuenta': '4.1', 'haber': 10}]),
+        ], self.usuario)
+        cerrar_periodos(date(2025, 3, 31))
+
+        resultado = contabilizar_lote([
+            self.asiento('A-2', [{'cuenta': '1.1', 'debe': 10}, {'cuenta': '4.1', 'haber': 10}], fecha='2025-03-31'),
+            self.asiento('A-3', [{'cuenta': '1.1', 'debe': 10}, {'cuenta': '4.1', 'haber': 10}], fecha='2025-04-01'),
+        ], self.usuario)
+
+        self.assertEqual(resultado['errores'], [
+            {'indice': 0, 'referencia': 'A-2', 'errores': ['fecha en un periodo cerrado']},
+        ])
+        self.assertEqual(saldos()['1.1'], Decimal('20'))
+
+
+class FacturacionTests(TestCase):
+    FECHA = date(2025, 3, 10)
+
+    def setUp(self):
+        activo, caja, ingresos, ventas = crear_cuentas()
+        pasivo = CuentaContable.objects.create(codigo='2', nombre='Pasivo', tipo='pasivo')
+        CuentaContable.objects.create(codigo='1.1.03', nombre='Clientes', tipo='activo', cuenta_padre=caja)
+        CuentaContable.objects.create(codigo='4.1.01', nombre='Ventas netas', tipo='ingreso', cuenta_padre=ventas)
+        CuentaContable.objects.create(codigo='2.1.02', nombre='IVA débito', tipo='pasivo', cuenta_padre=pasivo)
+        self.cliente = crear_cliente()
+
+    def entregar(self, total):
+        return Pedido.objects.create(cliente=self.cliente, estado='entregado', total=Decimal(total))
+
+    def test_facturar_dos_veces_no_duplica(self):
+        pedidos = [self.entregar('100.00'), self.entregar('10.05')]
+        Pedido.objects.create(cliente=self.cliente, estado='pendiente', total=Decimal('50.00'))
+
+        self.assertEqual(facturar_entregados(fecha=self.FECHA, lote=1), 2)
+        self.assertEqual(facturar_entregados(fecha=self.FECHA, lote=1), 0)
+
+        facturas = Factura.objects.order_by('pedido_id')
+        self.assertEqual([factura.pedido_id for factura in facturas], [pedido.pk for pedido in pedidos])
+        self.assertEqual(
+            [(factura.subtotal, factura.iva, factura.total, factura.estado) for factura in facturas],
+            [
+                (Decimal('100.00'), Decimal('19.00'), Decimal('119.00'), 'emitida'),
+                # 10.05 * 0.19 = 1.9095
+                (Decimal('10.05'), Decimal('1.91'), Decimal('11.96'), 'emitida'),
+            ],
+        )
+        self.assertEqual(len({factura.numero for factura in facturas}), 2)
+        self.assertFalse(AsientoContable.objects.filter(contabilizado=False).exists())
+        self.assertEqual(
+            {codigo: saldo for codigo, saldo in saldos().items() if codigo in ('1.1.03', '4.1.01', '2.1.02', '1')},
+            {'1': Decimal('130.96'), '1.1.03': Decimal('130.96'), '4.1.01': Decimal('110.05'), '2.1.02': Decimal('20.91')},
+        )
+        self.assertEqual(conciliar_saldos(corregir=False), [])
+
+    def test_pedido_en_cero_queda_pagado(self):
+        pedido = self.entregar('0.00')
+
+        self.assertEqual(facturar_entregados(fecha=self.FECHA), 1)
+
+        factura = Factura.objects.get(pedido=pedido)
+        self.assertEqual(
+            (factura.estado, factura.saldo_pendiente, factura.asiento_contable), ('pagada', Decimal('0'), None)
+        )
+        self.assertEqual(antiguedad_saldos(self.FECHA)['total'], Decimal('0'))
+
+    def test_asientos_atascados_en_un_mes_cerrado_no_detienen_la_facturacion(self):
+        # El proceso murió entre la transacción del lote y la contabilización
+        self.entregar('100.00')
+        _, atascados = _facturar_lote(0, 1, 10, self.FECHA, _cuentas(), _usuario())
+        cliente = CuentaContable.objects.get(codigo='1.1.03')
+        SaldoPeriodo.objects.create(cuenta=cliente, periodo=date(2025, 3, 1))
+        self.entregar('10.00')
+
+        with self.assertRaises(PeriodoCerrado):
+            facturar_entregados(fecha=self.FECHA)
+        with self.assertLogs('finanzas.facturacion', 'WARNING') as logs:
+            self.assertEqual(facturar_entregados(fecha=date(2025, 4, 2)), 1)
+
+        self.assertIn(str(atascados), logs.output[0])
+        self.assertEqual(
+            list(AsientoContable.objects.order_by('pk').values_list('contabilizado', flat=True)), [False, True]
+        )
+        self.assertEqual(saldos()['1.1.03'], Decimal('11.90'))
+
+
+class AntiguedadSaldosTests(TestCase):
+    HOY = date(2025, 6, 30)
+
+    def setUp(self):
+        self.cliente = crear_cliente()
+        self.numeros = iter(range(1, 100))
+
+    def facturar(self, dias_atraso, total, cliente=None, estado='emitida'):
+        return Factura.objects.create(
+            numero=f'F-{next(self.numeros)}', tipo='emitida', estado=estado, cliente=cliente or self.cliente,
+            fecha_emision=self.HOY - timedelta(days=dias_atraso + 30),
+            fecha_vencimiento=self.HOY - timedelta(days=dias_atraso),
+            subtotal=Decimal(total), iva=Decimal('0'), total=Decimal(total),
+        )
+
+    def test_bordes_de_cada_tramo(self):
+        for dias_atraso, total in [(-1, 1), (0, 2), (30, 4), (31, 8), (60, 16), (61, 32), (90, 64), (91, 128)]:
+            self.facturar(dias_atraso, total)
+
+        self.assertEqual(antiguedad_saldos(self.HOY), {
+            'por_vencer': Decimal('1'),
+            'dias_0_30': Decimal('6'),
+            'dias_31_60': Decimal('24'),
+            'dias_61_90': Decimal('96'),
+            'dias_90_mas': Decimal('128'),
+            'total': Decimal('255'),
+        })
+
+    def test_descuenta_pagos_y_separa_por_cliente(self):
+        otro = crear_cliente('Otro')
+        parcial = self.facturar(10, 100)
+        pagada = self.facturar(45, 50)
+        self.facturar(45, 30, cliente=otro)
+        self.facturar(45, 999, estado='borrador')
+        Pago.objects.create(factura=parcial, fecha=self.HOY, monto=Decimal('40'), metodo='efectivo')
+        Pago.objects.create(factura=pagada, fecha=self.HOY, monto=Decimal('50'), metodo='efectivo')
+
+        pagada.refresh_from_db()
+        self.assertEqual((pagada.estado, pagada.saldo_pendiente), ('pagada', Decimal('0')))
+        filas = antiguedad_saldos(self.HOY, por_cliente=True)
+        self.assertEqual(
+            [(fila['nombre_cliente'], fila['dias_0_30'], fila['dias_31_60'], fila['total']) for fila in filas],
+            [
+                ('Cliente', Decimal('60'), Decimal('0'), Decimal('60')),
+                ('Otro', Decimal('0'), Decimal('30'), Decimal('30')),
+            ],
+        )
+        self.assertEqual(antiguedad_saldos(self.HOY, cliente_id=otro.pk)['total'], Decimal('30'))
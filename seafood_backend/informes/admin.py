@@ -3,7 +3,8 @@ from .models import Informe
 
 @admin.register(Informe)
 class InformeAdmin(admin.ModelAdmin):
-    list_display = ('titulo', 'tipo', 'fecha_creacion', 'creado_por')
-    list_filter = ('tipo', 'fecha_creacion', 'creado_por')
+    list_display = ('titulo', 'tipo', 'estado', 'fecha_creacion', 'creado_por')
+    list_filter = ('tipo', 'estado', 'fecha_creacion', 'creado_por')
     search_fields = ('titulo', 'creado_por__username')
-    readonly_fields = ('fecha_creacion', 'creado_por', 'contenido')
+    readonly_fields = ('fecha_creacion', 'creado_por', 'contenido', 'resumen', 'archivo', 'estado',
+                       'fecha_inicio_proceso', 'fecha_fin_proceso', 'error')
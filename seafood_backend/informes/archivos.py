@@ -0,0 +1,82 @@
+"""
+Almacenamiento columnar del contenido de los informes.
+
+Las tablas de un informe (listas de diccionarios) se guardan como columnas de
+NumPy en un .npz comprimido bajo MEDIA_ROOT; en la fila solo queda el resumen:
+los valores escalares, las primeras FILAS_RESUMEN filas de cada tabla (lo que
+muestra la página de informes) y el número total de filas de cada una en
+'tablas_completas'.
+
+Las columnas se guardan como '<tabla>__<columna>' con tipos nativos (float o
+texto o enteros), así que se leen con allow_pickle=False.
+"""
+import csv
+import io
+
+import numpy as np
+from django.core.files.base import ContentFile
+
+FILAS_RESUMEN = 10
+SEPARADOR = '__'
+
+
+def es_tabla(valor):
+    return isinstance(valor, list) and all(isinstance(fila, dict) for fila in valor)
+
+
+def _columna(valores):
+    if valores and all(isinstance(valor, int) and not isinstance(valor, bool) for valor in valores):
+        return np.array(valores, dtype=np.int64)
+    if all(valor is None or isinstance(valor, (int, float)) and not isinstance(valor, bool) for valor in valores):
+        return np.array([np.nan if valor is None else valor for valor in valores], dtype=float)
+    return np.array(['' if valor is None else str(valor) for valor in valores], dtype=str)
+
+
+def separar(contenido):
+    """Devuelve (resumen, columnas) a partir del contenido completo de un informe."""
+    resumen, columnas, tablas = {}, {}, {}
+    for nombre, valor in contenido.items():
+        if not es_tabla(valor) or not valor:
+            resumen[nombre] = valor
+            continue
+        campos = list(dict.fromkeys(campo for fila in valor for campo in fila))
+        for campo in campos:
+            columnas[f'{nombre}{SEPARADOR}{campo}'] = _columna([fila.get(campo) for fila in valor])
+        resumen[nombre] = valor[:FILAS_RESUMEN]
+        tablas[nombre] = len(valor)
+    resumen['tablas_completas'] = tablas
+    return resumen, columnas
+
+
+def comprimir(columnas, nombre):
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **columnas)
+    return ContentFile(buffer.getvalue(), name=nombre)
+
+
+def leer_tabla(archivo, tabla):
+    """Devuelve (campos, columnas) de una tabla del .npz, o None si no existe."""
+    prefijo = f'{tabla}{SEPARADOR}'
+    with archivo.open('rb') as f, np.load(f, allow_pickle=False) as datos:
+        campos = [clave[len(prefijo):] for clave in datos.files if clave.startswith(prefijo)]
+        if not campos:
+            return None
+        return campos, [datos[prefijo + campo] for campo in campos]
+
+
+def filas_csv(campos, columnas, bloque=1000):
+    """Genera el CSV de una tabla por bloques de filas."""
+    salida = io.StringIO()
+    escritor = csv.writer(salida)
+    escritor.writerow(campos)
+    total = len(columnas[0]) if columnas else 0
+    for inicio in range(0, total, bloque):
+        escritor.writerows(zip(*(
+            ['' if isinstance(valor, float) and np.isnan(valor) else valor for valor in columna[inicio:inicio + bloque].tolist()]
+            for columna in columnas
+        )))
+        yield salida.getvalue()
+        salida.seek(0)
+        salida.truncate()
+    if not total:
+        yield salida.getvalue()
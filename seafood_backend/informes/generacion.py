@@ -0,0 +1,139 @@
+"""
+Generación de informes en segundo plano.
+
+La vista solo crea el Informe en estado 'pendiente' y encola la tarea
+informes.tasks.generar_informe; el worker lo pasa a 'en_proceso', calcula el
+contenido y lo deja 'completado' (o 'error' con el mensaje). La página de
+informes consulta el estado hasta que termina.
+
+Si el worker muere con el informe tomado, este quedaría 'en_proceso' para
+siempre: la tarea informes.tasks.reencolar_informes_vencidos devuelve a
+'pendiente' y vuelve a encolar los que llevan más de PLAZO_PROCESO tomados.
+
+El contenido se reparte entre Informe.resumen y un .npz (ver informes.archivos).
+"""
+import logging
+from datetime import timedelta
+
+from django.db.models import Avg, Count, F, Sum
+from django.utils import timezone
+
+from clientes.models import Cliente
+from inventario.models import Producto
+from pedidos.models import DetallePedido, Pedido
+from proveedores.models import Proveedor
+
+from .archivos import comprimir, separar
+from .models import Informe
+
+logger = logging.getLogger(__name__)
+
+# Ningún informe tarda esto; pasado el plazo se da por muerto al worker
+PLAZO_PROCESO = timedelta(minutes=30)
+
+
+def generar_informe_ventas():
+    ahora = timezone.now()
+    hace_30_dias = ahora - timedelta(days=30)
+    
+    pedidos = Pedido.objects.filter(fecha_pedido__gte=hace_30_dias)
+    resumen = pedidos.aggregate(total_pedidos=Count('id'), total_ventas=Sum('total'), promedio_venta=Avg('total'))
+    
+    return {
+        'total_pedidos': resumen['total_pedidos'],
+        'total_ventas': float(resumen['total_ventas'] or 0),
+        'promedio_venta': float(resumen['promedio_venta'] or 0),
+        'productos_mas_vendidos': [
+            {'producto__nombre': fila['producto__nombre'], 'total': float(fila['total'])}
+            for fila in DetallePedido.objects.filter(pedido__in=pedidos)
+            .values('producto__nombre')
+            .annotate(total=Sum('cantidad'))
+            .order_by('-total')[:5]
+        ]
+    }
+
+def generar_informe_inventario():
+    return {
+        'total_productos': Producto.objects.count(),
+        'valor_total_inventario': float(Producto.objects.aggregate(
+            total=Sum(F('precio') * F('cantidad_stock')))['total'] or 0),
+        'productos_sin_stock': [
+            {'nombre': fila['nombre'], 'precio': float(fila['precio'])}
+            for fila in Producto.objects.filter(cantidad_stock=0).values('nombre', 'precio')
+        ],
+        'productos_stock_bajo': [
+            {'nombre': fila['nombre'], 'cantidad_stock': float(fila['cantidad_stock'])}
+            for fila in Producto.objects.filter(cantidad_stock__lt=10)
+            .values('nombre', 'cantidad_stock')
+            .order_by('cantidad_stock')
+        ]
+    }
+
+def generar_informe_clientes():
+    return {
+        'total_clientes': Cliente.objects.count(),
+        'clientes_activos': Cliente.objects.filter(activo=True).count(),
+        'clientes_inactivos': Cliente.objects.filter(activo=False).count(),
+        'mejores_clientes': [
+            {
+                'cliente__nombre': fila['cliente__nombre'],
+                'total_pedidos': fila['total_pedidos'],
+                'total_gastado': float(fila['total_gastado'] or 0),
+            }
+            for fila in Pedido.objects.values('cliente__nombre')
+            .annotate(total_pedidos=Count('id'), total_gastado=Sum('total'))
+            .order_by('-total_gastado')[:5]
+        ]
+    }
+
+def generar_informe_proveedores():
+    return {
+        'total_proveedores': Proveedor.objects.count(),
+        'proveedores_activos': Proveedor.objects.filter(activo=True).count(),
+        'proveedores_inactivos': Proveedor.objects.filter(activo=False).count()
+    }
+
+
+GENERADORES = {
+    'ventas': generar_informe_ventas,
+    'inventario': generar_informe_inventario,
+    'clientes': generar_informe_clientes,
+    'proveedores': generar_informe_proveedores,
+}
+
+
+def ejecutar_informe(informe_id):
+    """Calcula el contenido de un informe pendiente. Devuelve el estado final."""
+    # El UPDATE condicional evita que dos workers procesen el mismo informe
+    tomado = Informe.objects.filter(pk=informe_id, estado='pendiente').update(
+        estado='en_proceso', fecha_inicio_proceso=timezone.now()
+    )
+    if not tomado:
+        return None
+
+    informe = Informe.objects.get(pk=informe_id)
+    try:
+        informe.resumen, columnas = separar(GENERADORES[informe.tipo]())
+        if columnas:
+            informe.archivo.save(f'informe_{informe.pk}.npz', comprimir(columnas, 'informe.npz'), save=False)
+        informe.estado = 'completado'
+    except Exception as e:
+        logger.exception('Error al generar el informe %s', informe_id)
+        informe.estado, informe.error = 'error', str(e)
+    informe.fecha_fin_proceso = timezone.now()
+    informe.save(update_fields=['resumen', 'archivo', 'estado', 'error', 'fecha_fin_proceso'])
+    return informe.estado
+
+
+def liberar_vencidos():
+    """
+    Devuelve a 'pendiente' los informes tomados hace más de PLAZO_PROCESO.
+    Devuelve sus ids para volver a encolarlos.
+    """
+    vencidos = Informe.objects.filter(
+        estado='en_proceso', fecha_inicio_proceso__lt=timezone.now() - PLAZO_PROCESO
+    )
+    informe_ids = list(vencidos.values_list('pk', flat=True))
+    # Se repite la condición: uno que terminó entre medio no se toca
+    vencidos.filter(pk__in=informe_ids).update(estado='pendiente', fecha_inicio_proceso=None)
+    return informe_ids
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from informes.pronostico import HISTORIA_DIAS, HORIZONTE_DIAS, PERIODO, pronosticar, refrescar
+
+
+class Command(BaseCommand):
+    help = 'Ajusta el pronóstico de demanda de los productos activos y actualiza PrediccionDemanda'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--historia', type=int, default=HISTORIA_DIAS, help='Días de ventas usados')
+        parser.add_argument('--horizonte', type=int, default=HORIZONTE_DIAS, help='Días pronosticados')
+        parser.add_argument('--fragmentos', type=int, default=1, help='Partes en que se reparten los productos')
+        parser.add_argument('--fragmento', type=int, help='Procesar solo esta parte (0 .. fragmentos - 1)')
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Incorporar solo las ventas posteriores a la marca de agua de cada producto',
+        )
+        parser.add_argument(
+            '--celery', action='store_true', help='Encolar un fragmento por tarea en vez de procesar aquí'
+        )
+
+    def handle(self, *args, **options):
+        historia, horizonte, fragmentos = options['historia'], options['horizonte'], options['fragmentos']
+        if historia < 2 * PERIODO:
+            raise CommandError(f'La historia debe tener al menos {2 * PERIODO} días')
+        if horizonte < 1 or fragmentos < 1:
+            raise CommandError('El horizonte y los fragmentos deben ser positivos')
+
+        if options['celery']:
+            from informes.tasks import pronosticar_demanda
+            pronosticar_demanda.delay(fragmentos, historia, horizonte, options['incremental'])
+            self.stdout.write(self.style.SUCCESS(f'{fragmentos} fragmentos encolados'))
+            return
+
+        if options['fragmento'] is not None:
+            if not 0 <= options['fragmento'] < fragmentos:
+                raise CommandError('--fragmento debe estar entre 0 y fragmentos - 1')
+            seleccion = [options['fragmento']]
+        else:
+            seleccion = range(fragmentos)
+        funcion = refrescar if options['incremental'] else pronosticar
+        inicio = time.perf_counter()
+        total = sum(
+            funcion(fragmento, fragmentos, historia=historia, horizonte=horizonte) for fragmento in seleccion
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} productos pronosticados en {time.perf_counter() - inicio:.1f} s'
+        ))
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:32
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def quitar_duplicados(apps, schema_editor):
+    # Deja la predicción más reciente de cada (producto, periodo)
+    PrediccionDemanda = apps.get_model('informes', 'PrediccionDemanda')
+    repetidas = (
+        PrediccionDemanda.objects.values('producto', 'fecha_inicio', 'fecha_fin')
+        .annotate(total=Count('id'), ultima=Max('id')).filter(total__gt=1).order_by()
+    )
+    for grupo in repetidas:
+        PrediccionDemanda.objects.filter(
+            producto=grupo['producto'], fecha_inicio=grupo['fecha_inicio'], fecha_fin=grupo['fecha_fin']
+        ).exclude(pk=grupo['ultima']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('informes', '0002_certificacionambiental_indicadordesempeno_and_more'),
+        ('inventario', '0006_producto_temperatura_maxima'),
+    ]
+
+    operations = [
+        migrations.RunPython(quitar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='predicciondemanda',
+            constraint=models.UniqueConstraint(fields=('producto', 'fecha_inicio', 'fecha_fin'), name='prediccion_producto_periodo_unica'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('informes', '0003_prediccion_periodo_unica'),
+        ('inventario', '0006_producto_temperatura_maxima'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadoPronostico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ultima_actualizacion', models.DateTimeField()),
+                ('nivel', models.FloatField()),
+                ('tendencia', models.FloatField()),
+                ('estacion', models.JSONField(help_text='Componente estacional de lunes a domingo')),
+                ('alpha', models.FloatField()),
+                ('beta', models.FloatField()),
+                ('gamma', models.FloatField()),
+                ('suma_cuadrados', models.FloatField(help_text='Suma de errores cuadráticos a un paso')),
+                ('errores', models.PositiveIntegerField(help_text='Cantidad de errores en suma_cuadrados')),
+                ('historia_dias', models.PositiveIntegerField()),
+                ('errores_recientes', models.JSONField(default=list)),
+                ('demanda_reciente', models.JSONField(default=list)),
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='estado_pronostico', to='inventario.producto')),
+            ],
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('informes', '0004_estado_pronostico'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='informe',
+            name='error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        # Los informes existentes se generaron de forma síncrona: ya están completos
+        migrations.AddField(
+            model_name='informe',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En Proceso'), ('completado', 'Completado'), ('error', 'Error')], default='completado', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='informe',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En Proceso'), ('completado', 'Completado'), ('error', 'Error')], default='pendiente', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='informe',
+            name='fecha_fin_proceso',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='informe',
+            name='fecha_inicio_proceso',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='informe',
+            name='contenido',
+            field=models.JSONField(default=dict),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:39
+
+from django.db import migrations, models
+
+# Copia de informes.archivos al momento de esta migración: la migración no
+# debe cambiar si el módulo cambia después
+FILAS_RESUMEN = 10
+LOTE = 200
+
+
+def _resumen(contenido):
+    resumen, tablas = {}, {}
+    for nombre, valor in contenido.items():
+        if isinstance(valor, list) and valor and all(isinstance(fila, dict) for fila in valor):
+            resumen[nombre] = valor[:FILAS_RESUMEN]
+            tablas[nombre] = len(valor)
+        else:
+            resumen[nombre] = valor
+    resumen['tablas_completas'] = tablas
+    return resumen
+
+
+def resumir_existentes(apps, schema_editor):
+    # Los informes anteriores conservan su contenido completo; solo se les
+    # calcula el resumen que muestra el listado
+    Informe = apps.get_model('informes', 'Informe')
+    informes = []
+    for informe in Informe.objects.only('contenido').order_by('pk').iterator(chunk_size=LOTE):
+        informe.resumen = _resumen(informe.contenido or {})
+        informes.append(informe)
+        if len(informes) >= LOTE:
+            Informe.objects.bulk_update(informes, ['resumen'])
+            informes = []
+    Informe.objects.bulk_update(informes, ['resumen'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('informes', '0005_informe_estado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='informe',
+            name='archivo',
+            field=models.FileField(blank=True, null=True, upload_to='informes/%Y/%m/'),
+        ),
+        migrations.AddField(
+            model_name='informe',
+            name='resumen',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.RunPython(resumir_existentes, migrations.RunPython.noop),
+    ]
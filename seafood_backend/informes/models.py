@@ -14,11 +14,27 @@ class Informe(models.Model):
         ('kpis', 'Indicadores de Desempeño'),
     ]
     
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En Proceso'),
+        ('completado', 'Completado'),
+        ('error', 'Error'),
+    ]
+    
     titulo = models.CharField(max_length=200)
     tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     creado_por = models.ForeignKey(User, on_delete=models.CASCADE)
-    contenido = models.JSONField()
+    # Solo informes anteriores a los archivos columnares; los nuevos guardan
+    # el resumen en la fila y las tablas completas en `archivo`
+    contenido = models.JSONField(default=dict)
+    resumen = models.JSONField(default=dict)
+    archivo = models.FileField(upload_to='informes/%Y/%m/', null=True, blank=True)
+    # Lo genera un worker de Celery (informes.generacion)
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+    fecha_inicio_proceso = models.DateTimeField(null=True, blank=True)
+    fecha_fin_proceso = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
     
     class Meta:
         verbose_name = 'Informe'
@@ -28,6 +44,21 @@ class Informe(models.Model):
     def __str__(self):
         return f"{self.get_tipo_display()} - {self.titulo}"
 
+    @property
+    def terminado(self):
+        return self.estado in ('completado', 'error')
+
+    @property
+    def duracion(self):
+        if self.fecha_inicio_proceso and self.fecha_fin_proceso:
+            return (self.fecha_fin_proceso - self.fecha_inicio_proceso).total_seconds()
+        return None
+
+class PrediccionDemandaQuerySet(models.QuerySet):
+    def con_producto(self):
+        return self.select_related('producto')
+
+
 class PrediccionDemanda(models.Model):
     producto = models.ForeignKey('inventario.Producto', on_delete=models.CASCADE)
     fecha_inicio = models.DateField()
@@ -55,15 +86,48 @@ class PrediccionDemanda(models.Model):
         validators=[MinValueValidator(Decimal('0.00'))]
     )
     ultima_actualizacion = models.DateTimeField(auto_now=True)
+
+    objects = PrediccionDemandaQuerySet.as_manager()
     
     class Meta:
         verbose_name = 'Predicción de Demanda'
         verbose_name_plural = 'Predicciones de Demanda'
         ordering = ['-fecha_inicio']
+        constraints = [
+            # Clave del upsert de informes.pronostico
+            models.UniqueConstraint(
+                fields=['producto', 'fecha_inicio', 'fecha_fin'], name='prediccion_producto_periodo_unica'
+            ),
+        ]
     
     def __str__(self):
         return f"Predicción {self.producto.nombre} ({self.fecha_inicio} - {self.fecha_fin})"
 
+class EstadoPronostico(models.Model):
+    """
+    Estado del suavizado de un producto para el refresco incremental del
+    pronóstico (informes.pronostico). Las ventas anteriores a
+    ultima_actualizacion ya están incorporadas.
+    """
+    producto = models.OneToOneField(
+        'inventario.Producto', on_delete=models.CASCADE, related_name='estado_pronostico'
+    )
+    ultima_actualizacion = models.DateTimeField()
+    nivel = models.FloatField()
+    tendencia = models.FloatField()
+    estacion = models.JSONField(help_text="Componente estacional de lunes a domingo")
+    alpha = models.FloatField()
+    beta = models.FloatField()
+    gamma = models.FloatField()
+    suma_cuadrados = models.FloatField(help_text="Suma de errores cuadráticos a un paso")
+    errores = models.PositiveIntegerField(help_text="Cantidad de errores en suma_cuadrados")
+    historia_dias = models.PositiveIntegerField()
+    errores_recientes = models.JSONField(default=list)
+    demanda_reciente = models.JSONField(default=list)
+
+    def __str__(self):
+        return f"Estado del pronóstico de {self.producto_id}"
+
 class IndicadorDesempeno(models.Model):
     CATEGORIA_CHOICES = [
         ('financiero', 'Financiero'),
@@ -0,0 +1,352 @@
+"""
+Pronóstico de demanda por producto (Holt-Winters aditivo con estacionalidad
+semanal).
+
+La demanda diaria sale de una sola consulta agrupada por (producto, día) sobre
+DetallePedido y se arma como una matriz producto × día. El suavizado avanza día
+a día, pero cada paso actualiza a la vez todos los productos y todas las
+combinaciones de parámetros de GRILLA; al final cada producto se queda con la
+combinación de menor error cuadrático a un paso.
+
+El estado final del suavizado (nivel, tendencia, estación, errores) se guarda
+en EstadoPronostico junto con una marca de agua: el refresco incremental
+(refrescar) solo lee las ventas posteriores a la marca y avanza el estado desde
+ahí, sin volver a recorrer la historia. El reajuste completo (pronosticar)
+vuelve a elegir los parámetros.
+
+Los resultados se escriben con bulk_create(update_conflicts=True) sobre
+(producto, fecha_inicio, fecha_fin), así que volver a correr el mismo día
+reemplaza las predicciones en vez de duplicarlas. Los productos se pueden
+repartir en fragmentos (producto_id % fragmentos) para procesarlos en paralelo.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import product as combinaciones
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Mod, TruncDate
+from django.utils import timezone
+
+from inventario.models import Producto
+from pedidos.models import DetallePedido
+
+from .models import EstadoPronostico, PrediccionDemanda
+from .signals import predicciones_actualizadas
+
+PERIODO = 7
+HISTORIA_DIAS = 182
+HORIZONTE_DIAS = 7
+VENTANA_PRECISION = 28
+Z_95 = 1.96
+# (alpha, beta, gamma): nivel, tendencia y estacionalidad
+GRILLA = np.array(list(combinaciones([0.1, 0.3, 0.5], [0.01, 0.1], [0.05, 0.2])))
+DIAS_SEMANA = ['lunes', 'martes', 'miercoles', 'jueves', 'viernes', 'sabado', 'domingo']
+ESTADOS_EXCLUIDOS = ('cancelado',)
+
+
+def _fragmento(queryset, campo, fragmento, fragmentos):
+    if fragmentos <= 1:
+        return queryset
+    return queryset.annotate(_resto=Mod(F(campo), fragmentos)).filter(_resto=fragmento)
+
+
+def _inicio_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def demanda_diaria(producto_ids, desde, hasta):
+    """Matriz producto × día con las cantidades vendidas entre `desde` y `hasta` (inclusive)."""
+    indices = {producto_id: i for i, producto_id in enumerate(producto_ids)}
+    matriz = np.zeros((len(producto_ids), (hasta - desde).days + 1))
+    filas = (
+        DetallePedido.objects
+        .filter(
+            producto_id__in=producto_ids,
+            # Rango sobre la fecha_hora (usa el índice) en vez de __date
+            pedido__fecha_pedido__gte=_inicio_dia(desde),
+            pedido__fecha_pedido__lt=_inicio_dia(hasta + timedelta(days=1)),
+        )
+        .exclude(pedido__estado__in=ESTADOS_EXCLUIDOS)
+        .annotate(dia=TruncDate('pedido__fecha_pedido'))
+        .values('producto_id', 'dia')
+        .annotate(cantidad=Sum('cantidad'))
+        .order_by()
+        .values_list('producto_id', 'dia', 'cantidad')
+    )
+    for producto_id, dia, cantidad in filas:
+        matriz[indices[producto_id], (dia - desde).days] += float(cantidad)
+    return matriz
+
+
+def _suavizar(modelo, demanda, desde, alpha, beta, gamma, activos=None):
+    """
+    Avanza `modelo` (nivel, tendencia y estacion, en el lugar) sobre las
+    columnas de `demanda`, la primera con fecha `desde`. Con `activos`
+    (producto × día) los días en False no modifican al producto. Devuelve los
+    errores a un paso (día × ...).
+    """
+    nivel, tendencia, estacion = modelo['nivel'], modelo['tendencia'], modelo['estacion']
+    errores = np.zeros((demanda.shape[-1],) + nivel.shape)
+    for dia in range(demanda.shape[-1]):
+        k = (desde + timedelta(days=dia)).weekday()
+        error = demanda[:, dia] - (nivel + tendencia + estacion[..., k])
+        if activos is not None:
+            error = np.where(activos[:, dia], error, 0)
+            # Sin actividad tampoco se suma la tendencia al nivel
+            avance = np.where(activos[:, dia], tendencia, 0)
+        else:
+            avance = tendencia
+        # Forma de corrección de errores del modelo aditivo
+        nivel += avance + alpha * error
+        tendencia += alpha * beta * error
+        estacion[..., k] += gamma * (1 - alpha) * error
+        errores[dia] = error
+    return errores
+
+
+def ajustar(demanda, desde):
+    """
+    Ajusta Holt-Winters aditivo a cada fila de `demanda` (producto × día, la
+    primera columna con fecha `desde`).
+
+    Devuelve un dict de arreglos por producto: nivel, tendencia, estacion
+    (producto × 7, de lunes a domingo), parametros (alpha, beta, gamma), sse y
+    n (suma y cantidad de errores cuadráticos a un paso) y los errores
+    absolutos y la demanda de los últimos VENTANA_PRECISION días.
+    """
+    productos, dias = demanda.shape
+    if dias < 2 * PERIODO:
+        raise ValueError(f'Se necesitan al menos {2 * PERIODO} días de historia')
+    alpha, beta, gamma = (GRILLA[:, i, None] for i in range(3))
+
+    inicial = demanda[:, :PERIODO]
+    estacion = np.zeros((productos, PERIODO))
+    for k in range(PERIODO):
+        estacion[:, (desde + timedelta(days=k)).weekday()] = inicial[:, k] - inicial.mean(axis=1)
+    grilla = {
+        'nivel': np.broadcast_to(inicial.mean(axis=1), (len(GRILLA), productos)).copy(),
+        'tendencia': np.zeros((len(GRILLA), productos)),
+        'estacion': np.broadcast_to(estacion, (len(GRILLA), productos, PERIODO)).copy(),
+    }
+    errores = _suavizar(grilla, demanda[:, PERIODO:], desde + timedelta(days=PERIODO), alpha, beta, gamma)
+
+    mejor = (errores ** 2).sum(axis=0).argmin(axis=0)
+    columnas = np.arange(productos)
+    errores = errores[:, mejor, columnas]
+    ventana = min(VENTANA_PRECISION, len(errores))
+    return {
+        'nivel': grilla['nivel'][mejor, columnas],
+        'tendencia': grilla['tendencia'][mejor, columnas],
+        'estacion': grilla['estacion'][mejor, columnas],
+        'parametros': GRILLA[mejor],
+        'sse': (errores ** 2).sum(axis=0),
+        'n': np.full(productos, len(errores)),
+        'errores_recientes': np.abs(errores[-ventana:]).T,
+        'demanda_reciente': demanda[:, -ventana:],
+    }
+
+
+def actualizar(modelo, demanda, desde, activos):
+    """
+    Avanza un modelo ya ajustado con días nuevos de `demanda`, con los
+    parámetros de cada producto. `activos` marca los días posteriores a la
+    marca de agua de cada producto.
+    """
+    alpha, beta, gamma = modelo['parametros'].T
+    errores = _suavizar(modelo, demanda, desde, alpha, beta, gamma, activos)
+    modelo['sse'] = modelo['sse'] + (errores ** 2).sum(axis=0)
+    modelo['n'] = modelo['n'] + activos.sum(axis=1)
+    for i, dias_activos in enumerate(activos):
+        if dias_activos.any():
+            modelo['errores_recientes'][i] = np.concatenate(
+                [modelo['errores_recientes'][i], np.abs(errores[dias_activos, i])]
+            )[-VENTANA_PRECISION:]
+            modelo['demanda_reciente'][i] = np.concatenate(
+                [modelo['demanda_reciente'][i], demanda[i, dias_activos]]
+            )[-VENTANA_PRECISION:]
+    return modelo
+
+
+def proyectar(modelo, inicio, horizonte):
+    """
+    Suma de la demanda esperada en los `horizonte` días desde `inicio` (el día
+    siguiente al último del modelo), con su intervalo de confianza del 95 %.
+    """
+    pasos = np.arange(1, horizonte + 1)
+    dias_semana = [(inicio + timedelta(days=int(paso) - 1)).weekday() for paso in pasos]
+    esperada = (
+        modelo['nivel'][:, None] + pasos[None, :] * modelo['tendencia'][:, None]
+        + modelo['estacion'][:, dias_semana]
+    )
+    total = np.clip(esperada, 0, None).sum(axis=1)
+    # Errores a un paso independientes: la varianza de la suma crece con el horizonte
+    sigma = np.sqrt(modelo['sse'] / np.maximum(modelo['n'], 1))
+    margen = Z_95 * sigma * np.sqrt(horizonte)
+    return total, np.clip(total - margen, 0, None), total + margen
+
+
+def precision(modelo):
+    """100 menos el error porcentual ponderado (WAPE) de los últimos días, entre 0 y 100."""
+    errores = np.array([float(np.sum(fila)) for fila in modelo['errores_recientes']])
+    demanda = np.array([float(np.sum(fila)) for fila in modelo['demanda_reciente']])
+    wape = np.divide(errores, demanda, out=np.ones_like(demanda), where=demanda > 0)
+    # Sin ventas ni errores el modelo acierta (predice cero)
+    wape[(demanda == 0) & (errores == 0)] = 0
+    return np.clip(100 * (1 - wape), 0, 100)
+
+
+def _decimal(valor):
+    return Decimal(f'{valor:.2f}')
+
+
+def predicciones(producto_ids, modelo, inicio, horizonte, historia_dias):
+    total, bajo, alto = proyectar(modelo, inicio, horizonte)
+    aciertos = precision(modelo)
+    fecha_fin = inicio + timedelta(days=horizonte - 1)
+    return [
+        PrediccionDemanda(
+            producto_id=producto_id,
+            fecha_inicio=inicio,
+            fecha_fin=fecha_fin,
+            demanda_predicha=_decimal(total[i]),
+            intervalo_confianza_bajo=_decimal(bajo[i]),
+            intervalo_confianza_alto=_decimal(alto[i]),
+            factores_estacionales={
+                dia: round(float(factor), 4) for dia, factor in zip(DIAS_SEMANA, modelo['estacion'][i])
+            },
+            variables_externas={
+                'modelo': 'holt_winters_aditivo',
+                'alpha': float(modelo['parametros'][i, 0]),
+                'beta': float(modelo['parametros'][i, 1]),
+                'gamma': float(modelo['parametros'][i, 2]),
+                'historia_dias': int(historia_dias[i]),
+            },
+            precision_modelo=_decimal(aciertos[i]),
+        )
+        for i, producto_id in enumerate(producto_ids)
+    ]
+
+
+def _estados(producto_ids, modelo, marca, historia_dias):
+    return [
+        EstadoPronostico(
+            producto_id=producto_id,
+            ultima_actualizacion=marca,
+            nivel=float(modelo['nivel'][i]),
+            tendencia=float(modelo['tendencia'][i]),
+            estacion=[float(valor) for valor in modelo['estacion'][i]],
+            alpha=float(modelo['parametros'][i, 0]),
+            beta=float(modelo['parametros'][i, 1]),
+            gamma=float(modelo['parametros'][i, 2]),
+            suma_cuadrados=float(modelo['sse'][i]),
+            errores=int(modelo['n'][i]),
+            historia_dias=int(historia_dias[i]),
+            errores_recientes=[round(float(valor), 4) for valor in modelo['errores_recientes'][i]],
+            demanda_reciente=[round(float(valor), 4) for valor in modelo['demanda_reciente'][i]],
+        )
+        for i, producto_id in enumerate(producto_ids)
+    ]
+
+
+def _modelo(estados):
+    return {
+        'nivel': np.array([estado.nivel for estado in estados]),
+        'tendencia': np.array([estado.tendencia for estado in estados]),
+        'estacion': np.array([estado.estacion for estado in estados]).reshape(-1, PERIODO),
+        'parametros': np.array([[estado.alpha, estado.beta, estado.gamma] for estado in estados]).reshape(-1, 3),
+        'sse': np.array([estado.suma_cuadrados for estado in estados]),
+        'n': np.array([estado.errores for estado in estados]),
+        'errores_recientes': [np.array(estado.errores_recientes) for estado in estados],
+        'demanda_reciente': [np.array(estado.demanda_reciente) for estado in estados],
+    }
+
+
+def guardar(registros, estados):
+    with transaction.atomic():
+        PrediccionDemanda.objects.bulk_create(
+            registros,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['producto', 'fecha_inicio', 'fecha_fin'],
+            update_fields=[
+                'demanda_predicha', 'intervalo_confianza_bajo', 'intervalo_confianza_alto',
+                'factores_estacionales', 'variables_externas', 'precision_modelo', 'ultima_actualizacion',
+            ],
+        )
+        EstadoPronostico.objects.bulk_create(
+            estados,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['producto'],
+            update_fields=[
+                'ultima_actualizacion', 'nivel', 'tendencia', 'estacion', 'alpha', 'beta', 'gamma',
+                'suma_cuadrados', 'errores', 'historia_dias', 'errores_recientes', 'demanda_reciente',
+            ],
+        )
+        producto_ids = [registro.producto_id for registro in registros]
+        transaction.on_commit(
+            lambda: predicciones_actualizadas.send(sender=PrediccionDemanda, producto_ids=producto_ids)
+        )
+
+
+def _productos(fragmento, fragmentos):
+    return _fragmento(Producto.objects.filter(activo=True), 'pk', fragmento, fragmentos).order_by('pk')
+
+
+def _ajustar_y_guardar(producto_ids, historia, horizonte):
+    hoy = timezone.localdate()
+    desde = hoy - timedelta(days=historia)
+    modelo = ajustar(demanda_diaria(producto_ids, desde, hoy - timedelta(days=1)), desde)
+    historia_dias = np.full(len(producto_ids), historia)
+    guardar(
+        predicciones(producto_ids, modelo, hoy, horizonte, historia_dias),
+        _estados(producto_ids, modelo, _inicio_dia(hoy), historia_dias),
+    )
+
+
+def pronosticar(fragmento=0, fragmentos=1, historia=HISTORIA_DIAS, horizonte=HORIZONTE_DIAS):
+    """
+    Ajusta desde cero el pronóstico de los próximos `horizonte` días, desde
+    hoy, de los productos activos del fragmento. Devuelve la cantidad de productos.
+    """
+    producto_ids = list(_productos(fragmento, fragmentos).values_list('pk', flat=True))
+    if producto_ids:
+        _ajustar_y_guardar(producto_ids, historia, horizonte)
+    return len(producto_ids)
+
+
+def refrescar(fragmento=0, fragmentos=1, historia=HISTORIA_DIAS, horizonte=HORIZONTE_DIAS):
+    """
+    Avanza el pronóstico de los productos del fragmento con las ventas
+    posteriores a su marca de agua, sin reajustar los parámetros. Los productos
+    sin estado se ajustan desde cero. Devuelve la cantidad de productos.
+    """
+    hoy = timezone.localdate()
+    estados = list(
+        EstadoPronostico.objects.filter(producto__in=_productos(fragmento, fragmentos)).order_by('producto_id')
+    )
+    nuevos = list(
+        _productos(fragmento, fragmentos).filter(estado_pronostico__isnull=True).values_list('pk', flat=True)
+    )
+    if nuevos:
+        _ajustar_y_guardar(nuevos, historia, horizonte)
+    if not estados:
+        return len(nuevos)
+
+    producto_ids = [estado.producto_id for estado in estados]
+    # Primer día sin incorporar de cada producto
+    pendientes = [timezone.localdate(estado.ultima_actualizacion) for estado in estados]
+    desde = min(pendientes)
+    modelo = _modelo(estados)
+    if desde < hoy:
+        demanda = demanda_diaria(producto_ids, desde, hoy - timedelta(days=1))
+        desfases = np.array([(pendiente - desde).days for pendiente in pendientes])
+        actualizar(modelo, demanda, desde, np.arange(demanda.shape[1])[None, :] >= desfases[:, None])
+    historia_dias = np.array([estado.historia_dias + (hoy - pendiente).days for estado, pendiente in zip(estados, pendientes)])
+    guardar(
+        predicciones(producto_ids, modelo, hoy, horizonte, historia_dias),
+        _estados(producto_ids, modelo, _inicio_dia(hoy), historia_dias),
+    )
+    return len(producto_ids) + len(nuevos)
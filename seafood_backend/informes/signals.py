@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Se envía al confirmar el upsert masivo de predicciones (bulk_create, que no
+# dispara post_save), con `producto_ids`.
+predicciones_actualizadas = Signal()
@@ -0,0 +1,42 @@
+from celery import group, shared_task
+from django.conf import settings
+
+from .generacion import ejecutar_informe, liberar_vencidos
+from .pronostico import HISTORIA_DIAS, HORIZONTE_DIAS, pronosticar, refrescar
+
+
+@shared_task
+def generar_informe(informe_id):
+    return ejecutar_informe(informe_id)
+
+
+@shared_task
+def reencolar_informes_vencidos():
+    """Reencola los informes que quedaron 'en_proceso' porque el worker murió."""
+    informe_ids = liberar_vencidos()
+    for informe_id in informe_ids:
+        generar_informe.delay(informe_id)
+    return len(informe_ids)
+
+
+@shared_task
+def pronosticar_fragmento(fragmento, fragmentos, historia=HISTORIA_DIAS, horizonte=HORIZONTE_DIAS, incremental=False):
+    funcion = refrescar if incremental else pronosticar
+    return funcion(fragmento, fragmentos, historia=historia, horizonte=horizonte)
+
+
+@shared_task
+def pronosticar_demanda(fragmentos=None, historia=HISTORIA_DIAS, horizonte=HORIZONTE_DIAS, incremental=False):
+    """Reparte los productos en fragmentos que los workers pronostican en paralelo."""
+    fragmentos = fragmentos or settings.PRONOSTICO_FRAGMENTOS
+    group(
+        pronosticar_fragmento.s(fragmento, fragmentos, historia, horizonte, incremental)
+        for fragmento in range(fragmentos)
+    ).apply_async()
+    return fragmentos
+
+
+@shared_task
+def refrescar_pronosticos(fragmentos=None, horizonte=HORIZONTE_DIAS):
+    """Refresco nocturno: solo incorpora las ventas nuevas desde la marca de agua de cada producto."""
+    return pronosticar_demanda(fragmentos, horizonte=horizonte, incremental=True)
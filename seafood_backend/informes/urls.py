@@ -4,4 +4,6 @@ from . import views
 urlpatterns = [
     path("", views.index, name="informes"),
     path("generar/", views.generar_informe, name="generar_informe"),
+    path("<int:pk>/estado/", views.estado_informe, name="estado_informe"),
+    path("<int:pk>/descargar/", views.descargar_informe, name="descargar_informe"),
 ]
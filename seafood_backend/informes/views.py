@@ -1,18 +1,21 @@
-from django.shortcuts import render, redirect
+import logging
+
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Count, Sum, Avg, F, ExpressionWrapper, DecimalField
+from django.db import transaction
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from .archivos import SEPARADOR, filas_csv, leer_tabla, separar
+from .generacion import GENERADORES
 from .models import Informe
-from pedidos.models import Pedido, DetallePedido
-from inventario.models import Producto
-from clientes.models import Cliente
-from proveedores.models import Proveedor
-from datetime import datetime, timedelta
-from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
 
 @login_required
 def index(request):
-    informes = Informe.objects.all()
+    # El contenido completo solo se lee al descargar
+    informes = Informe.objects.select_related('creado_por').defer('contenido')
     context = {
         'informes': informes,
         'titulo': 'Informes y Estadísticas'
@@ -23,78 +26,66 @@ def index(request):
 def generar_informe(request):
     if request.method == 'POST':
         tipo = request.POST.get('tipo')
-        titulo = request.POST.get('titulo')
+        titulo = (request.POST.get('titulo') or '').strip()
         
-        if tipo == 'ventas':
-            contenido = generar_informe_ventas()
-        elif tipo == 'inventario':
-            contenido = generar_informe_inventario()
-        elif tipo == 'clientes':
-            contenido = generar_informe_clientes()
-        elif tipo == 'proveedores':
-            contenido = generar_informe_proveedores()
+        if tipo not in GENERADORES or not titulo:
+            messages.error(request, 'Indica un título y un tipo de informe válido.')
+            return render(request, 'informes/generar_informe.html', status=400)
         
-        Informe.objects.create(
-            titulo=titulo,
-            tipo=tipo,
-            creado_por=request.user,
-            contenido=contenido
-        )
+        informe = Informe.objects.create(titulo=titulo, tipo=tipo, creado_por=request.user)
+        # El contenido lo calcula un worker; la página consulta el estado hasta que termina
+        transaction.on_commit(lambda: _encolar(informe))
         
-        messages.success(request, 'Informe generado exitosamente.')
+        messages.success(request, 'Informe en preparación. Aparecerá en la lista cuando esté listo.')
         return redirect('informes')
         
     return render(request, 'informes/generar_informe.html')
 
-def generar_informe_ventas():
-    ahora = timezone.now()
-    hace_30_dias = ahora - timedelta(days=30)
-    
-    pedidos = Pedido.objects.filter(fecha_creacion__gte=hace_30_dias)
-    
-    return {
-        'total_pedidos': pedidos.count(),
-        'total_ventas': float(pedidos.aggregate(Sum('total'))['total__sum'] or 0),
-        'promedio_venta': float(pedidos.aggregate(Avg('total'))['total__avg'] or 0),
-        'productos_mas_vendidos': list(
-            DetallePedido.objects.filter(pedido__in=pedidos)
-            .values('producto__nombre')
-            .annotate(total=Sum('cantidad'))
-            .order_by('-total')[:5]
+def _encolar(informe):
+    from .tasks import generar_informe as tarea
+    try:
+        tarea.delay(informe.pk)
+    except Exception as e:
+        logger.exception('No se pudo encolar el informe %s', informe.pk)
+        Informe.objects.filter(pk=informe.pk, estado='pendiente').update(
+            estado='error', error=f'No se pudo encolar la generación: {e}'
         )
-    }
 
-def generar_informe_inventario():
-    return {
-        'total_productos': Producto.objects.count(),
-        'valor_total_inventario': float(Producto.objects.aggregate(
-            total=Sum(F('precio') * F('stock')))['total'] or 0),
-        'productos_sin_stock': list(
-            Producto.objects.filter(stock=0)
-            .values('nombre', 'precio')
-        ),
-        'productos_stock_bajo': list(
-            Producto.objects.filter(stock__lt=10)
-            .values('nombre', 'stock')
-            .order_by('stock')
-        )
-    }
-
-def generar_informe_clientes():
-    return {
-        'total_clientes': Cliente.objects.count(),
-        'clientes_activos': Cliente.objects.filter(activo=True).count(),
-        'clientes_inactivos': Cliente.objects.filter(activo=False).count(),
-        'mejores_clientes': list(
-            Pedido.objects.values('cliente__nombre')
-            .annotate(total_pedidos=Count('id'), total_gastado=Sum('total'))
-            .order_by('-total_gastado')[:5]
-        )
-    }
+@login_required
+def estado_informe(request, pk):
+    informe = get_object_or_404(
+        Informe.objects.only('estado', 'error', 'fecha_inicio_proceso', 'fecha_fin_proceso'), pk=pk
+    )
+    return JsonResponse({
+        'id': informe.pk,
+        'estado': informe.estado,
+        'terminado': informe.terminado,
+        'duracion': informe.duracion,
+        'error': informe.error,
+    })
 
-def generar_informe_proveedores():
-    return {
-        'total_proveedores': Proveedor.objects.count(),
-        'proveedores_activos': Proveedor.objects.filter(activo=True).count(),
-        'proveedores_inactivos': Proveedor.objects.filter(activo=False).count()
-    }
+@login_required
+def descargar_informe(request, pk):
+    """Descarga el informe completo (.npz) o una de sus tablas como CSV con ?tabla=."""
+    informe = get_object_or_404(Informe.objects.defer('resumen'), pk=pk, estado='completado')
+    tabla = request.GET.get('tabla')
+    if tabla:
+        if informe.archivo:
+            datos = leer_tabla(informe.archivo, tabla)
+        else:
+            # Informes anteriores a los archivos columnares
+            columnas = {
+                clave.split(SEPARADOR, 1)[1]: valores
+                for clave, valores in separar(informe.contenido)[1].items() if clave.startswith(f'{tabla}{SEPARADOR}')
+            }
+            datos = (list(columnas), list(columnas.values())) if columnas else None
+        if datos is None:
+            raise Http404('El informe no tiene esa tabla')
+        respuesta = StreamingHttpResponse(filas_csv(*datos), content_type='text/csv; charset=utf-8')
+        respuesta['Content-Disposition'] = f'attachment; filename="informe_{informe.pk}_{tabla}.csv"'
+        return respuesta
+    if informe.archivo:
+        return FileResponse(informe.archivo.open('rb'), as_attachment=True, filename=f'informe_{informe.pk}.npz')
+    respuesta = JsonResponse(informe.contenido)
+    respuesta['Content-Disposition'] = f'attachment; filename="informe_{informe.pk}.json"'
+    return respuesta
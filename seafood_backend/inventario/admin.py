@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Producto, Categoria, PuntoControlHACCP, RegistroCalidad, Incidencia
+from .models import (
+    Producto, Categoria, PuntoControlHACCP, RegistroCalidad, Incidencia,
+    MovimientoStock, SnapshotStock, CambioHistorial
+)
 
 @admin.register(Producto)
 class ProductoAdmin(admin.ModelAdmin):
@@ -33,3 +36,25 @@ class IncidenciaAdmin(admin.ModelAdmin):
     list_filter = ('severidad', 'estado')
     search_fields = ('titulo', 'descripcion', 'producto__nombre')
     readonly_fields = ('fecha_deteccion', 'fecha_resolucion')
+
+@admin.register(MovimientoStock)
+class MovimientoStockAdmin(admin.ModelAdmin):
+    list_display = ('producto', 'tipo', 'cantidad', 'referencia', 'usuario', 'fecha')
+    list_filter = ('tipo',)
+    search_fields = ('producto__nombre', 'referencia', 'motivo')
+    raw_id_fields = ('producto',)
+    date_hierarchy = 'fecha'
+
+@admin.register(SnapshotStock)
+class SnapshotStockAdmin(admin.ModelAdmin):
+    list_display = ('producto', 'cantidad', 'hasta_fecha', 'fecha_actualizacion')
+    search_fields = ('producto__nombre',)
+    readonly_fields = ('fecha_actualizacion',)
+
+@admin.register(CambioHistorial)
+class CambioHistorialAdmin(admin.ModelAdmin):
+    list_display = ('content_type', 'object_id', 'tipo', 'usuario', 'fecha')
+    list_filter = ('content_type', 'tipo')
+    search_fields = ('object_id',)
+    date_hierarchy = 'fecha'
+    readonly_fields = ('content_type', 'object_id', 'tipo', 'cambios', 'usuario', 'fecha')
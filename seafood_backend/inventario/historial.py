@@ -0,0 +1,256 @@
+"""
+Historial liviano por diferencias.
+
+Reemplaza a simple_history.HistoricalRecords en los modelos de alta rotación:
+en lugar de copiar la fila completa en cada guardado, registra en
+CambioHistorial solo los campos seguidos que cambiaron, como un JSON compacto.
+Los guardados que no cambian ningún campo seguido no escriben nada.
+
+Los valores originales salen de una copia del __dict__ que se toma al cargar la
+fila (from_db, o al releerla con refresh_from_db) y solo se convierten al
+guardar: leer objetos que no se guardan no cuesta más que la copia.
+
+Uso:
+
+    class Producto(models.Model):
+        ...
+        historial = HistorialLigero(excluir=['descripcion', 'imagen'])
+
+    producto.historial.all()      # cambios de un producto
+    Producto.historial.all()      # cambios de todos los productos
+"""
+import datetime
+from decimal import Decimal
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import class_prepared, post_delete, post_save
+from simple_history.models import HistoricalRecords
+
+
+def _modelo_cambio():
+    return apps.get_model('inventario', 'CambioHistorial')
+
+
+def _serializar(valor):
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, (datetime.date, datetime.time)):
+        return valor.isoformat()
+    if isinstance(valor, FieldFile):
+        return valor.name or None
+    return valor
+
+
+def _usuario_actual():
+    # HistoryRequestMiddleware de simple_history deja el request en este contexto
+    request = getattr(HistoricalRecords.context, 'request', None)
+    usuario = getattr(request, 'user', None)
+    if usuario is not None and usuario.is_authenticated:
+        return usuario
+    return None
+
+
+class HistorialLigero:
+    def __init__(self, campos=None, excluir=()):
+        self.campos = campos
+        self.excluir = set(excluir)
+
+    def contribute_to_class(self, cls, name):
+        self.nombre = name
+        class_prepared.connect(self._preparar, sender=cls, weak=False)
+
+    def _preparar(self, sender, **kwargs):
+        self.modelo = sender
+        self.campos_seguidos = [
+            field for field in sender._meta.concrete_fields
+            if not field.primary_key
+            and not getattr(field, 'auto_now', False)
+            and not getattr(field, 'auto_now_add', False)
+            and (self.campos is None or field.name in self.campos)
+            and field.name not in self.excluir
+        ]
+        sender._historial_ligero = self
+        setattr(sender, self.nombre, DescriptorHistorial(sender))
+
+        cargar = sender.from_db.__func__
+
+        def from_db(cls, db, field_names, values):
+            instance = cargar(cls, db, field_names, values)
+            instance._historial_original = instance.__dict__.copy()
+            return instance
+        sender.from_db = classmethod(from_db)
+
+        refrescar = sender.refresh_from_db
+
+        def refresh_from_db(instance, using=None, fields=None, **kwargs):
+            refrescar(instance, using, fields, **kwargs)
+            if fields is None:
+                instance._historial_original = instance.__dict__.copy()
+                return
+            # Solo los campos releídos; el resto conserva su original y sus cambios sin guardar
+            original = instance.__dict__.setdefault('_historial_original', {})
+            for field in sender._meta.concrete_fields:
+                if (field.name in fields or field.attname in fields) and field.attname in instance.__dict__:
+                    original[field.attname] = instance.__dict__[field.attname]
+        sender.refresh_from_db = refresh_from_db
+
+        post_save.connect(self._registrar_guardado, sender=sender, weak=False)
+        post_delete.connect(self._registrar_eliminacion, sender=sender, weak=False)
+
+    def valores(self, instance):
+        valores = {}
+        for field in self.campos_seguidos:
+            if field.attname in instance.__dict__:
+                valores[field.attname] = field.to_python(instance.__dict__[field.attname])
+        return valores
+
+    def originales(self, instance):
+        """Valores seguidos de la última carga o del último guardado."""
+        original = getattr(instance, '_historial_original', {})
+        return {
+            field.attname: field.to_python(original[field.attname])
+            for field in self.campos_seguidos if field.attname in original
+        }
+
+    def diferencias(self, instance):
+        original = self.originales(instance)
+        return {
+            attname: _serializar(valor)
+            for attname, valor in self.valores(instance).items()
+            if attname not in original or original[attname] != valor
+        }
+
+    def nuevo_cambio(self, instance, tipo, cambios, usuario=None):
+        return _modelo_cambio()(
+            content_type=ContentType.objects.get_for_model(self.modelo),
+            object_id=instance.pk,
+            tipo=tipo,
+            cambios=cambios,
+            usuario=usuario,
+        )
+
+    def _registrar_guardado(self, sender, instance, created, raw=False, **kwargs):
+        if raw:
+            return
+        if created:
+            cambios = {attname: _serializar(valor) for attname, valor in self.valores(instance).items()}
+        else:
+            cambios = self.diferencias(instance)
+        if cambios:
+            self.nuevo_cambio(instance, '+' if created else '~', cambios, _usuario_actual()).save()
+        instance._historial_original = self.valores(instance)
+
+    def _registrar_eliminacion(self, sender, instance, **kwargs):
+        self.nuevo_cambio(instance, '-', {}, _usuario_actual()).save()
+
+
+class DescriptorHistorial:
+    def __init__(self, modelo):
+        self.modelo = modelo
+
+    def __get__(self, instance, owner=None):
+        cambios = _modelo_cambio().objects.filter(
+            content_type=ContentType.objects.get_for_model(self.modelo)
+        )
+        if instance is not None:
+            cambios = cambios.filter(object_id=instance.pk)
+        return cambios
+
+
+def bulk_create_con_historial(objs, batch_size=None):
+    """bulk_create que además inserta en bloque el alta de cada objeto en el historial."""
+    objs = list(objs)
+    if not objs:
+        return objs
+    modelo = type(objs[0])
+    historial = modelo._historial_ligero
+    usuario = _usuario_actual()
+
+    with transaction.atomic():
+        creados = modelo.objects.bulk_create(objs, batch_size=batch_size)
+        _modelo_cambio().objects.bulk_create(
+            [
+                historial.nuevo_cambio(
+                    obj, '+',
+                    {attname: _serializar(valor) for attname, valor in historial.valores(obj).items()},
+                    usuario,
+                )
+                for obj in creados
+            ],
+            batch_size=batch_size,
+        )
+    for obj in creados:
+        obj._historial_original = historial.valores(obj)
+    return creados
+
+
+def bulk_update_con_historial(objs, campos, batch_size=None):
+    """bulk_update que registra en bloque solo las diferencias de cada objeto."""
+    objs = list(objs)
+    if not objs:
+        return 0
+    modelo = type(objs[0])
+    historial = modelo._historial_ligero
+    usuario = _usuario_actual()
+
+    cambios = []
+    for obj in objs:
+        diferencias = historial.diferencias(obj)
+        if diferencias:
+            cambios.append(historial.nuevo_cambio(obj, '~', diferencias, usuario))
+
+    with transaction.atomic():
+        actualizados = modelo.objects.bulk_update(objs, campos, batch_size=batch_size)
+        _modelo_cambio().objects.bulk_create(cambios, batch_size=batch_size)
+    for obj in objs:
+        obj._historial_original = historial.valores(obj)
+    return actualizados
+
+
+def bulk_upsert_con_historial(objs, unique_fields, update_fields, batch_size=None):
+    """
+    bulk_create(update_conflicts=True) con historial: registra el alta de los
+    objetos nuevos (sin pk) y las diferencias de los existentes, que deben venir
+    cargados de la base. Los existentes sin cambios no se escriben.
+    Devuelve (creados, modificados).
+    """
+    objs = list(objs)
+    if not objs:
+        return [], []
+    modelo = type(objs[0])
+    historial = modelo._historial_ligero
+    usuario = _usuario_actual()
+
+    nuevos, modificados, diferencias = [], [], []
+    for obj in objs:
+        if obj.pk is None:
+            nuevos.append(obj)
+            continue
+        cambios = historial.diferencias(obj)
+        if cambios:
+            modificados.append(obj)
+            diferencias.append(cambios)
+
+    with transaction.atomic():
+        modelo.objects.bulk_create(
+            nuevos + modificados, batch_size=batch_size,
+            update_conflicts=True, unique_fields=unique_fields, update_fields=update_fields,
+        )
+        _modelo_cambio().objects.bulk_create(
+            [
+                historial.nuevo_cambio(
+                    obj, '+',
+                    {attname: _serializar(valor) for attname, valor in historial.valores(obj).items()},
+                    usuario,
+                )
+                for obj in nuevos
+            ]
+            + [historial.nuevo_cambio(obj, '~', cambios, usuario) for obj, cambios in zip(modificados, diferencias)],
+            batch_size=batch_size,
+        )
+    for obj in nuevos + modificados:
+        obj._historial_original = historial.valores(obj)
+    return nuevos, modificados
@@ -0,0 +1,201 @@
+"""
+Importación masiva del catálogo de productos y listas de precios.
+
+El archivo (CSV o Excel) se lee con pandas por lotes de LOTE filas. Cada lote
+se valida con operaciones sobre columnas completas, se cruzan los códigos con
+los productos existentes en una sola consulta y se escribe con
+bulk_upsert_con_historial (INSERT ... ON CONFLICT (codigo) DO UPDATE), que
+registra el historial de todo el lote en otro INSERT. Los productos que no
+cambian no se escriben.
+
+Reglas:
+- `codigo` identifica el producto: si existe se actualiza, si no se crea.
+  Las filas sin código crean productos con códigos reservados en bloque
+  (inventario.secuencias), un UPDATE por lote.
+- Solo se tocan las columnas presentes en el archivo; una celda vacía deja el
+  valor actual (las listas de precios suelen traer solo codigo y precio).
+- Un producto nuevo necesita nombre y precio.
+- Las categorías se buscan por nombre y se crean si no existen.
+- Si un código se repite, gana la última fila.
+- Las filas inválidas se informan con su número de línea y no detienen la carga.
+"""
+from decimal import Decimal
+
+import pandas as pd
+from django.db import transaction
+
+from .historial import bulk_create_con_historial, bulk_upsert_con_historial
+from .models import Categoria, Producto
+from .secuencias import codigos_diarios
+from .signals import catalogo_importado
+
+LOTE = 5000
+MAX_ERRORES = 200
+DOS_DECIMALES = Decimal('0.01')
+UN_DECIMAL = Decimal('0.1')
+
+COLUMNAS = [
+    'codigo', 'nombre', 'categoria', 'precio', 'costo', 'unidad',
+    'temperatura_maxima', 'codigo_lote', 'activo', 'descripcion',
+]
+# columna: (límite exclusivo del valor absoluto, cuantización)
+DECIMALES = {
+    'precio': (Decimal('1e8'), DOS_DECIMALES),
+    'costo': (Decimal('1e8'), DOS_DECIMALES),
+    'temperatura_maxima': (Decimal('1e3'), UN_DECIMAL),
+}
+LARGOS = {'codigo': 50, 'nombre': 200, 'categoria': 100, 'codigo_lote': 50}
+UNIDADES = {unidad for unidad, _ in Producto.UNIDAD_CHOICES}
+VERDADEROS = {'1', 'si', 'sí', 'true', 'verdadero', 'x'}
+FALSOS = {'0', 'no', 'false', 'falso'}
+
+
+def leer_lotes(archivo, nombre='', lote=LOTE, separador=','):
+    """Devuelve DataFrames de texto de hasta `lote` filas, con el índice continuo entre lotes."""
+    if nombre.lower().endswith(('.xlsx', '.xls')):
+        # read_excel no lee por partes: se carga la hoja y se recorre por lotes
+        hoja = pd.read_excel(archivo, dtype=str).fillna('')
+        for inicio in range(0, len(hoja), lote):
+            yield hoja.iloc[inicio:inicio + lote]
+    else:
+        yield from pd.read_csv(
+            archivo, dtype=str, keep_default_na=False, chunksize=lote, sep=separador, encoding='utf-8-sig',
+        )
+
+
+def _normalizar(tabla):
+    tabla = tabla.rename(columns=lambda columna: str(columna).strip().lower().replace(' ', '_'))
+    tabla = tabla[[columna for columna in COLUMNAS if columna in tabla.columns]]
+    return tabla.apply(lambda columna: columna.astype(str).str.strip())
+
+
+def _validar(tabla, existentes):
+    """Devuelve un DataFrame booleano con una columna por tipo de error."""
+    problemas = {}
+    for columna, largo in LARGOS.items():
+        if columna in tabla:
+            problemas[f'{columna} supera {largo} caracteres'] = tabla[columna].str.len() > largo
+
+    nuevos = ~tabla['codigo'].isin(existentes)
+    for columna in ('nombre', 'precio'):
+        vacio = tabla[columna] == '' if columna in tabla else pd.Series(True, index=tabla.index)
+        problemas[f'falta {columna} para un producto nuevo'] = nuevos & vacio
+
+    for columna, (limite, _) in DECIMALES.items():
+        if columna not in tabla:
+            continue
+        valores = pd.to_numeric(tabla[columna].str.replace(',', '.', regex=False), errors='coerce')
+        presente = tabla[columna] != ''
+        problemas[f'{columna} no es un número'] = presente & valores.isna()
+        fuera = valores.abs() >= float(limite)
+        if columna != 'temperatura_maxima':
+            fuera |= valores < 0
+        problemas[f'{columna} fuera de rango'] = presente & fuera
+
+    if 'unidad' in tabla:
+        problemas['unidad inválida'] = (tabla['unidad'] != '') & ~tabla['unidad'].str.lower().isin(UNIDADES)
+    if 'activo' in tabla:
+        problemas['activo debe ser sí o no'] = (
+            (tabla['activo'] != '') & ~tabla['activo'].str.lower().isin(VERDADEROS | FALSOS)
+        )
+    return pd.DataFrame(problemas, index=tabla.index)
+
+
+def _valores(fila, columnas, categorias):
+    """Convierte las celdas no vacías de una fila validada a valores del modelo."""
+    valores = {}
+    for columna in columnas:
+        texto = fila[columna]
+        if texto == '' or columna == 'codigo':
+            continue
+        if columna in DECIMALES:
+            valores[columna] = Decimal(texto.replace(',', '.')).quantize(DECIMALES[columna][1])
+        elif columna == 'categoria':
+            valores['categoria_id'] = categorias[texto]
+        elif columna == 'unidad':
+            valores[columna] = texto.lower()
+        elif columna == 'activo':
+            valores[columna] = texto.lower() in VERDADEROS
+        else:
+            valores[columna] = texto
+    return valores
+
+
+def importar_catalogo(archivo, nombre='', lote=LOTE, separador=','):
+    """
+    Importa el catálogo de `archivo`. `nombre` decide el formato (.xlsx/.xls
+    para Excel, CSV en otro caso). Devuelve el resumen de la carga.
+    """
+    resultado = {
+        'filas': 0, 'creados': 0, 'actualizados': 0, 'sin_cambios': 0,
+        'categorias_creadas': 0, 'rechazadas': 0, 'errores': [],
+    }
+    categorias = dict(Categoria.objects.values_list('nombre', 'pk'))
+    for tabla in leer_lotes(archivo, nombre, lote, separador):
+        tabla = _normalizar(tabla)
+        if 'codigo' not in tabla:
+            raise ValueError('El archivo no tiene la columna codigo')
+        resultado['filas'] += len(tabla)
+        _importar_lote(tabla, categorias, resultado)
+    return resultado
+
+
+def _importar_lote(tabla, categorias, resultado):
+    # Si un código se repite en el lote, gana la última fila
+    repetidas = tabla['codigo'].duplicated(keep='last') & (tabla['codigo'] != '')
+    resultado['sin_cambios'] += int(repetidas.sum())
+    tabla = tabla[~repetidas]
+
+    existentes = Producto.objects.in_bulk(list(set(tabla['codigo']) - {''}), field_name='codigo')
+    problemas = _validar(tabla, existentes)
+    invalidas = problemas.any(axis=1)
+    for indice in invalidas[invalidas].index:
+        resultado['rechazadas'] += 1
+        if len(resultado['errores']) < MAX_ERRORES:
+            resultado['errores'].append({
+                # +2: la línea 1 es la cabecera y el índice empieza en 0
+                'fila': int(indice) + 2,
+                'codigo': tabla.at[indice, 'codigo'],
+                'errores': list(problemas.columns[problemas.loc[indice]]),
+            })
+    tabla = tabla[~invalidas]
+    if tabla.empty:
+        return
+
+    columnas = list(tabla.columns)
+    with transaction.atomic():
+        if 'categoria' in tabla:
+            faltantes = set(tabla['categoria']) - set(categorias) - {''}
+            if faltantes:
+                nuevas = bulk_create_con_historial([Categoria(nombre=nombre) for nombre in sorted(faltantes)])
+                categorias.update((categoria.nombre, categoria.pk) for categoria in nuevas)
+                resultado['categorias_creadas'] += len(nuevas)
+                transaction.on_commit(lambda: catalogo_importado.send(sender=Categoria, producto_ids=[]))
+
+        sin_codigo = tabla['codigo'] == ''
+        if sin_codigo.any():
+            tabla = tabla.copy()
+            tabla.loc[sin_codigo, 'codigo'] = codigos_diarios('PROD', int(sin_codigo.sum()))
+        anteriores = {codigo: (producto.activo, producto.cantidad_stock) for codigo, producto in existentes.items()}
+        productos = []
+        for fila in tabla.to_dict('records'):
+            producto = existentes.get(fila['codigo']) or Producto(codigo=fila['codigo'])
+            for campo, valor in _valores(fila, columnas, categorias).items():
+                setattr(producto, campo, valor)
+            productos.append(producto)
+        campos = [columna for columna in columnas if columna != 'codigo']
+        creados, modificados = bulk_upsert_con_historial(
+            productos, ['codigo'], [*campos, 'fecha_actualizacion'], batch_size=1000
+        )
+        estados = {
+            producto.pk: (anteriores.get(producto.codigo), (producto.activo, producto.cantidad_stock))
+            for producto in creados + modificados
+        }
+        ids = list(estados)
+        if ids:
+            transaction.on_commit(
+                lambda: catalogo_importado.send(sender=Producto, producto_ids=ids, estados=estados)
+            )
+    resultado['creados'] += len(creados)
+    resultado['actualizados'] += len(modificados)
+    resultado['sin_cambios'] += len(productos) - len(creados) - len(modificados)
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventario.stock import compactar_movimientos
+
+
+class Command(BaseCommand):
+    help = 'Compacta los movimientos de stock antiguos en snapshots por producto'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int, default=90,
+            help='Conservar en el libro los movimientos de los últimos N días (por defecto 90)',
+        )
+
+    def handle(self, *args, **options):
+        corte = timezone.now() - timedelta(days=options['dias'])
+        compactados = compactar_movimientos(corte)
+        self.stdout.write(self.style.SUCCESS(
+            f'{compactados} movimientos compactados (anteriores a {corte:%Y-%m-%d %H:%M})'
+        ))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.importacion import LOTE, importar_catalogo
+
+
+class Command(BaseCommand):
+    help = 'Importa o actualiza productos por código desde un CSV o Excel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--lote', type=int, default=LOTE, help=f'Filas por lote (por defecto {LOTE})')
+        parser.add_argument('--separador', default=',', help='Separador de columnas del CSV')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                resultado = importar_catalogo(
+                    archivo, options['archivo'], lote=options['lote'], separador=options['separador']
+                )
+        except (OSError, ValueError, ImportError) as e:
+            raise CommandError(f'No se pudo importar {options["archivo"]}: {e}')
+
+        for error in resultado['errores']:
+            self.stderr.write(f"Fila {error['fila']} ({error['codigo'] or 'sin código'}): {', '.join(error['errores'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['filas']} filas en {time.perf_counter() - inicio:.1f} s: "
+            f"{resultado['creados']} creados, {resultado['actualizados']} actualizados, "
+            f"{resultado['sin_cambios']} sin cambios, {resultado['rechazadas']} rechazadas, "
+            f"{resultado['categorias_creadas']} categorías nuevas"
+        ))
@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventario.models import CambioHistorial
+
+
+class Command(BaseCommand):
+    help = 'Elimina del historial liviano los cambios más antiguos que el período de retención'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int, default=365,
+            help='Conservar los cambios de los últimos N días (por defecto 365)',
+        )
+        parser.add_argument(
+            '--modelo', action='append', default=[],
+            help='Limitar a un modelo, p. ej. inventario.Producto (se puede repetir)',
+        )
+        parser.add_argument(
+            '--lote', type=int, default=5000,
+            help='Cantidad de filas eliminadas por consulta (por defecto 5000)',
+        )
+
+    def handle(self, *args, **options):
+        corte = timezone.now() - timedelta(days=options['dias'])
+        cambios = CambioHistorial.objects.filter(fecha__lt=corte)
+
+        if options['modelo']:
+            try:
+                modelos = [apps.get_model(etiqueta) for etiqueta in options['modelo']]
+            except (LookupError, ValueError) as e:
+                raise CommandError(str(e))
+            cambios = cambios.filter(
+                content_type__in=ContentType.objects.get_for_models(*modelos).values()
+            )
+
+        # Se elimina por lotes de ids para no mantener una transacción gigante
+        eliminados = 0
+        while True:
+            ids = list(cambios.order_by('id').values_list('id', flat=True)[:options['lote']])
+            if not ids:
+                break
+            eliminados += CambioHistorial.objects.filter(id__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{eliminados} cambios de historial eliminados (anteriores a {corte:%Y-%m-%d})'
+        ))
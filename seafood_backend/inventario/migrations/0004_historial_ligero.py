@@ -0,0 +1,157 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:53
+
+import datetime
+from decimal import Decimal
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+CAMPOS_SEGUIDOS = {
+    'Categoria': ['nombre', 'descripcion'],
+    'Producto': [
+        'nombre', 'codigo', 'codigo_lote', 'categoria_id', 'precio', 'costo',
+        'cantidad_stock', 'unidad', 'activo',
+    ],
+    'PuntoControlHACCP': ['nombre', 'descripcion', 'limite_critico', 'medida_correctiva'],
+    'RegistroCalidad': ['producto_id', 'punto_control_id', 'valor_medido', 'estado', 'observaciones'],
+    'Incidencia': [
+        'producto_id', 'titulo', 'descripcion', 'severidad', 'estado',
+        'accion_correctiva', 'fecha_resolucion',
+    ],
+}
+
+
+def _serializar(valor):
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, (datetime.date, datetime.time)):
+        return valor.isoformat()
+    return valor
+
+
+def convertir_historial(apps, schema_editor):
+    """Convierte las filas completas de simple_history en cambios por diferencias."""
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    CambioHistorial = apps.get_model('inventario', 'CambioHistorial')
+
+    for modelo, campos in CAMPOS_SEGUIDOS.items():
+        Historico = apps.get_model('inventario', f'Historical{modelo}')
+        content_type, _ = ContentType.objects.get_or_create(app_label='inventario', model=modelo.lower())
+        anteriores = {}
+        lote = []
+        filas = Historico.objects.order_by('history_date', 'history_id').values(
+            'id', 'history_type', 'history_date', 'history_user_id', *campos
+        )
+        for fila in filas.iterator(chunk_size=2000):
+            valores = {campo: _serializar(fila[campo]) for campo in campos}
+            previo = anteriores.get(fila['id'])
+            anteriores[fila['id']] = valores
+            if fila['history_type'] == '-':
+                cambios = {}
+            elif fila['history_type'] == '+' or previo is None:
+                cambios = valores
+            else:
+                cambios = {campo: valor for campo, valor in valores.items() if previo.get(campo) != valor}
+                if not cambios:
+                    continue
+            lote.append(CambioHistorial(
+                content_type=content_type,
+                object_id=fila['id'],
+                tipo=fila['history_type'],
+                cambios=cambios,
+                usuario_id=fila['history_user_id'],
+                fecha=fila['history_date'],
+            ))
+            if len(lote) >= 2000:
+                CambioHistorial.objects.bulk_create(lote)
+                lote = []
+        CambioHistorial.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('inventario', '0003_movimientostock_snapshotstock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioHistorial',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('tipo', models.CharField(choices=[('+', 'Creación'), ('~', 'Modificación'), ('-', 'Eliminación')], max_length=1)),
+                ('cambios', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Cambio de Historial',
+                'verbose_name_plural': 'Cambios de Historial',
+                'ordering': ['-fecha', '-id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='cambiohistorial',
+            index=models.Index(fields=['content_type', 'object_id', 'fecha'], name='inventario__content_53c184_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cambiohistorial',
+            index=models.Index(fields=['fecha'], name='inventario__fecha_1ae01d_idx'),
+        ),
+        migrations.RunPython(convertir_historial, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='historicalincidencia',
+            name='history_user',
+        ),
+        migrations.RemoveField(
+            model_name='historicalincidencia',
+            name='producto',
+        ),
+        migrations.RemoveField(
+            model_name='historicalproducto',
+            name='categoria',
+        ),
+        migrations.RemoveField(
+            model_name='historicalproducto',
+            name='history_user',
+        ),
+        migrations.RemoveField(
+            model_name='historicalpuntocontrolhaccp',
+            name='history_user',
+        ),
+        migrations.RemoveField(
+            model_name='historicalregistrocalidad',
+            name='history_user',
+        ),
+        migrations.RemoveField(
+            model_name='historicalregistrocalidad',
+            name='producto',
+        ),
+        migrations.RemoveField(
+            model_name='historicalregistrocalidad',
+            name='punto_control',
+        ),
+        migrations.DeleteModel(
+            name='HistoricalCategoria',
+        ),
+        migrations.DeleteModel(
+            name='HistoricalIncidencia',
+        ),
+        migrations.DeleteModel(
+            name='HistoricalProducto',
+        ),
+        migrations.DeleteModel(
+            name='HistoricalPuntoControlHACCP',
+        ),
+        migrations.DeleteModel(
+            name='HistoricalRegistroCalidad',
+        ),
+    ]
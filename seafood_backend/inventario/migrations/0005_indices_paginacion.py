@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0004_historial_ligero'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['nombre', 'id'], name='inventario__nombre_b313c2_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0005_indices_paginacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='temperatura_maxima',
+            field=models.DecimalField(blank=True, decimal_places=1, help_text='Temperatura máxima de conservación en °C', max_digits=4, null=True),
+        ),
+    ]
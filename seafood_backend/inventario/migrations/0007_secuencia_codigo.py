@@ -0,0 +1,25 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0006_producto_temperatura_maxima'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaCodigo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefijo', models.CharField(max_length=40, unique=True)),
+                ('ultimo', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Secuencia de Códigos',
+                'verbose_name_plural': 'Secuencias de Códigos',
+            },
+        ),
+    ]
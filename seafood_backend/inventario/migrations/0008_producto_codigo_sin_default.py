@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0007_secuencia_codigo'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='producto',
+            name='codigo',
+            field=models.CharField(blank=True, help_text='Código único del producto generado automáticamente', max_length=50, unique=True),
+        ),
+    ]
@@ -1,14 +1,42 @@
 from django.db import models
-from simple_history.models import HistoricalRecords
-import uuid
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
+from .historial import HistorialLigero
+
+class CambioHistorial(models.Model):
+    TIPO_CHOICES = [
+        ('+', 'Creación'),
+        ('~', 'Modificación'),
+        ('-', 'Eliminación'),
+    ]
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    tipo = models.CharField(max_length=1, choices=TIPO_CHOICES)
+    cambios = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    fecha = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Cambio de Historial"
+        verbose_name_plural = "Cambios de Historial"
+        ordering = ['-fecha', '-id']
+        indexes = [
+            models.Index(fields=['content_type', 'object_id', 'fecha']),
+            models.Index(fields=['fecha']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.content_type.model} #{self.object_id} - {self.fecha}"
 
 class Categoria(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
     descripcion = models.TextField(blank=True, null=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
-    historial = HistoricalRecords()
+    historial = HistorialLigero()
     
     class Meta:
         verbose_name = "Categoría"
@@ -17,11 +45,22 @@ class Categoria(models.Model):
     def __str__(self):
         return self.nombre
 
+class SecuenciaCodigo(models.Model):
+    """Último número entregado de una secuencia de códigos (ver inventario.secuencias)."""
+    prefijo = models.CharField(max_length=40, unique=True)
+    ultimo = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Secuencia de Códigos"
+        verbose_name_plural = "Secuencias de Códigos"
+
+    def __str__(self):
+        return f"{self.prefijo} ({self.ultimo})"
+
 def generate_unique_code():
-    # Generar código único basado en timestamp y uuid
-    timestamp = timezone.now().strftime('%y%m%d')
-    unique_id = str(uuid.uuid4())[:6].upper()
-    return f"PROD-{timestamp}-{unique_id}"
+    # PROD-yymmdd-0000001: secuencia diaria reservada por bloques
+    from .secuencias import siguiente_codigo
+    return siguiente_codigo('PROD')
 
 class Producto(models.Model):
     UNIDAD_CHOICES = [
@@ -32,10 +71,11 @@ class Producto(models.Model):
     ]
     
     nombre = models.CharField(max_length=200)
+    # Sin default: se reserva en save() y no en cada instancia que se crea en memoria
     codigo = models.CharField(
         max_length=50,
         unique=True,
-        default=generate_unique_code,
+        blank=True,
         help_text="Código único del producto generado automáticamente"
     )
     codigo_lote = models.CharField(max_length=50, blank=True, null=True)
@@ -45,19 +85,34 @@ class Producto(models.Model):
     costo = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     cantidad_stock = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     unidad = models.CharField(max_length=10, choices=UNIDAD_CHOICES, default='kg')
+    temperatura_maxima = models.DecimalField(
+        max_digits=4, decimal_places=1, null=True, blank=True,
+        help_text="Temperatura máxima de conservación en °C"
+    )
     imagen = models.ImageField(upload_to='productos/', blank=True, null=True)
     activo = models.BooleanField(default=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
-    historial = HistoricalRecords()
+    historial = HistorialLigero(excluir=['descripcion', 'imagen'])
     
     class Meta:
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
         ordering = ['nombre']
+        indexes = [
+            # Paginación por clave (nombre, id) de la API
+            models.Index(fields=['nombre', 'id']),
+        ]
     
     def __str__(self):
         return self.nombre
+
+    def save(self, *args, **kwargs):
+        if not self.codigo:
+            self.codigo = generate_unique_code()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'codigo'}
+        super().save(*args, **kwargs)
     
     @property
     def margen_ganancia(self):
@@ -65,6 +120,48 @@ class Producto(models.Model):
             return ((self.precio - self.costo) / self.precio) * 100
         return 0
 
+class MovimientoStock(models.Model):
+    TIPO_CHOICES = [
+        ('entrada', 'Entrada'),
+        ('salida', 'Salida'),
+        ('ajuste', 'Ajuste'),
+        ('venta', 'Venta'),
+        ('devolucion', 'Devolución'),
+    ]
+
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='movimientos')
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    cantidad = models.DecimalField(max_digits=10, decimal_places=2)  # positiva suma, negativa resta
+    motivo = models.CharField(max_length=200, blank=True)
+    referencia = models.CharField(max_length=50, blank=True)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    fecha = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Movimiento de Stock"
+        verbose_name_plural = "Movimientos de Stock"
+        ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['producto', 'fecha']),
+            models.Index(fields=['fecha']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.cantidad} - {self.producto}"
+
+class SnapshotStock(models.Model):
+    producto = models.OneToOneField(Producto, on_delete=models.CASCADE, related_name='snapshot_stock')
+    cantidad = models.DecimalField(max_digits=12, decimal_places=2)
+    hasta_fecha = models.DateTimeField()
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Snapshot de Stock"
+        verbose_name_plural = "Snapshots de Stock"
+
+    def __str__(self):
+        return f"{self.producto} - {self.cantidad} al {self.hasta_fecha}"
+
 class PuntoControlHACCP(models.Model):
     nombre = models.CharField(max_length=200)
     descripcion = models.TextField()
@@ -72,7 +169,7 @@ class PuntoControlHACCP(models.Model):
     medida_correctiva = models.TextField()
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
-    historial = HistoricalRecords()
+    historial = HistorialLigero()
 
     class Meta:
         verbose_name = "Punto de Control HACCP"
@@ -94,7 +191,7 @@ class RegistroCalidad(models.Model):
     valor_medido = models.CharField(max_length=100)
     estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
     observaciones = models.TextField(blank=True, null=True)
-    historial = HistoricalRecords()
+    historial = HistorialLigero()
 
     class Meta:
         verbose_name = "Registro de Calidad"
@@ -126,7 +223,7 @@ class Incidencia(models.Model):
     estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='abierta')
     accion_correctiva = models.TextField(blank=True, null=True)
     fecha_resolucion = models.DateTimeField(null=True, blank=True)
-    historial = HistoricalRecords()
+    historial = HistorialLigero()
 
     class Meta:
         verbose_name = "Incidencia"
@@ -0,0 +1,72 @@
+"""
+Secuencias de códigos reservadas por bloques.
+
+Cada prefijo (p. ej. 'PROD-261018') tiene una fila en SecuenciaCodigo con el
+último número entregado. reservar() toma un bloque de números consecutivos con
+un solo UPDATE ... SET ultimo = ultimo + n: el UPDATE bloquea la fila hasta el
+commit, así que dos procesos nunca reciben el mismo número y las cargas
+masivas no dependen de reintentos por IntegrityError. Los códigos crecen
+dentro del día, de modo que las inserciones caen al final del índice único en
+vez de repartirse al azar como con el sufijo de uuid.
+
+Fuera de una transacción, siguiente_codigo() guarda en el proceso el resto del
+bloque reservado. Dentro de una transacción reserva solo lo que usa: si la
+transacción se revierte, el UPDATE también, y un bloque guardado en memoria
+volvería a entregarse a otro proceso.
+"""
+import os
+import threading
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import SecuenciaCodigo
+
+DIGITOS = 7
+BLOQUE = 20
+
+_bloques = {}  # serie: (pid, prefijo, números restantes)
+_candado = threading.Lock()
+
+
+def reservar(prefijo, cantidad=1):
+    """Reserva `cantidad` números consecutivos de `prefijo`. Devuelve un range."""
+    if cantidad < 1:
+        return range(0)
+    with transaction.atomic():
+        secuencia = SecuenciaCodigo.objects.filter(prefijo=prefijo)
+        if not secuencia.update(ultimo=F('ultimo') + cantidad):
+            # Primera reserva del prefijo; get_or_create cubre a otro proceso creándolo a la vez
+            SecuenciaCodigo.objects.get_or_create(prefijo=prefijo)
+            secuencia.update(ultimo=F('ultimo') + cantidad)
+        ultimo = secuencia.values_list('ultimo', flat=True).get()
+    return range(ultimo - cantidad + 1, ultimo + 1)
+
+
+def prefijo_diario(serie, fecha=None):
+    return f'{serie}-{(fecha or timezone.localdate()):%y%m%d}'
+
+
+def formatear(prefijo, numero):
+    return f'{prefijo}-{numero:0{DIGITOS}d}'
+
+
+def codigos_diarios(serie, cantidad, fecha=None):
+    """Reserva `cantidad` códigos '<serie>-yymmdd-NNNNNNN' del día con un solo UPDATE."""
+    prefijo = prefijo_diario(serie, fecha)
+    return [formatear(prefijo, numero) for numero in reservar(prefijo, cantidad)]
+
+
+def siguiente_codigo(serie, fecha=None):
+    prefijo = prefijo_diario(serie, fecha)
+    if connection.in_atomic_block:
+        return formatear(prefijo, reservar(prefijo)[0])
+    with _candado:
+        pid, prefijo_bloque, bloque = _bloques.get(serie, (None, None, []))
+        # Al cambiar de día se descarta el resto del bloque; un proceso hijo
+        # (fork de gunicorn o celery) no reutiliza el bloque del padre
+        if (pid, prefijo_bloque) != (os.getpid(), prefijo) or not bloque:
+            bloque = list(reversed(reservar(prefijo, BLOQUE)))
+            _bloques[serie] = (os.getpid(), prefijo, bloque)
+        return formatear(prefijo, bloque.pop())
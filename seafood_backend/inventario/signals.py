@@ -0,0 +1,14 @@
+from django.dispatch import Signal
+
+# Se envía al confirmar la transacción de cada lote de movimientos de stock,
+# con `producto_ids` y `existencias` ({producto_id: (stock anterior, stock
+# actual)}). Los UPDATE basados en F() no disparan post_save, así que
+# quien necesite reaccionar a cambios de stock debe escuchar esta señal.
+stock_modificado = Signal()
+
+# Se envía al confirmar cada lote de una importación masiva del catálogo
+# (inventario.importacion), con sender=Producto, `producto_ids` de los
+# creados o modificados y `estados` ({producto_id: (anterior, actual)} con
+# (activo, cantidad_stock); anterior es None si se creó), o con
+# sender=Categoria si se crearon categorías.
+catalogo_importado = Signal()
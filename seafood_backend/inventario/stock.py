@@ -0,0 +1,149 @@
+"""
+Libro de movimientos de stock.
+
+Producto.cantidad_stock se mantiene como saldo actual (lectura O(1)) y solo se
+modifica con UPDATE condicionales basados en F(), nunca leyendo y guardando el
+objeto completo. Cada cambio deja una fila en MovimientoStock; los movimientos
+antiguos se compactan periódicamente en SnapshotStock.
+"""
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import MovimientoStock, Producto, SnapshotStock
+from .signals import stock_modificado
+
+
+class StockInsuficiente(ValueError):
+    pass
+
+
+def _agrupar(movimientos):
+    cantidades = OrderedDict()
+    for producto_id, cantidad in movimientos:
+        producto_id = int(producto_id)
+        cantidades[producto_id] = cantidades.get(producto_id, Decimal('0')) + Decimal(cantidad)
+    return OrderedDict((pk, cantidad) for pk, cantidad in cantidades.items() if cantidad)
+
+
+def registrar_movimientos(movimientos, tipo, motivo='', referencia='', usuario=None):
+    """
+    Aplica varios movimientos (producto_id, cantidad) con un único UPDATE
+    condicional y un INSERT masivo en el libro.
+
+    Las cantidades negativas solo se aplican si el stock alcanza; si algún
+    producto no cumple, se lanza StockInsuficiente y no se aplica ninguno.
+    """
+    cantidades = _agrupar(movimientos)
+    if not cantidades:
+        return
+
+    condicion = Q()
+    for producto_id, cantidad in cantidades.items():
+        if cantidad < 0:
+            condicion |= Q(pk=producto_id, cantidad_stock__gte=-cantidad)
+        else:
+            condicion |= Q(pk=producto_id)
+
+    with transaction.atomic():
+        actualizados = Producto.objects.filter(condicion).update(
+            cantidad_stock=Case(
+                *[
+                    When(pk=producto_id, then=F('cantidad_stock') + cantidad)
+                    for producto_id, cantidad in cantidades.items()
+                ],
+                default=F('cantidad_stock'),
+            ),
+            fecha_actualizacion=timezone.now(),
+        )
+        if actualizados != len(cantidades):
+            raise StockInsuficiente('Stock insuficiente para completar la operación')
+
+        MovimientoStock.objects.bulk_create([
+            MovimientoStock(
+                producto_id=producto_id,
+                tipo=tipo,
+                cantidad=cantidad,
+                motivo=motivo,
+                referencia=referencia,
+                usuario=usuario,
+            )
+            for producto_id, cantidad in cantidades.items()
+        ])
+
+        producto_ids = list(cantidades)
+        # Las filas siguen bloqueadas por el UPDATE: el stock leído es el que dejó este lote
+        existencias = {
+            producto_id: (stock - cantidades[producto_id], stock)
+            for producto_id, stock in Producto.objects.filter(pk__in=producto_ids).values_list('pk', 'cantidad_stock')
+        }
+        transaction.on_commit(
+            lambda: stock_modificado.send(sender=Producto, producto_ids=producto_ids, existencias=existencias)
+        )
+
+
+def registrar_movimiento(producto_id, cantidad, tipo, motivo='', referencia='', usuario=None):
+    """Aplica un movimiento sobre un producto y devuelve el stock resultante."""
+    with transaction.atomic():
+        registrar_movimientos(
+            [(producto_id, cantidad)], tipo,
+            motivo=motivo, referencia=referencia, usuario=usuario,
+        )
+        return Producto.objects.values_list('cantidad_stock', flat=True).get(pk=producto_id)
+
+
+def compactar_movimientos(antes_de):
+    """
+    Acumula en SnapshotStock los movimientos anteriores a `antes_de` y los
+    elimina del libro. Devuelve la cantidad de movimientos compactados.
+
+    El primer snapshot de un producto parte del stock previo al libro
+    (cantidad_stock menos todos sus movimientos), calculado en una sola consulta.
+    """
+    decimal = DecimalField(max_digits=12, decimal_places=2)
+
+    with transaction.atomic():
+        antiguos = MovimientoStock.objects.filter(fecha__lt=antes_de)
+        sumas = dict(
+            antiguos.values('producto').annotate(total=Sum('cantidad')).values_list('producto', 'total')
+        )
+        if not sumas:
+            return 0
+
+        snapshots = {
+            snapshot.producto_id: snapshot
+            for snapshot in SnapshotStock.objects.select_for_update().filter(producto__in=list(sumas))
+        }
+        sin_snapshot = [producto_id for producto_id in sumas if producto_id not in snapshots]
+
+        total_movimientos = (
+            MovimientoStock.objects.filter(producto=OuterRef('pk'))
+            .values('producto')
+            .annotate(total=Sum('cantidad'))
+            .values('total')
+        )
+        bases = Producto.objects.filter(pk__in=sin_snapshot).annotate(
+            movido=Coalesce(Subquery(total_movimientos), Value(Decimal('0')), output_field=decimal),
+        ).values_list('pk', 'cantidad_stock', 'movido')
+
+        nuevos = [
+            SnapshotStock(
+                producto_id=producto_id,
+                cantidad=stock - movido + sumas[producto_id],
+                hasta_fecha=antes_de,
+            )
+            for producto_id, stock, movido in bases
+        ]
+        for producto_id, snapshot in snapshots.items():
+            snapshot.cantidad += sumas[producto_id]
+            snapshot.hasta_fecha = antes_de
+
+        SnapshotStock.objects.bulk_create(nuevos)
+        SnapshotStock.objects.bulk_update(list(snapshots.values()), ['cantidad', 'hasta_fecha'])
+        compactados, _ = antiguos.delete()
+
+    return compactados
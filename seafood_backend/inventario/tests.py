@@ -1,3 +1,44 @@
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Producto, SecuenciaCodigo
+
+
+def numeros_reservados():
+    return sum(SecuenciaCodigo.objects.values_list('ultimo', flat=True))
+
+
+class CodigoProductoTests(TestCase):
+    def test_instanciar_no_reserva_codigos(self):
+        Producto(nombre='Salmón', precio=Decimal('10.00'))
+        Producto.objects.create(nombre='Reineta', precio=Decimal('5.00'), codigo='PROPIO-1')
+        list(Producto.objects.all())
+
+        self.assertEqual(numeros_reservados(), 0)
+
+    def test_guardar_asigna_codigo_si_falta(self):
+        producto = Producto.objects.create(nombre='Salmón', precio=Decimal('10.00'))
+
+        self.assertTrue(producto.codigo.startswith('PROD-'))
+        self.assertEqual(Producto.objects.get(pk=producto.pk).codigo, producto.codigo)
+
+        producto.codigo = ''
+        producto.save(update_fields=['nombre'])
+        self.assertNotEqual(producto.codigo, '')
+        self.assertEqual(Producto.objects.get(pk=producto.pk).codigo, producto.codigo)
+
+
+class HistorialLigeroTests(TestCase):
+    def test_refresh_from_db_renueva_los_originales(self):
+        producto = Producto.objects.get(pk=Producto.objects.create(nombre='Salmón', precio=Decimal('10.00')).pk)
+        Producto.objects.filter(pk=producto.pk).update(precio=Decimal('12.00'), cantidad_stock=7)
+
+        producto.nombre = 'Salmón ahumado'
+        producto.refresh_from_db(fields=['precio'])
+        self.assertEqual(Producto._historial_ligero.diferencias(producto), {'nombre': 'Salmón ahumado'})
+
+        producto.refresh_from_db()
+        producto.precio = Decimal('10.00')
+        producto.save()
+        self.assertEqual(producto.historial.order_by('-pk').first().cambios, {'precio': '10.00'})
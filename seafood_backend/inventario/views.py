@@ -2,21 +2,19 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from .models import Producto
-from django.db.models import Q
+from .stock import StockInsuficiente, registrar_movimiento
+from dashboard import busqueda
 
 @login_required
 def index(request):
     search_query = request.GET.get('search', '')
-    productos = Producto.objects.all()
-    
-    if search_query:
-        productos = productos.filter(
-            Q(nombre__icontains=search_query) |
-            Q(descripcion__icontains=search_query)
-        )
+    productos = busqueda.buscar(Producto.objects.all(), search_query)
+    page_obj, parametros = busqueda.paginar(request, productos)
     
     context = {
-        'productos': productos,
+        'productos': page_obj,
+        'page_obj': page_obj,
+        'parametros': parametros,
         'search_query': search_query,
     }
     return render(request, 'inventario/index.html', context)
@@ -84,17 +82,21 @@ def ajustar_stock(request, pk):
         cantidad = int(request.POST.get('cantidad', 0))
         operacion = request.POST.get('operacion')
         
-        if operacion == 'sumar':
-            producto.cantidad_stock += cantidad
-        elif operacion == 'restar':
-            if producto.cantidad_stock >= cantidad:
-                producto.cantidad_stock -= cantidad
-            else:
-                messages.error(request, 'No hay suficiente stock para realizar esta operación.')
-                return redirect('inventario')
+        if operacion == 'restar':
+            cantidad = -cantidad
+        elif operacion != 'sumar':
+            cantidad = 0
+        
+        try:
+            nuevo_stock = registrar_movimiento(
+                producto.pk, cantidad, 'entrada' if cantidad > 0 else 'salida',
+                motivo='Ajuste manual', usuario=request.user
+            )
+        except StockInsuficiente:
+            messages.error(request, 'No hay suficiente stock para realizar esta operación.')
+            return redirect('inventario')
                 
-        producto.save()
-        messages.success(request, f'Stock actualizado exitosamente. Nuevo stock: {producto.cantidad_stock}')
+        messages.success(request, f'Stock actualizado exitosamente. Nuevo stock: {nuevo_stock}')
         return redirect('inventario')
         
     return render(request, 'inventario/ajustar_stock.html', {'producto': producto})
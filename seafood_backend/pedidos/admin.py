@@ -8,6 +8,7 @@ class DetallePedidoInline(admin.TabularInline):
 @admin.register(Pedido)
 class PedidoAdmin(admin.ModelAdmin):
     list_display = ('id', 'cliente', 'fecha_pedido', 'estado', 'total')
+    list_select_related = ('cliente',)
     list_filter = ('estado', 'fecha_pedido')
     search_fields = ('cliente__nombre', 'id')
     date_hierarchy = 'fecha_pedido'
@@ -16,5 +17,6 @@ class PedidoAdmin(admin.ModelAdmin):
 @admin.register(DetallePedido)
 class DetallePedidoAdmin(admin.ModelAdmin):
     list_display = ('pedido', 'producto', 'cantidad', 'precio_unitario')
+    list_select_related = ('pedido__cliente', 'producto')
     list_filter = ('pedido__estado',)
     search_fields = ('producto__nombre',)
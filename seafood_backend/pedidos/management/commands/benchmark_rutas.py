@@ -0,0 +1,77 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from pedidos import rutas
+
+# Un grado de latitud son ~111 km
+KM_POR_GRADO = 111.0
+
+
+def ciudad_uniforme(generador, paradas, radio_km):
+    desplazamiento = generador.uniform(-radio_km, radio_km, size=(paradas, 2))
+    return desplazamiento / KM_POR_GRADO
+
+
+def ciudad_por_barrios(generador, paradas, radio_km, barrios=8):
+    centros = generador.uniform(-radio_km, radio_km, size=(barrios, 2))
+    asignados = generador.integers(0, barrios, size=paradas)
+    return (centros[asignados] + generador.normal(0, radio_km / 10, size=(paradas, 2))) / KM_POR_GRADO
+
+
+def ciudad_radial(generador, paradas, radio_km):
+    # Densa en el centro y dispersa hacia la periferia
+    distancia = radio_km * generador.random(paradas) ** 2
+    angulo = generador.uniform(0, 2 * np.pi, size=paradas)
+    return np.column_stack([distancia * np.cos(angulo), distancia * np.sin(angulo)]) / KM_POR_GRADO
+
+
+CIUDADES = {
+    'uniforme': ciudad_uniforme,
+    'barrios': ciudad_por_barrios,
+    'radial': ciudad_radial,
+}
+
+
+class Command(BaseCommand):
+    help = 'Mide tiempo y calidad del planificador de rutas sobre ciudades sintéticas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paradas', type=int, nargs='+', default=[50, 200, 500])
+        parser.add_argument('--vehiculos', type=int, default=8)
+        parser.add_argument('--radio', type=float, default=15.0, help='Radio de la ciudad en km')
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        generador = np.random.default_rng(options['semilla'])
+        deposito = np.array(settings.DEPOSITO_COORDENADAS)
+        self.stdout.write(
+            f"{'ciudad':<10}{'paradas':>8}{'vecino km':>12}{'mejorado km':>13}{'ahorro':>8}"
+            f"{'matriz ms':>11}{'total ms':>10}{'sin asignar':>13}"
+        )
+        for nombre, generar in CIUDADES.items():
+            for paradas in options['paradas']:
+                coordenadas = np.vstack([deposito, deposito + generar(generador, paradas, options['radio'])])
+                demandas = np.concatenate([[0.0], generador.uniform(5, 60, size=paradas)])
+                # Flota con 10 % de holgura sobre la demanda total
+                capacidad = demandas.sum() * 1.1 / options['vehiculos']
+                capacidades = [capacidad] * options['vehiculos']
+
+                inicio = time.perf_counter()
+                distancias = rutas.matriz_distancias(coordenadas)
+                fin_matriz = time.perf_counter()
+                iniciales, sin_asignar = rutas.vecino_mas_cercano(distancias, demandas, capacidades)
+                mejoradas = [rutas.mejorar(ruta, distancias) for ruta in iniciales]
+                fin = time.perf_counter()
+
+                def total(planes):
+                    return sum(rutas.longitud([0] + plan + [0], distancias) for plan in planes if plan)
+
+                vecino, mejorado = total(iniciales), total(mejoradas)
+                self.stdout.write(
+                    f'{nombre:<10}{paradas:>8}{vecino:>12.1f}{mejorado:>13.1f}'
+                    f'{(1 - mejorado / vecino) * 100:>7.1f}%'
+                    f'{(fin_matriz - inicio) * 1000:>11.1f}{(fin - inicio) * 1000:>10.1f}{len(sin_asignar):>13}'
+                )
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0001_initial'),
+        ('pedidos', '0002_vehiculo_detallepedido_lote_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['fecha_pedido', 'id'], name='pedidos_ped_fecha_p_1afad8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rutaentrega',
+            index=models.Index(fields=['fecha_entrega', 'id'], name='pedidos_rut_fecha_e_9c2c29_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0003_indices_paginacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='orden_entrega',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0004_pedido_orden_entrega'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='hora_estimada',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='ventana_fin',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='ventana_inicio',
+            field=models.TimeField(blank=True, null=True),
+        ),
+    ]
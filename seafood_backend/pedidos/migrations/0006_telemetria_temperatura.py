@@ -0,0 +1,42 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0005_pedido_ventanas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenTemperatura',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lecturas', models.PositiveIntegerField(default=0)),
+                ('suma', models.DecimalField(decimal_places=1, default=0, max_digits=12)),
+                ('minima', models.DecimalField(decimal_places=1, max_digits=4, null=True)),
+                ('maxima', models.DecimalField(decimal_places=1, max_digits=4, null=True)),
+                ('minutos_fuera_rango', models.DecimalField(decimal_places=1, default=0, max_digits=8)),
+                ('ultima_lectura', models.DateTimeField(null=True)),
+                ('ultima_temperatura', models.DecimalField(decimal_places=1, max_digits=4, null=True)),
+                ('ruta', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='resumen_temperatura', to='pedidos.rutaentrega')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LecturaTemperatura',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_hora', models.DateTimeField()),
+                ('temperatura', models.DecimalField(decimal_places=1, max_digits=4)),
+                ('ruta', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='pedidos.rutaentrega')),
+                ('vehiculo', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='pedidos.vehiculo')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ruta', 'fecha_hora'], name='pedidos_lec_ruta_id_286e76_idx')],
+                'constraints': [models.UniqueConstraint(fields=('vehiculo', 'fecha_hora'), name='lectura_vehiculo_fecha_unica')],
+            },
+        ),
+    ]
@@ -4,6 +4,7 @@ from inventario.models import Producto
 from clientes.models import Cliente
 from django.core.validators import MinValueValidator, MaxValueValidator
 from decimal import Decimal
+from .totales import marcar_total_pendiente, recalcular_totales
 
 class Vehiculo(models.Model):
     TIPO_CHOICES = [
@@ -41,6 +42,59 @@ class RutaEntrega(models.Model):
     kilometraje_final = models.DecimalField(max_digits=8, decimal_places=2, null=True)
     notas = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['fecha_entrega', 'id']),
+        ]
+
+class LecturaTemperatura(models.Model):
+    """Lectura de temperatura de un furgón; se cargan por lotes (pedidos.telemetria)."""
+    vehiculo = models.ForeignKey(Vehiculo, on_delete=models.CASCADE, db_index=False)
+    ruta = models.ForeignKey(RutaEntrega, on_delete=models.SET_NULL, null=True, blank=True, db_index=False)
+    fecha_hora = models.DateTimeField()
+    temperatura = models.DecimalField(max_digits=4, decimal_places=1)
+
+    class Meta:
+        constraints = [
+            # Un lote reenviado no duplica lecturas; sirve también de índice por vehículo
+            models.UniqueConstraint(fields=['vehiculo', 'fecha_hora'], name='lectura_vehiculo_fecha_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['ruta', 'fecha_hora']),
+        ]
+
+
+class ResumenTemperatura(models.Model):
+    """Agregados de las lecturas de una ruta, actualizados con cada lote."""
+    ruta = models.OneToOneField(RutaEntrega, on_delete=models.CASCADE, related_name='resumen_temperatura')
+    lecturas = models.PositiveIntegerField(default=0)
+    suma = models.DecimalField(max_digits=12, decimal_places=1, default=0)
+    minima = models.DecimalField(max_digits=4, decimal_places=1, null=True)
+    maxima = models.DecimalField(max_digits=4, decimal_places=1, null=True)
+    minutos_fuera_rango = models.DecimalField(max_digits=8, decimal_places=1, default=0)
+    ultima_lectura = models.DateTimeField(null=True)
+    ultima_temperatura = models.DecimalField(max_digits=4, decimal_places=1, null=True)
+
+    @property
+    def promedio(self):
+        return self.suma / self.lecturas if self.lecturas else None
+
+
+class PedidoQuerySet(models.QuerySet):
+    def con_cliente(self):
+        return self.select_related('cliente')
+
+    def con_detalles(self):
+        # Líneas y productos en una sola consulta adicional, sin importar cuántas haya
+        return self.prefetch_related(
+            models.Prefetch('detalles', queryset=DetallePedido.objects.con_producto())
+        )
+
+    def completos(self):
+        """Cabecera, cliente, líneas y productos: 2 consultas para cualquier cantidad de pedidos."""
+        return self.con_cliente().con_detalles()
+
+
 class Pedido(models.Model):
     ESTADO_CHOICES = [
         ('pendiente', 'Pendiente'),
@@ -57,22 +111,36 @@ class Pedido(models.Model):
     notas = models.TextField(blank=True, null=True)
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     ruta_entrega = models.ForeignKey(RutaEntrega, on_delete=models.SET_NULL, null=True, blank=True)
+    orden_entrega = models.PositiveIntegerField(null=True, blank=True)
+    ventana_inicio = models.TimeField(null=True, blank=True)
+    ventana_fin = models.TimeField(null=True, blank=True)
+    hora_estimada = models.TimeField(null=True, blank=True)
     temperatura_entrega = models.DecimalField(max_digits=4, decimal_places=1, null=True, blank=True)
     hora_entrega = models.TimeField(null=True, blank=True)
     firma_cliente = models.ImageField(upload_to='firmas/', null=True, blank=True)
 
+    objects = PedidoQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Pedido'
         verbose_name_plural = 'Pedidos'
         ordering = ['-fecha_pedido']
+        indexes = [
+            # Paginación por clave (fecha_pedido, id) de la API
+            models.Index(fields=['fecha_pedido', 'id']),
+        ]
 
     def __str__(self):
         return f'Pedido #{self.id} - {self.cliente.nombre}'
 
     def actualizar_total(self):
-        total = sum(item.subtotal() for item in self.detalles.all())
-        self.total = total
-        self.save()
+        recalcular_totales([self.pk])
+        self.refresh_from_db(fields=['total', 'fecha_actualizacion'])
+
+class DetallePedidoQuerySet(models.QuerySet):
+    def con_producto(self):
+        return self.select_related('producto')
+
 
 class DetallePedido(models.Model):
     pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name='detalles')
@@ -87,6 +155,8 @@ class DetallePedido(models.Model):
     lote = models.CharField(max_length=50, null=True, blank=True)
     notas = models.TextField(blank=True, null=True)
 
+    objects = DetallePedidoQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Detalle de Pedido'
         verbose_name_plural = 'Detalles de Pedidos'
@@ -101,4 +171,10 @@ class DetallePedido(models.Model):
         if not self.precio_unitario:
             self.precio_unitario = self.producto.precio
         super().save(*args, **kwargs)
-        self.pedido.actualizar_total()
+        marcar_total_pendiente(self.pedido_id)
+
+    def delete(self, *args, **kwargs):
+        pedido_id = self.pedido_id
+        resultado = super().delete(*args, **kwargs)
+        marcar_total_pendiente(pedido_id)
+        return resultado
@@ -0,0 +1,356 @@
+"""
+Programación de rutas con ventanas horarias y cadena de frío.
+
+Cada parada tiene una ventana de entrega (Pedido.ventana_inicio/ventana_fin) y
+cada carga un presupuesto de exposición: los minutos que puede pasar fuera de
+frío antes de superar su temperatura máxima, según la temperatura de empaque y
+RUTAS_CALENTAMIENTO_POR_MINUTO. En un furgón apto para la carga solo cuentan las
+aperturas de puertas (el servicio de cada parada hasta la suya, incluida); si el
+furgón trabaja más caliente que lo que tolera la carga, cuenta todo el trayecto.
+
+Las rutas se construyen por inserción: cada pedido entra en la posición factible
+que menos kilómetros agrega. La factibilidad de todas las posiciones de una ruta
+se evalúa de una vez con el corrimiento horario que provoca la inserción, que
+se absorbe con las esperas de las paradas siguientes. Por eso insertar un
+pedido tardío solo recalcula la ruta que lo recibe.
+"""
+from datetime import time
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DecimalField, Max, Min, Q, Value
+from django.db.models.functions import Coalesce
+
+from .models import Pedido, RutaEntrega
+from .rutas import EPSILON, ESTADOS_PLANIFICABLES, _peso_pedidos, matriz_distancias
+from .signals import pedidos_asignados
+
+MINUTOS_DIA = 24 * 60
+
+
+def _minutos(hora):
+    return hora.hour * 60 + hora.minute + hora.second / 60
+
+
+def _hora(minutos):
+    minutos = int(round(minutos)) % MINUTOS_DIA
+    return time(minutos // 60, minutos % 60)
+
+
+def _salida(ruta):
+    return _minutos(ruta.hora_inicio or time.fromisoformat(settings.RUTAS_HORA_SALIDA))
+
+
+class Red:
+    """
+    Datos de las paradas de un día como arreglos; el índice 0 es el depósito.
+    `temperatura_empaque` es NaN cuando no está registrada.
+    """
+
+    def __init__(self, coordenadas, demandas, ventanas, temperaturas_maximas, temperaturas_empaque):
+        self.distancias = matriz_distancias(coordenadas)
+        self.tiempos = self.distancias / settings.RUTAS_VELOCIDAD_KMH * 60
+        self.demanda = np.asarray(demandas, dtype=float)
+        ventanas = np.asarray(ventanas, dtype=float).reshape(-1, 2)
+        self.ventana_inicio, self.ventana_fin = ventanas[:, 0], ventanas[:, 1]
+        self.temperatura_maxima = np.asarray(temperaturas_maximas, dtype=float)
+        self.temperatura_empaque = np.asarray(temperaturas_empaque, dtype=float)
+        self.servicio = float(settings.RUTAS_MINUTOS_SERVICIO)
+
+
+class RutaFria:
+    """
+    Secuencia de paradas de un vehículo con su horario y exposición al frío.
+    `temperaturas_vehiculo` es el rango (mínima, máxima) del furgón en °C.
+    """
+
+    def __init__(self, red, capacidad, temperaturas_vehiculo, salida, paradas=()):
+        self.red = red
+        self.capacidad = capacidad
+        self.salida = salida
+        self.paradas = list(paradas)
+        self.carga = float(red.demanda[self.paradas].sum()) if self.paradas else 0.0
+        # Sin temperatura de empaque la carga sale al punto medio del rango del furgón
+        inicial = np.where(
+            np.isnan(red.temperatura_empaque), sum(temperaturas_vehiculo) / 2, red.temperatura_empaque
+        )
+        self.presupuesto = (red.temperatura_maxima - inicial) / settings.RUTAS_CALENTAMIENTO_POR_MINUTO
+        self.compatible = temperaturas_vehiculo[1] <= red.temperatura_maxima
+        self._horario = None
+
+    @property
+    def horario(self):
+        if self._horario is None:
+            self._horario = self._calcular()
+        return self._horario
+
+    def _calcular(self):
+        red, paradas = self.red, np.array(self.paradas, dtype=int)
+        viaje = red.tiempos[np.concatenate([[0], paradas[:-1]]), paradas] if len(paradas) else np.empty(0)
+        llegada, inicio = np.empty(len(paradas)), np.empty(len(paradas))
+        reloj = self.salida
+        for q, parada in enumerate(paradas):
+            llegada[q] = reloj + viaje[q]
+            inicio[q] = max(llegada[q], red.ventana_inicio[parada])
+            reloj = inicio[q] + red.servicio
+        fin = inicio + red.servicio
+        compatible = self.compatible[paradas]
+        exposicion = np.where(compatible, red.servicio * np.arange(1, len(paradas) + 1), fin - self.salida)
+        return {
+            'llegada': llegada,
+            'inicio': inicio,
+            'espera': inicio - llegada,
+            'fin': fin,
+            'regreso': (fin[-1] + red.tiempos[paradas[-1], 0]) if len(paradas) else self.salida,
+            'exposicion': exposicion,
+            'compatible': compatible,
+            'holgura_ventana': red.ventana_fin[paradas] - inicio,
+            'holgura_exposicion': self.presupuesto[paradas] - exposicion,
+        }
+
+    def mejor_insercion(self, nodo):
+        """
+        Devuelve (km agregados, posición) de la inserción factible más barata
+        de `nodo`, o None si no cabe en ninguna posición.
+        """
+        red = self.red
+        if self.carga + red.demanda[nodo] > self.capacidad + EPSILON:
+            return None
+        h, paradas = self.horario, np.array(self.paradas, dtype=int)
+        n = len(paradas)
+        anteriores = np.concatenate([[0], paradas])
+        siguientes = np.concatenate([paradas, [0]])
+
+        # Horario y exposición del pedido nuevo en cada una de las n + 1 posiciones
+        inicio = np.maximum(
+            np.concatenate([[self.salida], h['fin']]) + red.tiempos[anteriores, nodo],
+            red.ventana_inicio[nodo],
+        )
+        fin = inicio + red.servicio
+        if self.compatible[nodo]:
+            exposicion = red.servicio * np.arange(1, n + 2)
+        else:
+            exposicion = fin - self.salida
+        factible = (inicio <= red.ventana_fin[nodo] + EPSILON) & (exposicion <= self.presupuesto[nodo] + EPSILON)
+
+        if n:
+            # Atraso en la llegada a la parada p al insertar antes de ella; en
+            # cada parada q >= p se descuenta la espera acumulada desde p
+            atraso = fin[:n] + red.tiempos[nodo, paradas] - h['llegada']
+            esperas = np.cumsum(h['espera'])
+            corrimiento = np.maximum(
+                0, atraso[:, None] - (esperas[None, :] - (esperas - h['espera'])[:, None])
+            )
+            # Las cargas aptas suman una apertura de puertas; las demás, el corrimiento
+            aumento = np.where(h['compatible'][None, :], red.servicio, corrimiento)
+            excede = (corrimiento > h['holgura_ventana'] + EPSILON) | (aumento > h['holgura_exposicion'] + EPSILON)
+            factible[:n] &= ~np.triu(excede).any(axis=1)
+
+        costo = (
+            red.distancias[anteriores, nodo] + red.distancias[nodo, siguientes]
+            - red.distancias[anteriores, siguientes]
+        )
+        costo = np.where(factible, costo, np.inf)
+        posicion = int(costo.argmin())
+        if not np.isfinite(costo[posicion]):
+            return None
+        return float(costo[posicion]), posicion
+
+    def insertar(self, nodo, posicion):
+        self.paradas.insert(posicion, nodo)
+        self.carga += float(self.red.demanda[nodo])
+        self._horario = None
+
+    def longitud(self):
+        recorrido = [0] + self.paradas + [0]
+        return float(self.red.distancias[recorrido[:-1], recorrido[1:]].sum())
+
+
+def mejor_ruta(rutas, nodo):
+    """Índice de la ruta y posición donde insertar `nodo` con menor costo, o None."""
+    mejor = None
+    for indice, ruta in enumerate(rutas):
+        insercion = ruta.mejor_insercion(nodo)
+        if insercion and (mejor is None or insercion[0] < mejor[0]):
+            mejor = (insercion[0], indice, insercion[1])
+    return mejor and mejor[1:]
+
+
+def _con_cadena_frio(pedidos):
+    maxima_defecto = Value(settings.RUTAS_TEMPERATURA_MAXIMA, output_field=DecimalField())
+    return (
+        pedidos.select_related('cliente')
+        .annotate(
+            peso=_peso_pedidos(),
+            temperatura_maxima=Min(
+                Coalesce('detalles__producto__temperatura_maxima', maxima_defecto),
+                output_field=DecimalField(max_digits=4, decimal_places=1),
+            ),
+            # La línea empacada más caliente limita a todo el pedido
+            temperatura_empaque=Max('detalles__temperatura_empaque'),
+        )
+    )
+
+
+def _ubicado(pedido):
+    return pedido.cliente.latitud is not None and pedido.cliente.longitud is not None
+
+
+def _red(pedidos):
+    nan = float('nan')
+    return Red(
+        [settings.DEPOSITO_COORDENADAS] + [(float(p.cliente.latitud), float(p.cliente.longitud)) for p in pedidos],
+        [0.0] + [float(p.peso or 0) for p in pedidos],
+        [(0, MINUTOS_DIA)] + [
+            (
+                _minutos(p.ventana_inicio) if p.ventana_inicio else 0,
+                _minutos(p.ventana_fin) if p.ventana_fin else np.inf,
+            )
+            for p in pedidos
+        ],
+        [np.inf] + [
+            float(p.temperatura_maxima) if p.temperatura_maxima is not None else settings.RUTAS_TEMPERATURA_MAXIMA
+            for p in pedidos
+        ],
+        [nan] + [float(p.temperatura_empaque) if p.temperatura_empaque is not None else nan for p in pedidos],
+    )
+
+
+def _resumen(ruta_entrega, ruta, pedidos):
+    h = ruta.horario
+    return {
+        'ruta_id': ruta_entrega.pk,
+        'vehiculo': ruta_entrega.vehiculo.placa,
+        'carga': round(ruta.carga, 2),
+        'distancia_km': round(ruta.longitud(), 2),
+        'salida': _hora(ruta.salida).isoformat('minutes'),
+        'regreso': _hora(h['regreso']).isoformat('minutes'),
+        'paradas': [
+            {
+                'pedido': pedidos[parada - 1].pk,
+                'hora_estimada': _hora(h['inicio'][q]).isoformat('minutes'),
+                'exposicion_min': round(float(h['exposicion'][q]), 1),
+            }
+            for q, parada in enumerate(ruta.paradas)
+        ],
+    }
+
+
+def _asignar(ruta_entrega, ruta, pedidos):
+    """Fija ruta, orden y hora estimada de las paradas de `ruta`; devuelve los pedidos modificados."""
+    inicio = ruta.horario['inicio']
+    modificados = []
+    for q, parada in enumerate(ruta.paradas):
+        pedido = pedidos[parada - 1]
+        pedido.ruta_entrega, pedido.orden_entrega, pedido.hora_estimada = ruta_entrega, q + 1, _hora(inicio[q])
+        modificados.append(pedido)
+    return modificados
+
+
+def _guardar(modificados):
+    with transaction.atomic():
+        Pedido.objects.bulk_update(
+            modificados, ['ruta_entrega', 'orden_entrega', 'hora_estimada'], batch_size=500
+        )
+        ids = [pedido.pk for pedido in modificados]
+        transaction.on_commit(lambda: pedidos_asignados.send(sender=Pedido, pedido_ids=ids))
+
+
+def _planificadas(fecha):
+    return RutaEntrega.objects.filter(fecha_entrega=fecha, estado='planificada')
+
+
+def _rutas_del_dia(fecha):
+    """Rutas planificadas del día que pueden recibir pedidos: las de vehículos en servicio."""
+    return list(
+        _planificadas(fecha).filter(vehiculo__en_servicio=True)
+        .select_related('vehiculo').order_by('pk')
+    )
+
+
+def _ruta_fria(red, ruta_entrega, paradas=()):
+    vehiculo = ruta_entrega.vehiculo
+    return RutaFria(
+        red, float(vehiculo.capacidad), (vehiculo.temperatura_min, vehiculo.temperatura_max),
+        _salida(ruta_entrega), paradas,
+    )
+
+
+def programar_dia(fecha):
+    """
+    Vuelve a programar desde cero los pedidos abiertos de las rutas planificadas
+    del día, más los que no tienen ruta, respetando ventanas y cadena de frío.
+    Los pedidos con ventana más temprana se insertan primero. Las rutas de
+    vehículos fuera de servicio no reciben pedidos y los que tenían se
+    reparten en las demás.
+    """
+    rutas_entrega = _rutas_del_dia(fecha)
+    pedidos = list(
+        _con_cadena_frio(
+            Pedido.objects.filter(estado__in=ESTADOS_PLANIFICABLES)
+            .filter(Q(ruta_entrega__isnull=True) | Q(ruta_entrega__in=_planificadas(fecha).values('pk')))
+        ).order_by('pk')
+    )
+    ubicados = [p for p in pedidos if _ubicado(p)]
+    resultado = {
+        'rutas': [], 'sin_asignar': [], 'sin_ubicacion': [p.pk for p in pedidos if not _ubicado(p)],
+    }
+    if not ubicados:
+        return resultado
+
+    red = _red(ubicados)
+    rutas = [_ruta_fria(red, ruta_entrega) for ruta_entrega in rutas_entrega]
+    orden = sorted(range(1, len(ubicados) + 1), key=lambda nodo: (red.ventana_fin[nodo], -red.demanda[nodo]))
+    sin_asignar = []
+    for nodo in orden:
+        destino = mejor_ruta(rutas, nodo)
+        if destino is None:
+            sin_asignar.append(nodo)
+        else:
+            rutas[destino[0]].insertar(nodo, destino[1])
+
+    modificados = []
+    for ruta_entrega, ruta in zip(rutas_entrega, rutas):
+        modificados += _asignar(ruta_entrega, ruta, ubicados)
+        resultado['rutas'].append(_resumen(ruta_entrega, ruta, ubicados))
+    for nodo in sorted(sin_asignar):
+        pedido = ubicados[nodo - 1]
+        pedido.ruta_entrega, pedido.orden_entrega, pedido.hora_estimada = None, None, None
+        modificados.append(pedido)
+        resultado['sin_asignar'].append(pedido.pk)
+    _guardar(modificados)
+    return resultado
+
+
+def insertar_pedido(pedido, fecha):
+    """
+    Inserta un pedido en la mejor ruta planificada del día sin reordenar las
+    demás paradas. Solo se escriben los pedidos de la ruta que lo recibe.
+    Devuelve el resumen de esa ruta, o None si el pedido no cabe en ninguna.
+    """
+    rutas_entrega = _rutas_del_dia(fecha)
+    asignados = list(
+        _con_cadena_frio(
+            Pedido.objects.filter(ruta_entrega__in=rutas_entrega, estado__in=ESTADOS_PLANIFICABLES)
+            .exclude(pk=pedido.pk)
+        ).order_by('ruta_entrega', 'orden_entrega', 'pk')
+    )
+    asignados = [p for p in asignados if _ubicado(p)]
+    nuevo = _con_cadena_frio(Pedido.objects.filter(pk=pedido.pk)).get()
+    pedidos = asignados + [nuevo]
+    red = _red(pedidos)
+
+    rutas = [
+        _ruta_fria(red, ruta_entrega, [
+            nodo for nodo, p in enumerate(asignados, start=1) if p.ruta_entrega_id == ruta_entrega.pk
+        ])
+        for ruta_entrega in rutas_entrega
+    ]
+    destino = mejor_ruta(rutas, len(pedidos))
+    if destino is None:
+        return None
+    indice, posicion = destino
+    rutas[indice].insertar(len(pedidos), posicion)
+    _guardar(_asignar(rutas_entrega[indice], rutas[indice], pedidos))
+    return _resumen(rutas_entrega[indice], rutas[indice], pedidos)
@@ -0,0 +1,229 @@
+"""
+Planificación de rutas de reparto (VRP con capacidad).
+
+El motor trabaja sobre arreglos de NumPy: una matriz de distancias
+precalculada (haversine), construcción por vecino más cercano respetando la
+capacidad de cada vehículo y mejora de cada ruta con 2-opt y Or-opt, donde
+cada movimiento se evalúa para todas las posiciones a la vez.
+
+El índice 0 de la matriz es siempre el depósito (settings.DEPOSITO_COORDENADAS).
+"""
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+
+from .models import Pedido, RutaEntrega
+from .signals import pedidos_asignados
+
+RADIO_TIERRA_KM = 6371.0
+ESTADOS_PLANIFICABLES = ('pendiente', 'en_proceso')
+# Peso en kg de una unidad de venta. Las unidades y cajas no tienen peso
+# registrado y se cuentan como 1 kg.
+KG_POR_UNIDAD = {'kg': Decimal('1'), 'lb': Decimal('0.45359237'), 'unidad': Decimal('1'), 'caja': Decimal('1')}
+MAX_ITERACIONES = 1000
+EPSILON = 1e-9
+
+
+def matriz_distancias(coordenadas):
+    """Distancias haversine en km entre todos los pares de (latitud, longitud)."""
+    radianes = np.radians(np.asarray(coordenadas, dtype=float))
+    lat, lon = radianes[:, 0], radianes[:, 1]
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def longitud(recorrido, distancias):
+    recorrido = np.asarray(recorrido)
+    return float(distancias[recorrido[:-1], recorrido[1:]].sum())
+
+
+def vecino_mas_cercano(distancias, demandas, capacidades):
+    """
+    Construye una ruta por vehículo eligiendo siempre la parada pendiente más
+    cercana que todavía cabe. `demandas` incluye el depósito (índice 0, demanda 0).
+    Devuelve (rutas, sin_asignar); cada ruta es la lista de paradas sin el depósito.
+    """
+    pendientes = np.ones(len(demandas), dtype=bool)
+    pendientes[0] = False
+    rutas = []
+    for capacidad in capacidades:
+        ruta, carga, actual = [], 0.0, 0
+        while True:
+            candidatos = pendientes & (demandas <= capacidad - carga + EPSILON)
+            if not candidatos.any():
+                break
+            siguiente = int(np.where(candidatos, distancias[actual], np.inf).argmin())
+            ruta.append(siguiente)
+            pendientes[siguiente] = False
+            carga += demandas[siguiente]
+            actual = siguiente
+        rutas.append(ruta)
+    return rutas, [int(i) for i in np.flatnonzero(pendientes)]
+
+
+def dos_opt(recorrido, distancias):
+    """
+    Mejora un recorrido cerrado (empieza y termina en el depósito) invirtiendo
+    tramos. En cada iteración se evalúan todos los pares de aristas con una
+    sola operación matricial y se aplica el mejor movimiento.
+    """
+    recorrido = np.array(recorrido)
+    if len(recorrido) < 5:
+        return recorrido
+    for _ in range(MAX_ITERACIONES):
+        a, b = recorrido[:-1], recorrido[1:]
+        actual = distancias[a, b]
+        delta = (
+            distancias[a[:, None], a[None, :]] + distancias[b[:, None], b[None, :]]
+            - actual[:, None] - actual[None, :]
+        )
+        # Solo pares de aristas no contiguas (j > i + 1)
+        delta[np.tril_indices_from(delta, 1)] = 0
+        i, j = np.unravel_index(delta.argmin(), delta.shape)
+        if delta[i, j] >= -EPSILON:
+            break
+        recorrido[i + 1:j + 1] = recorrido[i + 1:j + 1][::-1]
+    return recorrido
+
+
+def or_opt(recorrido, distancias, largo_maximo=3):
+    """
+    Mejora un recorrido cerrado moviendo tramos de 1 a `largo_maximo` paradas
+    (en cualquier sentido) a la mejor posición; para cada tramo se evalúan
+    todas las posiciones de inserción a la vez.
+    """
+    recorrido = np.array(recorrido)
+    mejorado = True
+    while mejorado:
+        mejorado = False
+        for largo in range(1, largo_maximo + 1):
+            i = 1
+            while i + largo < len(recorrido):
+                tramo = recorrido[i:i + largo]
+                anterior, siguiente = recorrido[i - 1], recorrido[i + largo]
+                ahorro = (
+                    distancias[anterior, tramo[0]] + distancias[tramo[-1], siguiente]
+                    - distancias[anterior, siguiente]
+                )
+                resto = np.concatenate([recorrido[:i], recorrido[i + largo:]])
+                a, b = resto[:-1], resto[1:]
+                directo = distancias[a, tramo[0]] + distancias[tramo[-1], b]
+                invertido = distancias[a, tramo[-1]] + distancias[tramo[0], b]
+                costo = np.minimum(directo, invertido) - distancias[a, b]
+                # Volver a insertarlo donde estaba no es un movimiento
+                costo[i - 1] = np.inf
+                k = int(costo.argmin())
+                if costo[k] < ahorro - EPSILON:
+                    insertado = tramo if directo[k] <= invertido[k] else tramo[::-1]
+                    recorrido = np.concatenate([resto[:k + 1], insertado, resto[k + 1:]])
+                    mejorado = True
+                else:
+                    i += 1
+    return recorrido
+
+
+def mejorar(ruta, distancias):
+    """Alterna 2-opt y Or-opt sobre una ruta hasta que ninguno la mejora."""
+    if not ruta:
+        return []
+    recorrido = np.array([0] + list(ruta) + [0])
+    largo = longitud(recorrido, distancias)
+    while True:
+        recorrido = or_opt(dos_opt(recorrido, distancias), distancias)
+        nuevo = longitud(recorrido, distancias)
+        if nuevo >= largo - EPSILON:
+            break
+        largo = nuevo
+    return [int(parada) for parada in recorrido[1:-1]]
+
+
+def resolver(coordenadas, demandas, capacidades):
+    """
+    Resuelve un VRP con capacidad. `coordenadas` y `demandas` tienen el depósito
+    en la posición 0. Devuelve (rutas, sin_asignar, distancias) con índices de
+    `coordenadas`; rutas[k] es el orden de visita del vehículo k.
+    """
+    distancias = matriz_distancias(coordenadas)
+    demandas = np.asarray(demandas, dtype=float)
+    rutas, sin_asignar = vecino_mas_cercano(distancias, demandas, capacidades)
+    return [mejorar(ruta, distancias) for ruta in rutas], sin_asignar, distancias
+
+
+def _peso_pedidos():
+    factor = Case(
+        *[When(detalles__producto__unidad=unidad, then=Value(kg)) for unidad, kg in KG_POR_UNIDAD.items()],
+        default=Value(Decimal('1')),
+        output_field=DecimalField(max_digits=12, decimal_places=8),
+    )
+    return Sum(F('detalles__cantidad') * factor, output_field=DecimalField(max_digits=14, decimal_places=4))
+
+
+def optimizar_rutas(fecha, vehiculo_id=None):
+    """
+    Asigna los pedidos abiertos a las rutas planificadas del día y fija su
+    orden de entrega. Los pedidos ya asignados a esas rutas se vuelven a
+    planificar junto con los que no tienen ruta.
+
+    Las rutas de vehículos fuera de servicio no reciben pedidos, y los que
+    tenían asignados se replanifican en las demás.
+    """
+    planificadas = RutaEntrega.objects.filter(fecha_entrega=fecha, estado='planificada')
+    if vehiculo_id is not None:
+        planificadas = planificadas.filter(vehiculo_id=vehiculo_id)
+    rutas = list(
+        planificadas.filter(vehiculo__en_servicio=True)
+        .select_related('vehiculo').order_by('-vehiculo__capacidad', 'pk')
+    )
+
+    pedidos = list(
+        Pedido.objects.filter(estado__in=ESTADOS_PLANIFICABLES)
+        .filter(Q(ruta_entrega__isnull=True) | Q(ruta_entrega__in=planificadas.values('pk')))
+        .select_related('cliente').annotate(peso=_peso_pedidos())
+        .order_by('pk')
+    )
+    sin_ubicacion = [p for p in pedidos if p.cliente.latitud is None or p.cliente.longitud is None]
+    ubicados = [p for p in pedidos if p.cliente.latitud is not None and p.cliente.longitud is not None]
+
+    resultado = {'rutas': [], 'sin_asignar': [], 'sin_ubicacion': [p.pk for p in sin_ubicacion]}
+    if not rutas:
+        resultado['sin_asignar'] = [p.pk for p in ubicados]
+        return resultado
+
+    coordenadas = [settings.DEPOSITO_COORDENADAS] + [
+        (float(p.cliente.latitud), float(p.cliente.longitud)) for p in ubicados
+    ]
+    demandas = [0.0] + [float(p.peso or 0) for p in ubicados]
+    capacidades = [float(ruta.vehiculo.capacidad) for ruta in rutas]
+    planes, sin_asignar, distancias = resolver(coordenadas, demandas, capacidades)
+
+    modificados = []
+    for ruta, plan in zip(rutas, planes):
+        for orden, parada in enumerate(plan, start=1):
+            pedido = ubicados[parada - 1]
+            pedido.ruta_entrega, pedido.orden_entrega = ruta, orden
+            modificados.append(pedido)
+        resultado['rutas'].append({
+            'ruta_id': ruta.pk,
+            'vehiculo': ruta.vehiculo.placa,
+            'capacidad': capacidades[len(resultado['rutas'])],
+            'carga': round(sum(demandas[parada] for parada in plan), 2),
+            'distancia_km': round(longitud([0] + plan + [0], distancias), 2) if plan else 0.0,
+            'pedidos': [ubicados[parada - 1].pk for parada in plan],
+        })
+    for parada in sin_asignar:
+        pedido = ubicados[parada - 1]
+        pedido.ruta_entrega, pedido.orden_entrega = None, None
+        modificados.append(pedido)
+        resultado['sin_asignar'].append(pedido.pk)
+
+    with transaction.atomic():
+        # Un UPDATE por lote en vez de un save() por pedido
+        Pedido.objects.bulk_update(modificados, ['ruta_entrega', 'orden_entrega'], batch_size=500)
+        ids = [pedido.pk for pedido in modificados]
+        transaction.on_commit(lambda: pedidos_asignados.send(sender=Pedido, pedido_ids=ids))
+    return resultado
@@ -0,0 +1,85 @@
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from clientes.models import Cliente
+from inventario.models import Producto
+from inventario.stock import StockInsuficiente, registrar_movimientos
+from .models import Pedido, DetallePedido
+
+
+def _agrupar_lineas(lineas):
+    """Normaliza las líneas (producto_id, cantidad) y suma las cantidades por producto."""
+    normalizadas = []
+    cantidades = OrderedDict()
+    for producto_id, cantidad in lineas:
+        if not cantidad:
+            continue
+        try:
+            cantidad = Decimal(cantidad)
+        except InvalidOperation:
+            raise ValueError(f'Cantidad inválida: {cantidad}')
+        # NaN no se puede comparar e Infinity no cabe en la columna
+        if not cantidad.is_finite():
+            raise ValueError(f'Cantidad inválida: {cantidad}')
+        if cantidad <= 0:
+            continue
+        producto_id = int(producto_id)
+        normalizadas.append((producto_id, cantidad))
+        cantidades[producto_id] = cantidades.get(producto_id, Decimal('0')) + cantidad
+    return normalizadas, cantidades
+
+
+def crear_pedido(cliente_id, lineas, notas='', usuario=None):
+    """
+    Crea un pedido con todas sus líneas en un número fijo de consultas,
+    independiente de la cantidad de líneas:
+
+    1. Bloqueo de los productos involucrados con un único SELECT ... FOR UPDATE.
+    2. Validación de stock en memoria.
+    3. INSERT del pedido con el total ya calculado.
+    4. INSERT masivo de los detalles (bulk_create no dispara DetallePedido.save()).
+    5. Un único UPDATE condicional que descuenta el stock con expresiones F()
+       y un INSERT masivo de los movimientos en el libro de stock.
+    """
+    lineas, cantidades = _agrupar_lineas(lineas)
+    if not lineas:
+        raise ValueError('El pedido debe tener al menos un producto.')
+
+    with transaction.atomic():
+        cliente = Cliente.objects.get(id=cliente_id)
+        productos = Producto.objects.select_for_update().in_bulk(list(cantidades))
+
+        for producto_id, cantidad in cantidades.items():
+            producto = productos.get(producto_id)
+            if producto is None:
+                raise ValueError(f'El producto {producto_id} no existe')
+            if producto.cantidad_stock < cantidad:
+                raise StockInsuficiente(f'Stock insuficiente para {producto.nombre}')
+
+        total = sum(
+            (cantidad * productos[producto_id].precio for producto_id, cantidad in lineas),
+            Decimal('0'),
+        )
+        pedido = Pedido.objects.create(cliente=cliente, notas=notas, total=total)
+
+        DetallePedido.objects.bulk_create([
+            DetallePedido(
+                pedido=pedido,
+                producto_id=producto_id,
+                cantidad=cantidad,
+                precio_unitario=productos[producto_id].precio,
+            )
+            for producto_id, cantidad in lineas
+        ])
+
+        registrar_movimientos(
+            [(producto_id, -cantidad) for producto_id, cantidad in cantidades.items()],
+            'venta',
+            referencia=f'pedido:{pedido.pk}',
+            usuario=usuario,
+        )
+
+    return pedido
+
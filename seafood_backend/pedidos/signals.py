@@ -0,0 +1,14 @@
+from django.dispatch import Signal
+
+# Se envía al confirmar la transacción en la que recalcular_totales() actualizó
+# pedidos con un UPDATE (que no dispara post_save), con `pedido_ids`.
+totales_recalculados = Signal()
+
+# Se envía al confirmar la asignación masiva de pedidos a rutas (bulk_update),
+# con `pedido_ids`.
+pedidos_asignados = Signal()
+
+# Se envía al confirmar la carga de un lote de lecturas de temperatura, que
+# actualiza el resumen y la temperatura promedio de las rutas con bulk_update,
+# con `ruta_ids`.
+temperaturas_registradas = Signal()
@@ -0,0 +1,210 @@
+"""
+Ingesta de lecturas de temperatura de los furgones.
+
+Las lecturas llegan por lotes (NDJSON o CSV) y se leen línea a línea del cuerpo
+de la petición. Cada LOTE filas se descartan las ya cargadas, se insertan con un
+solo bulk_create y se actualiza el resumen de cada ruta (ResumenTemperatura y
+RutaEntrega.temperatura_promedio) con los agregados del lote, sin volver a leer
+las lecturas anteriores.
+
+Los minutos fuera de rango se integran entre lecturas consecutivas de una ruta:
+el intervalo cuenta si la lectura que lo abre está fuera del rango del vehículo,
+con un tope de HUECO_MAXIMO para que un corte de señal no sume minutos. Una
+lectura anterior a la última registrada entra en los conteos pero no en los
+minutos.
+"""
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import LecturaTemperatura, ResumenTemperatura, RutaEntrega, Vehiculo
+from .signals import temperaturas_registradas
+
+LOTE = 5000
+HUECO_MAXIMO = 5 * 60  # segundos
+MAX_ERRORES = 20
+LIMITE_TEMPERATURA = Decimal('99.9')
+UN_DECIMAL = Decimal('0.1')
+
+
+def filas_ndjson(lineas):
+    for numero, linea in enumerate(lineas, start=1):
+        if linea.strip():
+            yield numero, linea
+
+
+def filas_csv(lineas):
+    lector = csv.DictReader(lineas)
+    for fila in lector:
+        yield lector.line_num, fila
+
+
+def _lectura(fila):
+    if isinstance(fila, str):
+        fila = json.loads(fila)
+    fecha_hora = parse_datetime(str(fila['fecha_hora']).strip())
+    if fecha_hora is None:
+        raise ValueError('fecha_hora inválida')
+    if timezone.is_naive(fecha_hora):
+        fecha_hora = timezone.make_aware(fecha_hora)
+    try:
+        temperatura = Decimal(str(fila['temperatura']).strip()).quantize(UN_DECIMAL)
+    except InvalidOperation:
+        raise ValueError('temperatura inválida')
+    if not temperatura.is_finite() or not -LIMITE_TEMPERATURA <= temperatura <= LIMITE_TEMPERATURA:
+        raise ValueError('temperatura fuera de rango')
+    return str(fila['placa']).strip(), fecha_hora, temperatura
+
+
+def _rechazar(resultado, numero, mensaje):
+    resultado['rechazadas'] += 1
+    if len(resultado['errores']) < MAX_ERRORES:
+        resultado['errores'].append({'linea': numero, 'error': mensaje})
+
+
+def ingerir(filas, lote=LOTE):
+    """
+    Carga las lecturas de `filas` ((número de línea, fila)) por lotes. Las filas
+    inválidas se rechazan sin detener la carga.
+    """
+    resultado = {'recibidas': 0, 'insertadas': 0, 'duplicadas': 0, 'rechazadas': 0, 'errores': []}
+    vehiculos = {}
+    pendientes = []
+    for numero, fila in filas:
+        resultado['recibidas'] += 1
+        try:
+            pendientes.append((numero, *_lectura(fila)))
+        except KeyError as e:
+            _rechazar(resultado, numero, f'falta el campo {e}')
+        except (TypeError, ValueError) as e:
+            _rechazar(resultado, numero, str(e))
+        if len(pendientes) >= lote:
+            _cargar(pendientes, vehiculos, resultado)
+            pendientes = []
+    if pendientes:
+        _cargar(pendientes, vehiculos, resultado)
+    return resultado
+
+
+def _cargar(pendientes, vehiculos, resultado):
+    faltantes = {placa for _, placa, _, _ in pendientes} - vehiculos.keys()
+    if faltantes:
+        vehiculos.update({
+            vehiculo.placa: vehiculo
+            for vehiculo in Vehiculo.objects.filter(placa__in=faltantes).only('placa', 'temperatura_min', 'temperatura_max')
+        })
+
+    lecturas = {}
+    for numero, placa, fecha_hora, temperatura in pendientes:
+        vehiculo = vehiculos.get(placa)
+        if vehiculo is None:
+            _rechazar(resultado, numero, f'vehículo {placa} no existe')
+        elif (vehiculo.pk, fecha_hora) in lecturas:
+            resultado['duplicadas'] += 1
+        else:
+            lecturas[vehiculo.pk, fecha_hora] = LecturaTemperatura(
+                vehiculo_id=vehiculo.pk, fecha_hora=fecha_hora, temperatura=temperatura
+            )
+    if not lecturas:
+        return
+
+    vehiculo_ids = {vehiculo_id for vehiculo_id, _ in lecturas}
+    fechas = [fecha_hora for _, fecha_hora in lecturas]
+    # La ruta de una lectura es la del vehículo en la fecha local de la lectura
+    rutas = dict(
+        ((vehiculo_id, fecha), ruta_id)
+        for vehiculo_id, fecha, ruta_id in RutaEntrega.objects
+        .filter(vehiculo_id__in=vehiculo_ids, fecha_entrega__in={timezone.localdate(f) for f in fechas})
+        .exclude(estado='cancelada').order_by('pk')
+        .values_list('vehiculo_id', 'fecha_entrega', 'pk')
+    )
+    rangos = {vehiculo.pk: (vehiculo.temperatura_min, vehiculo.temperatura_max) for vehiculo in vehiculos.values()}
+
+    with transaction.atomic():
+        # Un lote paralelo con lecturas de los mismos vehículos espera aquí, así
+        # que las existentes se leen después de que haya confirmado y solo se
+        # resumen las lecturas que este lote inserta de verdad
+        list(
+            Vehiculo.objects.select_for_update().filter(pk__in=vehiculo_ids)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        existentes = set(
+            LecturaTemperatura.objects
+            .filter(vehiculo_id__in=vehiculo_ids, fecha_hora__gte=min(fechas), fecha_hora__lte=max(fechas))
+            .values_list('vehiculo_id', 'fecha_hora')
+        )
+        resultado['duplicadas'] += len(existentes & lecturas.keys())
+        nuevas = [lectura for clave, lectura in lecturas.items() if clave not in existentes]
+        for lectura in nuevas:
+            lectura.ruta_id = rutas.get((lectura.vehiculo_id, timezone.localdate(lectura.fecha_hora)))
+
+        LecturaTemperatura.objects.bulk_create(nuevas, batch_size=1000)
+        ruta_ids = actualizar_resumenes(nuevas, rangos)
+        if ruta_ids:
+            transaction.on_commit(lambda: temperaturas_registradas.send(sender=RutaEntrega, ruta_ids=ruta_ids))
+    resultado['insertadas'] += len(nuevas)
+
+
+def actualizar_resumenes(lecturas, rangos):
+    """
+    Suma las `lecturas` nuevas al resumen de sus rutas y actualiza
+    RutaEntrega.temperatura_promedio. `rangos` es {vehiculo_id: (mínima, máxima)}.
+    Devuelve los ids de las rutas actualizadas.
+    """
+    lecturas = [lectura for lectura in lecturas if lectura.ruta_id]
+    if not lecturas:
+        return []
+    rutas = np.array([lectura.ruta_id for lectura in lecturas])
+    segundos = np.array([lectura.fecha_hora.timestamp() for lectura in lecturas])
+    temperaturas = np.array([float(lectura.temperatura) for lectura in lecturas])
+    orden = np.lexsort((segundos, rutas))
+    rutas, segundos, temperaturas = rutas[orden], segundos[orden], temperaturas[orden]
+    lecturas = [lecturas[i] for i in orden]
+    ruta_ids, inicios = np.unique(rutas, return_index=True)
+    ruta_ids = [int(ruta_id) for ruta_id in ruta_ids]
+
+    ResumenTemperatura.objects.bulk_create(
+        [ResumenTemperatura(ruta_id=ruta_id) for ruta_id in ruta_ids], ignore_conflicts=True
+    )
+    resumenes = ResumenTemperatura.objects.select_for_update().in_bulk(ruta_ids, field_name='ruta_id')
+
+    for ruta_id, desde, hasta in zip(ruta_ids, inicios, [*inicios[1:], len(rutas)]):
+        resumen = resumenes[ruta_id]
+        t, x = segundos[desde:hasta], temperaturas[desde:hasta]
+        minima, maxima = rangos[lecturas[desde].vehiculo_id]
+
+        previa = resumen.ultima_lectura.timestamp() if resumen.ultima_lectura else -np.inf
+        posteriores = t > previa
+        tramo_t, tramo_x = t[posteriores], x[posteriores]
+        if resumen.ultima_lectura and len(tramo_t):
+            tramo_t = np.concatenate([[previa], tramo_t])
+            tramo_x = np.concatenate([[float(resumen.ultima_temperatura)], tramo_x])
+        fuera = (tramo_x[:-1] < minima) | (tramo_x[:-1] > maxima)
+        minutos = float((np.minimum(np.diff(tramo_t), HUECO_MAXIMO) * fuera).sum()) / 60
+
+        resumen.lecturas += len(t)
+        resumen.suma += Decimal(f'{x.sum():.1f}')
+        resumen.minima = min(Decimal(f'{x.min():.1f}'), resumen.minima if resumen.minima is not None else Decimal('inf'))
+        resumen.maxima = max(Decimal(f'{x.max():.1f}'), resumen.maxima if resumen.maxima is not None else Decimal('-inf'))
+        resumen.minutos_fuera_rango += Decimal(f'{minutos:.1f}')
+        if posteriores.any():
+            ultima = lecturas[hasta - 1]
+            resumen.ultima_lectura, resumen.ultima_temperatura = ultima.fecha_hora, ultima.temperatura
+
+    ResumenTemperatura.objects.bulk_update(
+        resumenes.values(),
+        ['lecturas', 'suma', 'minima', 'maxima', 'minutos_fuera_rango', 'ultima_lectura', 'ultima_temperatura'],
+    )
+    RutaEntrega.objects.bulk_update(
+        [
+            RutaEntrega(pk=ruta_id, temperatura_promedio=resumen.promedio.quantize(UN_DECIMAL))
+            for ruta_id, resumen in resumenes.items()
+        ],
+        ['temperatura_promedio'],
+    )
+    return ruta_ids
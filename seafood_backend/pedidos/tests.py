@@ -1,3 +1,250 @@
-from django.test import TestCase
+import copy
+from datetime import date
+from decimal import Decimal
+from itertools import count
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from clientes.models import Cliente
+from inventario.models import Producto
+from .models import Pedido, RutaEntrega, Vehiculo
+from .programacion import MINUTOS_DIA, Red, RutaFria, insertar_pedido, programar_dia
+from .rutas import EPSILON, optimizar_rutas
+from .services import crear_pedido
+from .signals import totales_recalculados
+from .totales import _recalcular_pendientes
+
+_secuencia = count()
+
+CACHE_LOCAL = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def crear_productos(cantidad):
+    return [
+        Producto.objects.create(nombre=f'Producto {i}', precio=Decimal('10.00'), cantidad_stock=1000)
+        for i in range(cantidad)
+    ]
+
+
+def crear_datos(num_pedidos, lineas_por_pedido):
+    productos = crear_productos(lineas_por_pedido)
+    pedidos = []
+    for _ in range(num_pedidos):
+        i = next(_secuencia)
+        cliente = Cliente.objects.create(
+            nombre=f'Cliente {i}', rut=str(i), email=f'cliente{i}@ejemplo.cl',
+            telefono='123', direccion='Dirección',
+        )
+        pedidos.append(crear_pedido(cliente.pk, [(p.pk, 1) for p in productos]))
+    return pedidos
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class ConsultasPedidosTests(TestCase):
+    # Sesión y usuario del login en cada petición
+    CONSULTAS_AUTENTICACION = 2
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('operador', password='clave')
+        self.client.force_login(self.usuario)
+
+    def test_queryset_completos_no_depende_del_tamano(self):
+        crear_datos(num_pedidos=5, lineas_por_pedido=4)
+        with self.assertNumQueries(2):
+            for pedido in Pedido.objects.completos():
+                str(pedido)
+                for detalle in pedido.detalles.all():
+                    str(detalle)
+
+    def test_listado(self):
+        for cantidad in (2, 8):
+            crear_datos(num_pedidos=cantidad, lineas_por_pedido=1)
+            # COUNT de la paginación y la página con sus clientes
+            with self.assertNumQueries(self.CONSULTAS_AUTENTICACION + 2):
+                respuesta = self.client.get(reverse('pedidos'))
+            self.assertEqual(respuesta.status_code, 200)
+
+    def test_detalle(self):
+        for lineas in (1, 10):
+            pedido = crear_datos(num_pedidos=1, lineas_por_pedido=lineas)[0]
+            with self.assertNumQueries(self.CONSULTAS_AUTENTICACION + 2):
+                respuesta = self.client.get(reverse('pedido_detalle', args=[pedido.pk]))
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertContains(respuesta, f'Producto {lineas - 1}')
+
+
+class CrearPedidoTests(TestCase):
+    def test_rechaza_cantidades_no_finitas(self):
+        cliente = Cliente.objects.create(
+            nombre='Cliente', rut='1', email='cliente@ejemplo.cl', telefono='123', direccion='Dirección',
+        )
+        producto = crear_productos(1)[0]
+        for cantidad in ('NaN', 'sNaN', '-NaN', 'Infinity'):
+            with self.subTest(cantidad=cantidad), self.assertRaisesMessage(ValueError, 'Cantidad inválida'):
+                crear_pedido(cliente.pk, [(producto.pk, cantidad)])
+        self.assertFalse(Pedido.objects.exists())
+
+
+class TotalesTests(TestCase):
+    def setUp(self):
+        self.recalculados = []
+        recibir = lambda sender, pedido_ids, **kwargs: self.recalculados.append(set(pedido_ids))
+        totales_recalculados.connect(recibir, weak=False, dispatch_uid='prueba_totales')
+        self.addCleanup(totales_recalculados.disconnect, dispatch_uid='prueba_totales')
+
+    def test_un_recalculo_por_transaccion(self):
+        pedidos = crear_datos(num_pedidos=2, lineas_por_pedido=3)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for pedido in pedidos:
+                for detalle in pedido.detalles.all():
+                    detalle.cantidad = 2
+                    detalle.save()
+        self.assertEqual(callbacks.count(_recalcular_pendientes), 1)
+        self.assertEqual(self.recalculados, [{pedido.pk for pedido in pedidos}])
+        self.assertEqual(
+            list(Pedido.objects.filter(pk__in=[pedido.pk for pedido in pedidos]).values_list('total', flat=True)),
+            [Decimal('60.00')] * 2,
+        )
+
+    def test_rollback_descarta_los_pedidos_marcados(self):
+        revertido, confirmado = crear_datos(num_pedidos=2, lineas_por_pedido=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    detalle = revertido.detalles.get()
+                    detalle.cantidad = 5
+                    detalle.save()
+                    raise ValueError
+            except ValueError:
+                pass
+            detalle = confirmado.detalles.get()
+            detalle.cantidad = 3
+            detalle.save()
+        self.assertEqual(self.recalculados, [{confirmado.pk}])
+
+
+def crear_ruta(placa, fecha, en_servicio=True, capacidad=1000):
+    conductor, _ = User.objects.get_or_create(username='conductor')
+    vehiculo = Vehiculo.objects.create(
+        placa=placa, tipo='furgon', capacidad=capacidad, temperatura_min=0, temperatura_max=4,
+        en_servicio=en_servicio, ultima_revision=fecha, proxima_revision=fecha,
+    )
+    return RutaEntrega.objects.create(
+        fecha_entrega=fecha, vehiculo=vehiculo, conductor=conductor, kilometraje_inicial=0,
+    )
+
+
+class OptimizarRutasTests(TestCase):
+    def test_no_asigna_vehiculos_fuera_de_servicio(self):
+        fecha = date(2025, 3, 10)
+        en_servicio = crear_ruta('AA1111', fecha)
+        averiado = crear_ruta('BB2222', fecha, en_servicio=False, capacidad=5000)
+        pedidos = crear_datos(num_pedidos=3, lineas_por_pedido=1)
+        Cliente.objects.update(latitud=Decimal('-33.45'), longitud=Decimal('-70.66'))
+        Pedido.objects.filter(pk=pedidos[0].pk).update(ruta_entrega=averiado)
+
+        resultado = optimizar_rutas(fecha)
+
+        self.assertEqual([ruta['ruta_id'] for ruta in resultado['rutas']], [en_servicio.pk])
+        self.assertEqual(
+            set(Pedido.objects.values_list('ruta_entrega', flat=True)), {en_servicio.pk}
+        )
+
+
+
+class ProgramacionTests(TestCase):
+    def setUp(self):
+        self.fecha = date(2025, 3, 10)
+        self.en_servicio = crear_ruta('AA1111', self.fecha)
+        self.averiado = crear_ruta('BB2222', self.fecha, en_servicio=False, capacidad=5000)
+        self.pedidos = crear_datos(num_pedidos=3, lineas_por_pedido=1)
+        Cliente.objects.update(latitud=Decimal('-33.45'), longitud=Decimal('-70.66'))
+
+    def test_programar_dia_no_usa_vehiculos_fuera_de_servicio(self):
+        Pedido.objects.filter(pk=self.pedidos[0].pk).update(ruta_entrega=self.averiado)
+
+        resultado = programar_dia(self.fecha)
+
+        self.assertEqual([ruta['ruta_id'] for ruta in resultado['rutas']], [self.en_servicio.pk])
+        self.assertEqual(set(Pedido.objects.values_list('ruta_entrega', flat=True)), {self.en_servicio.pk})
+
+    def test_programar_dia_sin_vehiculos_en_servicio_libera_los_pedidos(self):
+        self.en_servicio.vehiculo.en_servicio = False
+        self.en_servicio.vehiculo.save()
+        Pedido.objects.filter(pk=self.pedidos[0].pk).update(ruta_entrega=self.averiado)
+
+        resultado = programar_dia(self.fecha)
+
+        self.assertEqual(resultado['rutas'], [])
+        self.assertEqual(sorted(resultado['sin_asignar']), [pedido.pk for pedido in self.pedidos])
+        self.assertEqual(set(Pedido.objects.values_list('ruta_entrega', flat=True)), {None})
+
+    def test_insertar_pedido_no_usa_vehiculos_fuera_de_servicio(self):
+        # La primera ruta del día, que ganaría el empate, es la del vehículo averiado
+        Vehiculo.objects.filter(pk=self.en_servicio.vehiculo_id).update(en_servicio=False)
+        Vehiculo.objects.filter(pk=self.averiado.vehiculo_id).update(en_servicio=True)
+
+        ruta = insertar_pedido(self.pedidos[0], self.fecha)
+
+        self.assertEqual(ruta['ruta_id'], self.averiado.pk)
+        self.pedidos[0].refresh_from_db()
+        self.assertEqual(self.pedidos[0].ruta_entrega_id, self.averiado.pk)
+
+
+def insercion_por_fuerza_bruta(ruta, nodo):
+    """{posición: km agregados} de las inserciones factibles, recalculando la ruta completa en cada una."""
+    if ruta.carga + ruta.red.demanda[nodo] > ruta.capacidad + EPSILON:
+        return {}
+    factibles = {}
+    for posicion in range(len(ruta.paradas) + 1):
+        prueba = copy.copy(ruta)
+        prueba.paradas = ruta.paradas[:posicion] + [nodo] + ruta.paradas[posicion:]
+        prueba._horario = None
+        h = prueba.horario
+        if (h['holgura_ventana'] >= -EPSILON).all() and (h['holgura_exposicion'] >= -EPSILON).all():
+            factibles[posicion] = prueba.longitud() - ruta.longitud()
+    return factibles
+
+
+class InsercionTests(SimpleTestCase):
+    def red_aleatoria(self, rng, paradas):
+        latitud, longitud = settings.DEPOSITO_COORDENADAS
+        ventanas = [(0, MINUTOS_DIA)]
+        for _ in range(paradas):
+            desde = rng.uniform(8 * 60, 12 * 60)
+            ventanas.append((0, np.inf) if rng.random() < 0.2 else (desde, desde + rng.uniform(15, 180)))
+        return Red(
+            [(latitud, longitud)] + [
+                (latitud + rng.uniform(-0.08, 0.08), longitud + rng.uniform(-0.08, 0.08)) for _ in range(paradas)
+            ],
+            [0.0] + list(rng.uniform(10, 200, paradas)),
+            ventanas,
+            [np.inf] + list(rng.choice([2.0, 4.0, 8.0], paradas)),
+            [np.nan] + list(rng.choice([np.nan, -1.0, 0.0, 2.0], paradas)),
+        )
+
+    def test_mejor_insercion_coincide_con_fuerza_bruta(self):
+        rng = np.random.default_rng(12)
+        comparadas = 0
+        for _ in range(60):
+            red = self.red_aleatoria(rng, 10)
+            ruta = RutaFria(red, 1200.0, (0, float(rng.choice([2, 4, 6]))), 8 * 60)
+            for nodo in rng.permutation(np.arange(1, 11)):
+                nodo = int(nodo)
+                factibles = insercion_por_fuerza_bruta(ruta, nodo)
+                insercion = ruta.mejor_insercion(nodo)
+                comparadas += 1
+                if not factibles:
+                    self.assertIsNone(insercion)
+                    continue
+                self.assertIsNotNone(insercion)
+                costo, posicion = insercion
+                self.assertIn(posicion, factibles)
+                self.assertAlmostEqual(costo, min(factibles.values()), places=9)
+                ruta.insertar(nodo, posicion)
+        self.assertEqual(comparadas, 600)
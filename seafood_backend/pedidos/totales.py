@@ -0,0 +1,87 @@
+"""
+Recálculo diferido de Pedido.total.
+
+Cada guardado de un DetallePedido marca su pedido como pendiente de recálculo.
+Dentro de una transacción los pedidos marcados se juntan y un único callback de
+commit los recalcula con un solo UPDATE agregado; fuera de una transacción se
+recalcula de inmediato. Si la transacción se revierte, Django descarta el
+callback y la próxima marca empieza un conjunto nuevo.
+"""
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .signals import totales_recalculados
+
+_estado = threading.local()
+
+
+def recalcular_totales(pedido_ids):
+    """Recalcula el total de los pedidos indicados con un único UPDATE."""
+    pedido_ids = list(pedido_ids)
+    if not pedido_ids:
+        return 0
+
+    Pedido = apps.get_model('pedidos', 'Pedido')
+    DetallePedido = apps.get_model('pedidos', 'DetallePedido')
+    suma = (
+        DetallePedido.objects.filter(pedido=OuterRef('pk'))
+        .values('pedido')
+        .annotate(total=Sum(F('cantidad') * F('precio_unitario')))
+        .values('total')
+    )
+    actualizados = Pedido.objects.filter(pk__in=pedido_ids).update(
+        total=Coalesce(
+            Subquery(suma),
+            Value(Decimal('0')),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ),
+        fecha_actualizacion=timezone.now(),
+    )
+    transaction.on_commit(
+        lambda: totales_recalculados.send(sender=Pedido, pedido_ids=pedido_ids)
+    )
+    return actualizados
+
+
+def _recalcular_pendientes():
+    pedido_ids, _estado.pendientes, _estado.registro = _estado.pendientes, set(), None
+    recalcular_totales(pedido_ids)
+
+
+def marcar_total_pendiente(pedido_id):
+    """Agenda el recálculo del total de un pedido para el commit de la transacción actual."""
+    if getattr(_estado, 'suspendido', 0):
+        return
+    conexion = transaction.get_connection()
+    if not conexion.in_atomic_block:
+        recalcular_totales([pedido_id])
+        return
+    registro = getattr(_estado, 'registro', None)
+    if registro is None or registro not in conexion.run_on_commit:
+        # Primera marca de la transacción, o la anterior se revirtió y se llevó su callback
+        _estado.pendientes = set()
+        transaction.on_commit(_recalcular_pendientes)
+        _estado.registro = conexion.run_on_commit[-1]
+    _estado.pendientes.add(pedido_id)
+
+
+@contextmanager
+def sin_recalculo_total():
+    """
+    Desactiva el recálculo automático de totales dentro del bloque.
+
+    Pensado para procesos masivos que calculan el total por su cuenta o que
+    llaman a recalcular_totales() una vez al final.
+    """
+    _estado.suspendido = getattr(_estado, 'suspendido', 0) + 1
+    try:
+        yield
+    finally:
+        _estado.suspendido -= 1
@@ -3,28 +3,39 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db import transaction
 from .models import Pedido, DetallePedido
+from .services import crear_pedido
 from inventario.models import Producto
 from clientes.models import Cliente
 from django.db.models import Q
+from dashboard import busqueda
+from inventario.stock import registrar_movimientos
 
 @login_required
 def index(request):
     search_query = request.GET.get('search', '')
     estado_filter = request.GET.get('estado', '')
     
-    pedidos = Pedido.objects.all()
+    pedidos = Pedido.objects.con_cliente()
     
     if search_query:
-        pedidos = pedidos.filter(
-            Q(cliente__nombre__icontains=search_query) |
-            Q(id__icontains=search_query)
-        )
+        # Por número de pedido (exacto) o por los datos del cliente en el índice de búsqueda
+        condicion = Q(pk__in=[])
+        numero = search_query.strip().lstrip('#')
+        if numero.isdigit():
+            condicion |= Q(pk=int(numero))
+        clientes = busqueda.coincidencias(Cliente, search_query)
+        if clientes is not None:
+            condicion |= Q(cliente__in=clientes.values('object_id'))
+        pedidos = pedidos.filter(condicion)
     
     if estado_filter:
         pedidos = pedidos.filter(estado=estado_filter)
+    page_obj, parametros = busqueda.paginar(request, pedidos)
     
     context = {
-        'pedidos': pedidos,
+        'pedidos': page_obj,
+        'page_obj': page_obj,
+        'parametros': parametros,
         'search_query': search_query,
         'estado_filter': estado_filter,
         'estados': Pedido.ESTADO_CHOICES,
@@ -44,37 +55,11 @@ def pedido_crear(request):
             return redirect('pedido_crear')
         
         try:
-            with transaction.atomic():
-                # Crear el pedido
-                cliente = Cliente.objects.get(id=cliente_id)
-                pedido = Pedido.objects.create(
-                    cliente=cliente,
-                    notas=notas
-                )
-                
-                # Agregar los productos al pedido
-                for producto_id, cantidad in zip(productos, cantidades):
-                    if cantidad and int(cantidad) > 0:
-                        producto = Producto.objects.get(id=producto_id)
-                        if producto.cantidad_stock < int(cantidad):
-                            raise ValueError(f'Stock insuficiente para {producto.nombre}')
-                        
-                        # Crear detalle del pedido
-                        DetallePedido.objects.create(
-                            pedido=pedido,
-                            producto=producto,
-                            cantidad=int(cantidad),
-                            precio_unitario=producto.precio
-                        )
-                        
-                        # Actualizar stock
-                        producto.cantidad_stock -= int(cantidad)
-                        producto.save()
-                
-                pedido.actualizar_total()
-                messages.success(request, 'Pedido creado exitosamente.')
-                return redirect('pedido_detalle', pk=pedido.pk)
-                
+            pedido = crear_pedido(
+                cliente_id, zip(productos, cantidades), notas=notas, usuario=request.user
+            )
+            messages.success(request, 'Pedido creado exitosamente.')
+            return redirect('pedido_detalle', pk=pedido.pk)
         except ValueError as e:
             messages.error(request, str(e))
             return redirect('pedido_crear')
@@ -90,7 +75,7 @@ def pedido_crear(request):
 
 @login_required
 def pedido_detalle(request, pk):
-    pedido = get_object_or_404(Pedido, pk=pk)
+    pedido = get_object_or_404(Pedido.objects.completos(), pk=pk)
     return render(request, 'pedidos/pedido_detalle.html', {'pedido': pedido})
 
 @login_required
@@ -114,14 +99,18 @@ def pedido_cancelar(request, pk):
         if pedido.estado != 'cancelado':
             try:
                 with transaction.atomic():
-                    # Devolver productos al inventario
-                    for detalle in pedido.detalles.all():
-                        producto = detalle.producto
-                        producto.cantidad_stock += detalle.cantidad
-                        producto.save()
-                    
-                    pedido.estado = 'cancelado'
-                    pedido.save()
+                    # El bloqueo evita devolver el stock dos veces si se cancela en paralelo
+                    pedido = Pedido.objects.select_for_update().get(pk=pedido.pk)
+                    if pedido.estado != 'cancelado':
+                        # Devolver productos al inventario
+                        registrar_movimientos(
+                            pedido.detalles.values_list('producto_id', 'cantidad'),
+                            'devolucion',
+                            referencia=f'pedido:{pedido.pk}',
+                            usuario=request.user,
+                        )
+                        pedido.estado = 'cancelado'
+                        pedido.save()
                     messages.success(request, 'Pedido cancelado exitosamente.')
             except Exception as e:
                 messages.error(request, 'Error al cancelar el pedido.')
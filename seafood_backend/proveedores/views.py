@@ -1,7 +1,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
+from dashboard import busqueda
 from .models import Proveedor
 
 @login_required
@@ -9,21 +9,16 @@ def index(request):
     search_query = request.GET.get('search', '')
     estado_filter = request.GET.get('estado')
     
-    proveedores = Proveedor.objects.all()
-    
-    if search_query:
-        proveedores = proveedores.filter(
-            Q(nombre__icontains=search_query) |
-            Q(rut__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(contacto__icontains=search_query)
-        )
+    proveedores = busqueda.buscar(Proveedor.objects.all(), search_query)
         
     if estado_filter:
         proveedores = proveedores.filter(activo=(estado_filter == 'activo'))
+    page_obj, parametros = busqueda.paginar(request, proveedores)
     
     context = {
-        'proveedores': proveedores,
+        'proveedores': page_obj,
+        'page_obj': page_obj,
+        'parametros': parametros,
         'search_query': search_query,
         'estado_filter': estado_filter
     }
@@ -2,6 +2,8 @@ import os
 from pathlib import Path
 from datetime import timedelta
 
+from celery.schedules import crontab
+
 # Build paths inside the project
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -21,6 +23,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.humanize',
     
     # Aplicaciones de terceros
     'rest_framework',
@@ -174,6 +177,52 @@ CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    # Corrige el desvío de las métricas incrementales del dashboard
+    'reconciliar-metricas-dashboard': {
+        'task': 'dashboard.tasks.reconciliar_metricas',
+        'schedule': timedelta(hours=1),
+    },
+    # Informes que quedaron 'en_proceso' porque el worker murió (informes.generacion)
+    'reencolar-informes-vencidos': {
+        'task': 'informes.tasks.reencolar_informes_vencidos',
+        'schedule': timedelta(minutes=10),
+    },
+    # Refresco incremental cada noche y reajuste completo los domingos
+    'refrescar-pronosticos': {
+        'task': 'informes.tasks.refrescar_pronosticos',
+        'schedule': crontab(hour=2, minute=0),
+    },
+    'pronosticar-demanda': {
+        'task': 'informes.tasks.pronosticar_demanda',
+        'schedule': crontab(hour=3, minute=0, day_of_week='sunday'),
+    },
+    # Facturación de los pedidos entregados del día (finanzas.facturacion)
+    'facturar-pedidos': {
+        'task': 'finanzas.tasks.facturar_pedidos',
+        'schedule': crontab(hour=23, minute=30),
+    },
+    # Cierre contable del mes anterior (finanzas.balances)
+    'cerrar-mes-contable': {
+        'task': 'finanzas.tasks.cerrar_mes_anterior',
+        'schedule': crontab(hour=1, minute=30, day_of_month=1),
+    },
+}
+# Tareas en que se reparte el pronóstico de demanda nocturno
+PRONOSTICO_FRAGMENTOS = 4
+
+# Facturación automática de pedidos entregados (finanzas.facturacion)
+FACTURACION_IVA = '0.19'
+FACTURACION_DIAS_VENCIMIENTO = 30
+FACTURACION_FRAGMENTOS = 4
+# Usuario que figura como creador de los asientos de la facturación automática
+FACTURACION_USUARIO = 'facturacion'
+# Códigos de CuentaContable del asiento de venta
+FACTURACION_CUENTAS = {
+    'clientes': '1.1.03',
+    'ventas': '4.1.01',
+    'iva': '2.1.02',
+}
 
 # Cache Configuration
 CACHES = {
@@ -231,3 +280,16 @@ if not DEBUG:
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
+
+# Planificación de rutas: ubicación del depósito (latitud, longitud)
+DEPOSITO_COORDENADAS = (-33.4489, -70.6693)
+
+# Programación de rutas con cadena de frío
+RUTAS_HORA_SALIDA = '08:00'
+RUTAS_VELOCIDAD_KMH = 30
+# Minutos de descarga por parada, con las puertas del furgón abiertas
+RUTAS_MINUTOS_SERVICIO = 10
+# Temperatura máxima (°C) de los productos que no la tienen registrada
+RUTAS_TEMPERATURA_MAXIMA = 4
+# °C que gana una carga por minuto fuera de frío
+RUTAS_CALENTAMIENTO_POR_MINUTO = 0.05